@@ -48,9 +48,15 @@ export default function RecommendationCard({ data }) {
       </div>
 
       {/* EXPLANATION */}
-      <p className="mt-3 text-sm text-gray-700 italic leading-relaxed">
-        {data.explanation}
-      </p>
+      {data.explanation ? (
+        <p className="mt-3 text-sm text-gray-700 italic leading-relaxed">
+          {data.explanation}
+        </p>
+      ) : (
+        <p className="mt-3 text-sm text-gray-400 italic animate-pulse">
+          Writing why you'll like it…
+        </p>
+      )}
 
       {/* TAGS */}
       <div className="mt-4 flex flex-wrap gap-2">
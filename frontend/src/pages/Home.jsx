@@ -3,7 +3,7 @@ import Header from "../components/Header";
 import SearchBar from "../components/SearchBar";
 import RecommendationCard from "../components/RecommendationCard";
 import CitySelect from "../components/CitySelect";
-import { getRecommendation } from "../services/api";
+import { streamRecommendation } from "../services/api";
 
 export default function Home() {
   const [city, setCity] = useState("");
@@ -37,9 +37,26 @@ export default function Home() {
     setHasSearched(true);
 
     try {
-      const data = await getRecommendation({ query, city, surprise });
-      setResults(data.results || []);
-      setWeather(data.weather || null);
+      // Ranked items render as soon as they arrive; explanations fill in
+      await streamRecommendation({
+        query,
+        city,
+        surprise,
+        onEvent: (event) => {
+          if (event.event === "meta") {
+            setWeather(event.weather || null);
+          } else if (event.event === "results") {
+            setResults(event.results || []);
+            setLoading(false);
+          } else if (event.event === "explanation") {
+            setResults((prev) =>
+              prev.map((r, i) =>
+                i === event.index ? { ...r, explanation: event.explanation } : r
+              )
+            );
+          }
+        },
+      });
     } catch (err) {
       setError(err.message || "Something went wrong.");
     } finally {
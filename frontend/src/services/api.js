@@ -40,3 +40,63 @@ export async function getRecommendation({ query, city, surprise }) {
     throw err;
   }
 }
+
+/**
+ * Streaming variant of getRecommendation.
+ *
+ * Reads NDJSON events from /recommend/stream and hands each one to
+ * `onEvent` as it arrives: "meta" (mood, weather), "results" (ranked
+ * items without explanations), one "explanation" per item, then "done".
+ */
+export async function streamRecommendation({ query, city, surprise, onEvent }) {
+  const controller = new AbortController();
+  const timeout = setTimeout(() => controller.abort(), 20000); // 20s timeout
+
+  try {
+    const res = await fetch(`${API_BASE}/recommend/stream`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      signal: controller.signal,
+      body: JSON.stringify({
+        query: query || "",
+        city: city.toLowerCase(),
+        surprise: Boolean(surprise),
+      }),
+    });
+
+    if (!res.ok || !res.body) {
+      throw new Error("Recommendation failed");
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split("\n");
+      buffer = lines.pop();
+
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const event = JSON.parse(line);
+        if (event.event === "error") {
+          throw new Error(event.message || event.error || "Recommendation failed");
+        }
+        onEvent(event);
+      }
+    }
+  } catch (err) {
+    if (err.name === "AbortError") {
+      throw new Error("Request timed out. Please try again.");
+    }
+    throw err;
+  } finally {
+    clearTimeout(timeout);
+  }
+}
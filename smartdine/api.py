@@ -1,6 +1,12 @@
 import os
 import sys
-from fastapi import FastAPI
+import hmac
+import json
+import time
+from contextlib import nullcontext
+from fastapi import FastAPI, Header, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import uvicorn
@@ -17,7 +23,8 @@ sys.path.append(ROOT_DIR)
 # Logging
 # --------------------------------------------------
 
-from backend.logging import logger
+from backend.logging import logger, sample_request
+from backend.config import ADMIN_TOKEN, SNAPSHOT_WATCH_SECONDS
 
 # --------------------------------------------------
 # Core recommender
@@ -25,6 +32,39 @@ from backend.logging import logger
 
 from src.recommender import SmartDineRecommender
 
+# src modules import each other flat (see recommender.py path setup);
+# import metrics the same way so the API shares their registry.
+from admission import AdmissionMiddleware, request_deadline
+from profiling import RequestProfiler
+from metrics import (
+    collect_timings,
+    counter,
+    histogram,
+    render_metrics,
+    METRICS_ENABLED
+)
+
+REQUESTS_TOTAL = counter(
+    "smartdine_requests_total",
+    "API requests by route and outcome.",
+    ["route", "status"]
+)
+REQUEST_SECONDS = histogram(
+    "smartdine_request_seconds",
+    "End-to-end API request latency.",
+    ["route"]
+)
+# Sampled / header-requested profiles of /recommend (see src/profiling.py)
+profiler = RequestProfiler()
+
+# Clients and CDNs may reuse /cities this long, then revalidate by ETag
+CITIES_MAX_AGE = 300
+
+FIRST_RESULT_SECONDS = histogram(
+    "smartdine_stream_first_result_seconds",
+    "Time until ranked items are sent on the streaming route."
+)
+
 
 # ============================================================
 # Initialize FastAPI app
@@ -36,6 +76,10 @@ app = FastAPI(
     version="1.3.0"
 )
 
+# Concurrency cap, bounded queue and fast 503s for the recommendation
+# routes (src/admission.py). Added before CORS so rejections carry CORS headers.
+app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # dev only
@@ -44,10 +88,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load recommender once (singleton)
-logger.info("[API] Loading SmartDine Recommender...")
-recommender = SmartDineRecommender()
-logger.info("[API] SmartDine Recommender ready.")
+# Load recommender once (singleton).
+# Built on startup rather than at import so that tools (benchmark)
+# can install their own instance before the server starts.
+recommender = None
+
+
+@app.on_event("startup")
+def load_recommender():
+    global recommender
+
+    if recommender is not None:
+        return
+
+    logger.info("[API] Loading SmartDine Recommender...")
+    recommender = SmartDineRecommender()
+    # Pick up newly published data snapshots without a restart
+    recommender.snapshots.watch(SNAPSHOT_WATCH_SECONDS)
+    logger.info("[API] SmartDine Recommender ready.")
 
 
 # ============================================================
@@ -59,6 +117,43 @@ class RecommendRequest(BaseModel):
     city: str
     surprise: Optional[bool] = False
     session_id: Optional[str] = "default"  # ✅ NEW (safe fallback)
+    debug: Optional[bool] = False  # attach per-stage timings
+    nearby: Optional[bool] = False  # also search neighbouring cities
+
+
+class ReloadRequest(BaseModel):
+    version: Optional[str] = None  # default: the CURRENT snapshot
+
+
+# ============================================================
+# Request logging helpers
+# ============================================================
+
+def log_request_line(session_id, city, query, surprise):
+    logger.info(
+        "[REQUEST] session=%s | city=%r | query=%r | surprise=%s",
+        session_id, city, query[:200], surprise,
+        extra={
+            "event": "request",
+            "session": session_id,
+            "city": city,
+            "query": query[:200],
+            "surprise": surprise
+        }
+    )
+
+
+def log_response_line(session_id, city, n_results):
+    logger.info(
+        "[RESPONSE] session=%s | city=%r | results=%d",
+        session_id, city, n_results,
+        extra={
+            "event": "response",
+            "session": session_id,
+            "city": city,
+            "results": n_results
+        }
+    )
 
 
 # ============================================================
@@ -74,46 +169,292 @@ def health_check():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(
+        render_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/cities")
-def get_cities():
-    cities = sorted(recommender.df["City"].unique().tolist())
-    return {"cities": cities}
+def get_cities(if_none_match: Optional[str] = Header(default=None)):
+    """
+    Served from the catalog built at load time (src/city_catalog.py).
+    `cities` lists the display names of the cities that can be served
+    (rows in the dataset or a local index) and `city_ids` their lowercase
+    keys; `catalog` adds item count and index availability for every city.
+    """
+    catalog = recommender.city_catalog
+    headers = {
+        "ETag": catalog.etag,
+        "Cache-Control": f"public, max-age={CITIES_MAX_AGE}"
+    }
+
+    if catalog.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=catalog.body, media_type="application/json", headers=headers)
 
 
 @app.post("/recommend")
-def recommend(req: RecommendRequest):
+def recommend(
+    req: RecommendRequest,
+    request: Request,
+    response: Response,
+    x_smartdine_debug: Optional[str] = Header(default=None),
+    x_smartdine_profile: Optional[str] = Header(default=None)
+):
     """
     Main recommendation endpoint.
+
+    Debug requests (`"debug": true` or an `X-SmartDine-Debug: 1` header)
+    get a `timings` block with milliseconds per pipeline stage.
+
+    Profiled requests (sampled, or `X-SmartDine-Profile: 1|sampling|cprofile`)
+    answer with an `X-SmartDine-Profile-Id` header; fetch the profile from
+    /admin/profiles/{id}.
+
+    Runs against the request's deadline; steps skipped to meet it are
+    listed under `degraded`. Over capacity the route answers 503.
+
+    Misspelled or alternative city names are resolved (`resolved_city`).
+    When search has nothing usable, the city's popular items are served
+    (`fallback`); an unknown city gets `suggestions` rather than an error.
     """
+    debug = bool(req.debug) or x_smartdine_debug in ("1", "true")
+    start = time.perf_counter()
+    status = "ok"
+
     try:
         city = req.city.strip().lower()
         query = req.query.strip()
         session_id = req.session_id or "default"
+        log_request = sample_request()
 
-        logger.info(
-            f"[REQUEST] session={session_id} | city='{city}' | query='{query}' | surprise={req.surprise}"
-        )
+        if log_request:
+            log_request_line(session_id, city, query, req.surprise)
 
-        response = recommender.recommend(
-            query=query,
-            city=city,
-            surprise=req.surprise,
-            session_id=session_id   # ✅ PASSED THROUGH
-        )
+        profile_mode = profiler.wanted(x_smartdine_profile)
+        profiling = profiler.profile(
+            profile_mode,
+            meta={"route": "/recommend", "city": city, "query": query},
+            trigger="header" if x_smartdine_profile else "sampled"
+        ) if profile_mode else nullcontext()
 
-        logger.info(
-            f"[RESPONSE] session={session_id} | city='{city}' | results={len(response.get('results', []))}"
-        )
+        with profiling as prof, collect_timings() if debug else nullcontext() as timings:
+            result = recommender.recommend(
+                query=query,
+                city=city,
+                surprise=req.surprise,
+                session_id=session_id,   # ✅ PASSED THROUGH
+                nearby=bool(req.nearby),
+                deadline=request_deadline(request)
+            )
+
+        if prof is not None:
+            response.headers["X-SmartDine-Profile-Id"] = prof.id
+
+        if debug:
+            result["timings"] = timings
+            if prof is not None:
+                result["profile_id"] = prof.id
 
-        return response
+        if log_request:
+            log_response_line(session_id, city, len(result.get("results", [])))
+
+        return result
 
     except Exception as e:
+        status = "error"
         logger.exception("[ERROR] Recommendation failed")
         return {
             "error": str(e),
             "message": "Failed to generate recommendation"
         }
 
+    finally:
+        if METRICS_ENABLED:
+            REQUESTS_TOTAL.inc(route="/recommend", status=status)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route="/recommend")
+
+
+@app.post("/recommend/stream")
+def recommend_stream(
+    req: RecommendRequest,
+    request: Request,
+    x_smartdine_debug: Optional[str] = Header(default=None)
+):
+    """
+    Streaming variant of /recommend: NDJSON, one event per line.
+
+    Mood, weather and the ranked items are sent as soon as ranking is
+    done; each explanation follows as its LLM call finishes or falls
+    back. Event shapes: SmartDineRecommender.recommend_stream.
+    """
+    debug = bool(req.debug) or x_smartdine_debug in ("1", "true")
+    city = req.city.strip().lower()
+    query = req.query.strip()
+    session_id = req.session_id or "default"
+    log_request = sample_request()
+    deadline = request_deadline(request)
+
+    if log_request:
+        log_request_line(session_id, city, query, req.surprise)
+
+    def events():
+        start = time.perf_counter()
+        status = "ok"
+        n_results = 0
+        first_result_ms = None
+
+        try:
+            for event in recommender.recommend_stream(
+                query=query,
+                city=city,
+                surprise=req.surprise,
+                session_id=session_id,
+                nearby=bool(req.nearby),
+                deadline=deadline
+            ):
+                if event["event"] == "results":
+                    n_results = len(event["results"])
+                    first_result_ms = (time.perf_counter() - start) * 1000
+                    if METRICS_ENABLED:
+                        FIRST_RESULT_SECONDS.observe(first_result_ms / 1000)
+
+                if event["event"] == "done" and debug:
+                    event["timings"] = {
+                        "first_result": round(first_result_ms or 0.0, 3),
+                        "total": round((time.perf_counter() - start) * 1000, 3)
+                    }
+
+                yield json.dumps(jsonable_encoder(event)) + "\n"
+
+            if log_request:
+                log_response_line(session_id, city, n_results)
+
+        except Exception as e:
+            status = "error"
+            logger.exception("[ERROR] Streaming recommendation failed")
+            yield json.dumps({
+                "event": "error",
+                "error": str(e),
+                "message": "Failed to generate recommendation"
+            }) + "\n"
+
+        finally:
+            if METRICS_ENABLED:
+                REQUESTS_TOTAL.inc(route="/recommend/stream", status=status)
+                REQUEST_SECONDS.observe(time.perf_counter() - start, route="/recommend/stream")
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ============================================================
+# Admin
+# ============================================================
+
+def admin_denied(token):
+    """403 response unless the X-Admin-Token header matches ADMIN_TOKEN."""
+    if ADMIN_TOKEN and token and hmac.compare_digest(token, ADMIN_TOKEN):
+        return None
+    return JSONResponse(
+        status_code=403,
+        content={"error": "forbidden", "message": "Valid X-Admin-Token required"}
+    )
+
+
+@app.post("/admin/reload", status_code=202)
+def admin_reload(
+    req: Optional[ReloadRequest] = None,
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """
+    Load a data snapshot in the background and swap it in. In-flight
+    requests finish on the old version. Poll /admin/snapshot for status.
+    """
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+
+    snapshots = recommender.snapshots
+    version = req.version if req else None
+
+    if not snapshots.reload(version):
+        return JSONResponse(
+            status_code=409,
+            content={"error": "busy", "message": f"Already loading {snapshots.loading}"}
+        )
+
+    logger.info("[ADMIN] Snapshot reload requested (version=%s)", version or "CURRENT")
+    return {"status": "loading", "live": snapshots.current.version}
+
+
+@app.get("/admin/snapshot")
+def admin_snapshot(x_admin_token: Optional[str] = Header(default=None)):
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    return recommender.snapshots.status()
+
+
+@app.get("/admin/profiles")
+def admin_profiles(limit: int = 50, x_admin_token: Optional[str] = Header(default=None)):
+    """Stored request profiles, newest first."""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    return {"profiles": profiler.list(limit)}
+
+
+@app.get("/admin/profiles/summary")
+def admin_profiles_summary(
+    top: int = 20,
+    limit: Optional[int] = None,
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """Slowest stacks and functions across the newest `limit` sampled profiles."""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    return profiler.summary(top, limit)
+
+
+@app.get("/admin/profiles/{profile_id}")
+def admin_profile(
+    profile_id: str,
+    download: bool = False,
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """
+    One profile's summary, or with `download=true` the raw file:
+    collapsed stacks (flamegraph.pl, speedscope) or a cProfile .prof dump.
+    """
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+
+    if download:
+        path = profiler.artifact(profile_id)
+        if path:
+            return FileResponse(path, filename=os.path.basename(path), media_type="application/octet-stream")
+    else:
+        entry = profiler.load(profile_id)
+        if entry:
+            entry.pop("stacks", None)
+            return entry
+
+    return JSONResponse(
+        status_code=404,
+        content={"error": "not_found", "message": f"No profile {profile_id}"}
+    )
+
 
 # ============================================================
 # Run server
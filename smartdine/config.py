@@ -53,6 +53,108 @@ FAISS_META_DIR = os.path.join(FAISS_DIR, "metadata")
 #   FAISS_META_DIR/<city>.pkl
 
 
+# ============================================================
+# DATA SNAPSHOTS (HOT RELOAD)
+# ============================================================
+
+# One directory per published build (see src/snapshots.py):
+#   SNAPSHOT_DIR/<version>/manifest.json
+#   SNAPSHOT_DIR/<version>/smartdine_preprocessed.csv
+#   SNAPSHOT_DIR/<version>/faiss_indexes/
+#   SNAPSHOT_DIR/CURRENT            -> name of the live version
+SNAPSHOT_DIR = os.getenv("SMARTDINE_SNAPSHOT_DIR", os.path.join(BASE_DIR, "backend", "snapshots"))
+
+# Poll CURRENT this often and hot-swap when it changes (0 = admin endpoint only)
+SNAPSHOT_WATCH_SECONDS = int(os.getenv("SMARTDINE_SNAPSHOT_WATCH_SECONDS", "60"))
+
+# Required in the X-Admin-Token header for /admin/* routes; unset disables them
+ADMIN_TOKEN = os.getenv("SMARTDINE_ADMIN_TOKEN", "")
+
+
+# ============================================================
+# RETRIEVAL TIER
+# ============================================================
+
+# "local"   -> search city indexes on this host
+# "sharded" -> route each city to retrieval shards (src/retrieval_service.py)
+RETRIEVAL_MODE = os.getenv("SMARTDINE_RETRIEVAL_MODE", "local")
+
+# Comma-separated name=url pairs, shared by the API and every shard:
+#   shard-0=http://10.0.0.5:8101,shard-1=http://10.0.0.6:8101
+RETRIEVAL_SHARDS = os.getenv("SMARTDINE_RETRIEVAL_SHARDS", "")
+
+RETRIEVAL_REPLICAS = int(os.getenv("SMARTDINE_RETRIEVAL_REPLICAS", "2"))   # shards per city
+RETRIEVAL_TIMEOUT_MS = int(os.getenv("SMARTDINE_RETRIEVAL_TIMEOUT_MS", "250"))
+
+# Search locally when no replica answers (needs the index on this host)
+RETRIEVAL_LOCAL_FALLBACK = os.getenv("SMARTDINE_RETRIEVAL_LOCAL_FALLBACK", "1") != "0"
+
+
+# ============================================================
+# NEARBY CITIES (CROSS-CITY SEARCH)
+# ============================================================
+
+# Neighbours searched in parallel when a city has too few good matches
+# (or when a request sets "nearby"). Lowercase city keys; the relation is
+# made symmetric at lookup, so each pair only needs listing once.
+NEARBY_CITIES = {
+    "delhi": ["gurgaon", "noida", "ghaziabad", "faridabad"],
+    "mumbai": ["thane", "navi mumbai", "pune"],
+    "bangalore": ["mysore", "chennai"],
+    "chennai": ["pondicherry", "vellore"],
+    "hyderabad": ["secunderabad"],
+    "kolkata": ["howrah"],
+    "ahmedabad": ["gandhinagar", "surat"],
+    "kochi": ["ernakulam", "thrissur"],
+    "coimbatore": ["tiruppur"],
+    "chandigarh": ["mohali", "panchkula"],
+}
+
+SEARCH_THREADS = int(os.getenv("SMARTDINE_SEARCH_THREADS", "8"))   # parallel index searches
+
+
+# ============================================================
+# CITY NAMES & FALLBACK ANSWERS
+# ============================================================
+
+# Other names users send for a city -> its lowercase key. Anything else
+# unknown is matched to the closest known city name when the difflib
+# ratio reaches CITY_MATCH_CUTOFF (src/city_catalog.py CityResolver).
+CITY_ALIASES = {
+    "bombay": "mumbai",
+    "bengaluru": "bangalore",
+    "madras": "chennai",
+    "calcutta": "kolkata",
+    "new delhi": "delhi",
+    "gurugram": "gurgaon",
+    "cochin": "kochi",
+    "mysuru": "mysore",
+    "puducherry": "pondicherry",
+    "pondy": "pondicherry",
+    "poona": "pune",
+    "baroda": "vadodara",
+    "vizag": "visakhapatnam",
+    "trivandrum": "thiruvananthapuram",
+}
+CITY_MATCH_CUTOFF = 0.8
+
+# Popular items kept in memory per city, served when search finds nothing
+# usable (no index for the city, or nothing passes the rating floor)
+FALLBACK_ITEMS = 20
+
+
+# ============================================================
+# INTENT VOCABULARY
+# ============================================================
+
+# Intent keywords and negation cues read by MoodModel (src/intent_matcher.py);
+# edit the JSON to add intents without code changes
+INTENT_VOCAB_PATH = os.getenv(
+    "SMARTDINE_INTENT_VOCAB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "src", "intent_vocabulary.json")
+)
+
+
 # ============================================================
 # MODEL SETTINGS
 # ============================================================
@@ -60,6 +162,33 @@ FAISS_META_DIR = os.path.join(FAISS_DIR, "metadata")
 EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 EMBEDDING_DIM = 384
 
+# Query encoder backend:
+#   "torch" -> sentence-transformers / PyTorch, full precision
+#   "onnx"  -> int8-quantized ONNX export via onnxruntime (no torch import)
+# Build the ONNX model first: python src/export_encoder.py
+ENCODER_BACKEND = os.getenv("SMARTDINE_ENCODER_BACKEND", "torch")
+
+ONNX_MODEL_DIR = os.path.join(BASE_DIR, "backend", "models", "minilm-onnx")
+ONNX_MODEL_FILE = "model.int8.onnx"
+
+ENCODER_MAX_LENGTH = 128   # tokens; queries are far shorter
+ENCODER_THREADS = int(os.getenv("SMARTDINE_ENCODER_THREADS", "0"))  # 0 = runtime default
+
+
+# ============================================================
+# VECTOR COMPRESSION
+# ============================================================
+
+# Applied when the city indexes are built; the fitted projection is saved
+# next to them and applied to queries at search time (src/vector_compression.py).
+# Check recall first: python src/vector_compression.py  (--synthetic 20000 without production data)
+#   VECTOR_DIM        0 = keep all EMBEDDING_DIM dimensions
+#   VECTOR_REDUCTION  "pca" (fit on the catalog) or "truncate" (first N dims)
+#   VECTOR_STORAGE    "float32", "float16" (2x smaller) or "int8" (4x, scalar-quantized)
+VECTOR_DIM = int(os.getenv("SMARTDINE_VECTOR_DIM", "0"))
+VECTOR_REDUCTION = os.getenv("SMARTDINE_VECTOR_REDUCTION", "pca")
+VECTOR_STORAGE = os.getenv("SMARTDINE_VECTOR_STORAGE", "float32")
+
 
 # ============================================================
 # RECOMMENDATION POLICY (INTERNAL DEFAULTS)
@@ -72,6 +201,111 @@ RETURN_K = 5            # final recommendations shown to user
 # They are NOT part of API contract.
 
 
+# ============================================================
+# RESULT DIVERSIFICATION (MMR)
+# ============================================================
+
+# Final picks are chosen from the best MMR_POOL ranked candidates by
+# maximal marginal relevance over their stored index vectors:
+#   MMR_LAMBDA  1.0 = rank order only, lower = more varied picks
+MMR_POOL = int(os.getenv("SMARTDINE_MMR_POOL", "20"))
+MMR_LAMBDA = float(os.getenv("SMARTDINE_MMR_LAMBDA", "0.7"))
+
+# Picks allowed per restaurant / per primary cuisine (0 = no limit); relaxed
+# only when the pool cannot fill the results otherwise
+MAX_PER_RESTAURANT = int(os.getenv("SMARTDINE_MAX_PER_RESTAURANT", "1"))
+MAX_PER_CUISINE = int(os.getenv("SMARTDINE_MAX_PER_CUISINE", "1"))
+
+
+# ============================================================
+# ADMISSION CONTROL & DEADLINES
+# ============================================================
+
+# Recommendation requests running at once; the rest wait in a bounded
+# queue and get a fast 503 when it is full or their wait runs out
+MAX_CONCURRENT_REQUESTS = int(os.getenv("SMARTDINE_MAX_CONCURRENT", "32"))
+MAX_QUEUED_REQUESTS = int(os.getenv("SMARTDINE_MAX_QUEUED", "64"))
+QUEUE_TIMEOUT_MS = int(os.getenv("SMARTDINE_QUEUE_TIMEOUT_MS", "2000"))
+
+# Time budget per request from arrival (clients may ask for less with
+# an X-SmartDine-Deadline-Ms header)
+REQUEST_DEADLINE_MS = int(os.getenv("SMARTDINE_REQUEST_DEADLINE_MS", "8000"))
+
+# Degradation steps by remaining budget, first to go first:
+#   below DEGRADE_LLM_MS      template explanations instead of the LLM
+#   below DEGRADE_WEATHER_MS  skip the weather lookup
+#   below DEGRADE_TOP_K_MS    retrieve DEGRADED_TOP_K instead of FAISS_TOP_K
+DEGRADE_LLM_MS = int(os.getenv("SMARTDINE_DEGRADE_LLM_MS", "3000"))
+DEGRADE_WEATHER_MS = int(os.getenv("SMARTDINE_DEGRADE_WEATHER_MS", "1500"))
+DEGRADE_TOP_K_MS = int(os.getenv("SMARTDINE_DEGRADE_TOP_K_MS", "500"))
+DEGRADED_TOP_K = 10
+
+
+# ============================================================
+# LLM GATEWAY
+# ============================================================
+
+# Groq (OpenAI-compatible) endpoint; empty = the SDK default, which honours
+# GROQ_BASE_URL. Point at src/fake_llm_server.py for fault-injection tests.
+LLM_BASE_URL = os.getenv("SMARTDINE_LLM_BASE_URL", "")
+LLM_MODEL = os.getenv("SMARTDINE_LLM_MODEL", "llama3-8b-8192")
+
+# "batch"    -> one call explains all of a request's items (JSON reply,
+#               templates for any item the reply misses)
+# "per_item" -> one call per item; streamed explanations arrive one by one
+EXPLAIN_MODE = os.getenv("SMARTDINE_EXPLAIN_MODE", "batch")
+
+# Per-call timeouts; no SDK retries, a failed call falls back to a template
+LLM_CONNECT_TIMEOUT_MS = int(os.getenv("SMARTDINE_LLM_CONNECT_TIMEOUT_MS", "500"))
+LLM_TIMEOUT_MS = int(os.getenv("SMARTDINE_LLM_TIMEOUT_MS", "2500"))
+
+# Pooled keep-alive connections shared by all explanation threads
+LLM_MAX_CONNECTIONS = int(os.getenv("SMARTDINE_LLM_MAX_CONNECTIONS", "32"))
+LLM_KEEPALIVE_CONNECTIONS = int(os.getenv("SMARTDINE_LLM_KEEPALIVE_CONNECTIONS", "16"))
+
+# Circuit breaker: open after this many failures in a row, then probe the
+# provider in the background every LLM_PROBE_SECONDS until it answers
+LLM_FAILURE_THRESHOLD = int(os.getenv("SMARTDINE_LLM_FAILURE_THRESHOLD", "5"))
+LLM_PROBE_SECONDS = float(os.getenv("SMARTDINE_LLM_PROBE_SECONDS", "5"))
+
+# Client-side rate limit (token bucket) to stay under the provider quota;
+# a call waits at most LLM_RATE_WAIT_MS for a token, else uses a template
+LLM_RATE_PER_SECOND = float(os.getenv("SMARTDINE_LLM_RATE_PER_SECOND", "25"))
+LLM_RATE_BURST = int(os.getenv("SMARTDINE_LLM_RATE_BURST", "25"))
+LLM_RATE_WAIT_MS = int(os.getenv("SMARTDINE_LLM_RATE_WAIT_MS", "100"))
+
+
+# ============================================================
+# PRE-GENERATED EXPLANATIONS
+# ============================================================
+
+# Built offline by `python src/explanation_store.py generate`; LLMExplainer
+# serves explanations from here before calling the LLM (no store = off)
+EXPLANATION_STORE_DIR = os.getenv("SMARTDINE_EXPLANATION_STORE", os.path.join(BASE_DIR, "backend", "explanations"))
+
+PREGEN_TOP_ITEMS = 50          # per city, by rating / popularity / bestseller
+PREGEN_VARIANTS = 3            # explanations per (item, mood, weather)
+PREGEN_RATE_PER_SECOND = 2.0   # LLM calls per second for the job
+
+
+# ============================================================
+# PROFILING
+# ============================================================
+
+# Fraction of /recommend requests profiled (0 = only on request, via an
+# X-SmartDine-Profile header); see src/profiling.py and /admin/profiles
+PROFILE_SAMPLE_RATE = float(os.getenv("SMARTDINE_PROFILE_SAMPLE_RATE", "0"))
+
+# "sampling" -> stack samples every PROFILE_INTERVAL_MS (low overhead, flamegraphs)
+# "cprofile" -> deterministic cProfile (exact call counts, slower)
+PROFILE_MODE = os.getenv("SMARTDINE_PROFILE_MODE", "sampling")
+PROFILE_INTERVAL_MS = float(os.getenv("SMARTDINE_PROFILE_INTERVAL_MS", "5"))
+
+PROFILE_DIR = os.getenv("SMARTDINE_PROFILE_DIR", os.path.join(BASE_DIR, "backend", "profiles"))
+PROFILE_KEEP = int(os.getenv("SMARTDINE_PROFILE_KEEP", "200"))       # newest profiles kept on disk
+PROFILE_MAX_ACTIVE = int(os.getenv("SMARTDINE_PROFILE_MAX_ACTIVE", "4"))  # more at once are skipped
+
+
 # ============================================================
 # LOGGING
 # ============================================================
@@ -1,11 +1,21 @@
 """
 logging.py
 Logging configuration for SmartDine backend.
+
+The request path never touches a file: the root logger only has a
+QueueHandler that enqueues the record. A QueueListener thread formats
+records (structured JSON by default) and does the file/console writes,
+including rotation.
 """
 
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # -------------------------------
 # LOG DIRECTORY
@@ -17,54 +27,145 @@ os.makedirs(LOG_DIR, exist_ok=True)
 
 LOG_FILE = os.path.join(LOG_DIR, "smartdine.log")
 
+# -------------------------------
+# SETTINGS (env overridable)
+# -------------------------------
+
+LOG_LEVEL = os.getenv("SMARTDINE_LOG_LEVEL", "INFO").upper()
+CONSOLE_LOG_LEVEL = os.getenv("SMARTDINE_CONSOLE_LOG_LEVEL", "WARNING").upper()
+LOG_FORMAT = os.getenv("SMARTDINE_LOG_FORMAT", "json")   # json | text
+
+# Fraction of requests whose [REQUEST]/[RESPONSE] INFO lines are logged
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("SMARTDINE_REQUEST_LOG_SAMPLE_RATE", "1.0"))
+
+# Records beyond this many pending writes are dropped, never blocking
+LOG_QUEUE_SIZE = int(os.getenv("SMARTDINE_LOG_QUEUE_SIZE", "10000"))
+
+# Third-party loggers that are chatty at INFO
+QUIET_LOGGERS = ["sentence_transformers", "transformers", "faiss", "httpx", "httpcore", "urllib3"]
+
+# -------------------------------
+# FORMATTERS
+# -------------------------------
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. `extra=` fields become top-level keys, so
+    request lines are queryable without parsing the message.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+TEXT_FORMATTER = logging.Formatter(
+    "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    "%Y-%m-%d %H:%M:%S"
+)
+
+# -------------------------------
+# QUEUE HANDLER
+# -------------------------------
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread and drops
+    records instead of blocking when the queue is full.
+    """
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The stock prepare() formats the message here, on the caller's
+        # thread. The queue is in-process, so hand the record over as-is.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def sample_request():
+    """Decide once per request whether its INFO lines are logged."""
+    return REQUEST_LOG_SAMPLE_RATE >= 1.0 or random.random() < REQUEST_LOG_SAMPLE_RATE
+
 # -------------------------------
 # LOGGER SETUP
 # -------------------------------
 
+_listener = None
+
+
 def setup_logger():
     """
     Configure root logger so that:
     - App logs
     - FastAPI logs
     - Uvicorn logs
-    all go through the same handlers.
+    all go through the same queue and listener.
     """
+    global _listener
 
     logger = logging.getLogger()  # ROOT LOGGER
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(LOG_LEVEL)
 
     # Avoid duplicate handlers
     if logger.handlers:
         return logger
 
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else TEXT_FORMATTER
+
     # ---------------- File Handler ----------------
     file_handler = RotatingFileHandler(
         LOG_FILE,
-        maxBytes=2_000_000,  # 2 MB
+        maxBytes=20_000_000,  # 20 MB
         backupCount=5,
         encoding="utf-8"
     )
-    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(formatter)
 
     # ---------------- Console Handler ----------------
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-
-    # ---------------- Formatter ----------------
-    formatter = logging.Formatter(
-        "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-        "%Y-%m-%d %H:%M:%S"
+    console_handler.setLevel(CONSOLE_LOG_LEVEL)
+    console_handler.setFormatter(TEXT_FORMATTER)
+
+    # ---------------- Queue ----------------
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    logger.addHandler(NonBlockingQueueHandler(log_queue))
+
+    _listener = QueueListener(
+        log_queue,
+        file_handler,
+        console_handler,
+        respect_handler_level=True
     )
+    _listener.start()
+    atexit.register(_listener.stop)
 
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-
-    # ---------------- Attach Handlers ----------------
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-
-    # Prevent double logging
-    logger.propagate = False
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
 
     return logger
 
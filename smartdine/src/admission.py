@@ -0,0 +1,187 @@
+"""
+admission.py
+Admission control and request deadlines for the API.
+
+AdmissionMiddleware (pure ASGI, so streaming responses keep their slot
+until the last byte) guards the recommendation routes:
+
+- up to MAX_CONCURRENT_REQUESTS run at once
+- up to MAX_QUEUED_REQUESTS wait, each for at most QUEUE_TIMEOUT_MS
+- anything else gets an immediate 503 with Retry-After
+
+Every admitted request gets a Deadline that starts at arrival, so time
+spent queued counts against it. Routes read it with request_deadline()
+and pass it to SmartDineRecommender, which degrades step by step as the
+budget runs low (config.DEGRADE_*_MS).
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import (
+    MAX_CONCURRENT_REQUESTS,
+    MAX_QUEUED_REQUESTS,
+    QUEUE_TIMEOUT_MS,
+    REQUEST_DEADLINE_MS
+)
+from metrics import counter, gauge, METRICS_ENABLED
+
+ADMISSIONS = counter(
+    "smartdine_admission_total",
+    "Recommendation requests by admission result (admitted/queued/rejected_full/rejected_timeout).",
+    ["result"]
+)
+
+GUARDED_PATHS = ("/recommend", "/recommend/stream")
+DEADLINE_HEADER = b"x-smartdine-deadline-ms"
+SCOPE_KEY = "smartdine.deadline"
+
+
+# ---------------- DEADLINE ---------------- #
+
+class Deadline:
+    """Time budget for one request, measured from `start` (perf_counter)."""
+
+    def __init__(self, budget_ms=REQUEST_DEADLINE_MS, start=None):
+        self.budget_ms = budget_ms
+        self.start = time.perf_counter() if start is None else start
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def remaining_ms(self):
+        return max(0.0, self.budget_ms - self.elapsed_ms())
+
+    def remaining(self):
+        """Seconds left, for timeouts."""
+        return self.remaining_ms() / 1000
+
+    @property
+    def expired(self):
+        return self.remaining_ms() <= 0
+
+
+def request_deadline(request):
+    """Deadline set by AdmissionMiddleware, or a fresh default one."""
+    return request.scope.get(SCOPE_KEY) or Deadline()
+
+
+# ---------------- ADMISSION ---------------- #
+
+class AdmissionController:
+    """Concurrency cap with a bounded FIFO queue. Event-loop only."""
+
+    def __init__(
+        self,
+        max_concurrent=MAX_CONCURRENT_REQUESTS,
+        max_queued=MAX_QUEUED_REQUESTS,
+        queue_timeout_ms=QUEUE_TIMEOUT_MS
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.active = 0
+        self.queued = 0
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    async def acquire(self, deadline):
+        """True once a slot is held; False to reject (queue full or wait timed out)."""
+        if not self._slots.locked():
+            await self._slots.acquire()
+            self.active += 1
+            self._record("admitted")
+            return True
+
+        if self.queued >= self.max_queued:
+            self._record("rejected_full")
+            return False
+
+        self.queued += 1
+        try:
+            timeout = min(self.queue_timeout, deadline.remaining())
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._record("rejected_timeout")
+            return False
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        self._record("queued")
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    @staticmethod
+    def _record(result):
+        if METRICS_ENABLED:
+            ADMISSIONS.inc(result=result)
+
+
+class AdmissionMiddleware:
+
+    def __init__(self, app, controller=None, paths=GUARDED_PATHS):
+        self.app = app
+        self.controller = controller or AdmissionController()
+        self.paths = set(paths)
+
+        gauge(
+            "smartdine_admission_requests",
+            "Recommendation requests currently running and queued.",
+            ["state"],
+            fn=lambda: {("active",): self.controller.active, ("queued",): self.controller.queued}
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(self._budget_ms(scope))
+
+        if not await self.controller.acquire(deadline):
+            await self._reject(send)
+            return
+
+        try:
+            scope[SCOPE_KEY] = deadline
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    @staticmethod
+    def _budget_ms(scope):
+        for name, value in scope.get("headers", []):
+            if name == DEADLINE_HEADER:
+                try:
+                    return max(0, min(int(value), REQUEST_DEADLINE_MS))
+                except ValueError:
+                    break
+        return REQUEST_DEADLINE_MS
+
+    @staticmethod
+    async def _reject(send):
+        body = json.dumps({
+            "error": "overloaded",
+            "message": "SmartDine is at capacity, please retry shortly"
+        }).encode("utf-8")
+
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", b"1")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
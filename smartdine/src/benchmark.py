@@ -0,0 +1,622 @@
+"""
+benchmark.py
+End-to-end latency benchmark for SmartDine.
+
+Builds a synthetic multi-city catalog, indexes it with
+`build_city_faiss_indexes`, replaces the LLM and weather externals with
+local fakes of configurable latency and replays a realistic query mix
+against `SmartDineRecommender.recommend` and the FastAPI app.
+
+Every stage reports latency percentiles, throughput and memory, and the
+whole run is written as JSON so runs can be compared over time.
+
+Usage:
+    python src/benchmark.py --items 100000 --cities 12 --queries 500
+    python src/benchmark.py --compare benchmarks/results/<baseline>.json
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import importlib
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# ---------------- PATHS ---------------- #
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(SRC_DIR)
+ROOT_DIR = os.path.dirname(PACKAGE_DIR)
+
+for path in (SRC_DIR, PACKAGE_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.append(path)
+
+RESULTS_DIR = os.path.join(PACKAGE_DIR, "benchmarks", "results")
+
+from faiss_index import build_city_faiss_indexes, search_city, EMBEDDING_DIM
+from mood_model import MoodModel
+from recommender import SmartDineRecommender, FAISS_TOP_K
+from metrics import collect_timings
+
+
+# ---------------- SYNTHETIC CATALOG ---------------- #
+
+CITY_NAMES = [
+    "Chennai", "Mumbai", "Bangalore", "Delhi", "Hyderabad", "Kolkata",
+    "Pune", "Ahmedabad", "Jaipur", "Lucknow", "Kochi", "Indore",
+    "Chandigarh", "Coimbatore", "Nagpur", "Surat", "Bhopal", "Mysore",
+    "Goa", "Visakhapatnam"
+]
+
+CUISINES = [
+    "North Indian", "South Indian", "Chinese", "Italian", "Pizza",
+    "Biryani", "Tandoor", "Desserts", "Beverages", "Salad", "Fast Food",
+    "Street Food", "Continental", "Mughlai", "Bakery", "Healthy Food",
+    "Juices", "Burger", "Seafood", "Chettinad"
+]
+
+DISHES = [
+    "Paneer Tikka", "Butter Chicken", "Masala Dosa", "Margherita Pizza",
+    "Chicken Biryani", "Veg Hakka Noodles", "Gulab Jamun", "Cold Coffee",
+    "Greek Salad", "Chole Bhature", "Pav Bhaji", "Pasta Alfredo",
+    "Tandoori Chicken", "Chocolate Brownie", "Fish Curry", "Idli Sambar",
+    "Cheese Burger", "Mutton Rogan Josh", "Fresh Lime Soda", "Veg Momos",
+    "Chilli Paneer", "Dal Makhani", "Hot and Sour Soup", "Falooda"
+]
+
+DISH_STYLES = ["", "Special ", "Classic ", "Spicy ", "Cheesy ", "Jumbo "]
+
+# (weight, query) - shaped after the queries we see in production logs
+QUERY_MIX = [
+    (0.16, "something cheesy and italian"),
+    (0.12, "cheap"),
+    (0.10, "spicy"),
+    (0.08, "dessert"),
+    (0.10, "comfort food after a rough day"),
+    (0.07, "paneer tikka"),
+    (0.06, "healthy salad"),
+    (0.06, "party snacks with friends"),
+    (0.05, "not expensive biryani"),
+    (0.05, "hot and spicy food"),
+    (0.05, "italian but not too heavy"),
+    (0.04, "something sweet with chocolate"),
+    (0.03, "fine dining premium dinner"),
+    (0.03, "margherita"),
+]
+
+
+def city_names(n_cities):
+    names = CITY_NAMES[:n_cities]
+    names += [f"City{i}" for i in range(len(names), n_cities)]
+    return names
+
+
+def city_weights(n_cities, skew=1.1):
+    """Zipf-like weights: a few metros hold most of the catalog and traffic."""
+    w = 1.0 / np.arange(1, n_cities + 1) ** skew
+    return w / w.sum()
+
+
+def build_synthetic_catalog(n_items, n_cities, seed=0):
+    """
+    Build a preprocessed-looking dataframe with the columns the
+    recommender and the index builder read.
+    """
+    rng = np.random.default_rng(seed)
+
+    names = city_names(n_cities)
+    counts = rng.multinomial(n_items, city_weights(n_cities))
+
+    City = np.repeat(np.array(names, dtype=object), counts)
+    n = len(City)
+
+    restaurant_ids = rng.integers(0, max(n // 25, 1), n)
+    dishes = np.array(DISHES, dtype=object)[rng.integers(0, len(DISHES), n)]
+    styles = np.array(DISH_STYLES, dtype=object)[rng.integers(0, len(DISH_STYLES), n)]
+    cuisines = np.array(CUISINES, dtype=object)[rng.integers(0, len(CUISINES), n)]
+
+    prices = np.round(rng.gamma(2.0, 150.0, n))
+    ratings = np.round(np.clip(rng.normal(3.9, 0.5, n), 1.0, 5.0), 1)
+    votes = rng.integers(0, 5000, n)
+    popularity = rng.integers(0, 2000, n)
+
+    df = pd.DataFrame({
+        "City": City,
+        "city": pd.Series(City).str.lower().to_numpy(),
+        "Restaurant_Name": "Restaurant " + pd.Series(restaurant_ids).astype(str),
+        "Item_Name": pd.Series(styles) + pd.Series(dishes),
+        "Cuisine": cuisines,
+        "Prices": prices,
+        "Average_Rating": ratings,
+        "Votes": votes,
+        "Restaurant_Popularity": popularity,
+        "Is_Bestseller": (rng.random(n) < 0.15).astype(int),
+        "Is_Expensive": (prices > 400).astype(int),
+        "Is_Highly_Rated": (ratings >= 4.0).astype(int),
+        "Avg_Rating_Restaurant": np.round(np.clip(ratings + rng.normal(0, 0.2, n), 1, 5), 1),
+    })
+
+    # Same template as preprocess.build_embedding_text, vectorized
+    df["embedding_text"] = (
+        "Dish: " + df["Item_Name"] + ". "
+        + "Cuisine: " + df["Cuisine"] + ". "
+        + "Restaurant: " + df["Restaurant_Name"] + ". "
+        + "City: " + df["city"] + ". "
+        + "Price: " + np.where(df["Is_Expensive"] == 1, "expensive", "affordable") + ". "
+        + "Rating: " + np.where(df["Is_Highly_Rated"] == 1, "highly rated", "average rated") + ". "
+        + np.where(df["Is_Bestseller"] == 1, "Bestseller dish.", "Regular menu item.") + " "
+        + "Average restaurant rating " + df["Avg_Rating_Restaurant"].astype(str) + ". "
+        + "Popular choice with " + df["Votes"].astype(str) + " votes."
+    )
+
+    return df
+
+
+def build_workload(n_queries, n_cities, surprise_ratio=0.1, n_sessions=200, seed=0):
+    rng = random.Random(seed)
+
+    names = [c.lower() for c in city_names(n_cities)]
+    c_weights = city_weights(n_cities).tolist()
+    queries = [q for _, q in QUERY_MIX]
+    q_weights = [w for w, _ in QUERY_MIX]
+
+    workload = []
+    for _ in range(n_queries):
+        surprise = rng.random() < surprise_ratio
+        workload.append({
+            "query": "" if surprise else rng.choices(queries, q_weights)[0],
+            "city": rng.choices(names, c_weights)[0],
+            "surprise": surprise,
+            "session_id": f"bench-{rng.randrange(n_sessions)}"
+        })
+
+    return workload
+
+
+# ---------------- LOCAL FAKES ---------------- #
+
+class HashingEncoder:
+    """
+    Deterministic bag-of-words stand-in for the sentence model.
+
+    Texts that share tokens get similar vectors, which is all the
+    retrieval stages need; it encodes millions of rows in minutes.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, vocab_size=1 << 15, seed=0):
+        rng = np.random.default_rng(seed)
+        self.table = rng.standard_normal((vocab_size, dim)).astype("float32")
+        self.vocab_size = vocab_size
+        self.dim = dim
+        self._token_ids = {}
+
+    def _ids(self, text):
+        ids = []
+        for tok in text.lower().split():
+            tid = self._token_ids.get(tok)
+            if tid is None:
+                tid = zlib.crc32(tok.encode("utf-8")) % self.vocab_size
+                self._token_ids[tok] = tid
+            ids.append(tid)
+        return ids
+
+    def encode(self, texts, convert_to_numpy=True, convert_to_tensor=False, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            ids = self._ids(str(text))
+            if ids:
+                out[i] = self.table[ids].sum(axis=0)
+
+        return out[0] if single else out
+
+
+class FakeExplainer:
+    """LLMExplainer stand-in with configurable latency."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sleep(self):
+        with self._lock:
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def explain(self, *, item, city, mood=None, weather=None, surprise=False, timeout_ms=None):
+        self._sleep()
+        return f"{item.get('Item_Name', 'This dish')} from {item.get('Restaurant_Name', 'this restaurant')} suits a {mood or 'good'} mood in {city}."
+
+    def explain_batch(self, *, items, city, mood=None, weather=None, weather_index=None, surprise=False, timeout_ms=None):
+        """One round-trip for all items, like LLMExplainer in batch mode."""
+        self._sleep()
+        return [
+            f"{item.get('Item_Name', 'This dish')} from {item.get('Restaurant_Name', 'this restaurant')} suits a {mood or 'good'} mood in {city}."
+            for item in items
+        ]
+
+
+class FakeWeather:
+    """
+    get_weather stand-in. Mirrors the real TTL cache: only a miss pays
+    the configured latency.
+    """
+
+    CATEGORIES = ["hot", "cold", "rainy", "cloudy", "pleasant"]
+
+    def __init__(self, latency_ms=0.0, cache_ttl=600):
+        self.latency_ms = latency_ms
+        self.cache_ttl = cache_ttl
+        self._cache = {}
+
+    def __call__(self, city):
+        city_key = city.lower().strip()
+        now = time.time()
+
+        cached = self._cache.get(city_key)
+        if cached and now - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+
+        category = self.CATEGORIES[zlib.crc32(city_key.encode("utf-8")) % len(self.CATEGORIES)]
+        data = {"city": city, "temp_c": 25, "condition": category, "category": category}
+        self._cache[city_key] = (now, data)
+        return data
+
+
+# ---------------- MEASUREMENT ---------------- #
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+@contextmanager
+def stage(name, results):
+    """Record wall time and memory for one benchmark stage."""
+    print(f"\n[BENCH] Stage: {name}")
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+
+    entry = {}
+    yield entry
+
+    entry["wall_s"] = round(time.perf_counter() - start, 4)
+    rss_after = _rss_mb()
+    entry["rss_mb"] = round(rss_after, 1)
+    entry["rss_delta_mb"] = round(rss_after - rss_before, 1)
+    peak = _peak_rss_mb()
+    entry["peak_rss_mb"] = round(peak, 1) if peak is not None else None
+
+    results[name] = entry
+    print(f"[BENCH] {name}: {json.dumps(entry)}")
+
+
+def summarize_latencies(latencies_s, wall_s, errors=0):
+    lat = np.asarray(latencies_s, dtype="float64") * 1000
+    if lat.size == 0:
+        return {"count": 0, "errors": errors}
+
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    return {
+        "count": int(lat.size),
+        "errors": errors,
+        "latency_ms": {
+            "mean": round(float(lat.mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(lat.max()), 3),
+        },
+        "throughput_rps": round(lat.size / wall_s, 2) if wall_s > 0 else None,
+    }
+
+
+def summarize_stage_timings(timings_list):
+    """Per-stage percentiles from `collect_timings` dicts (milliseconds)."""
+    per_stage = {}
+    for timings in timings_list:
+        for name, ms in timings.items():
+            per_stage.setdefault(name, []).append(ms)
+
+    summary = {}
+    for name, values in sorted(per_stage.items()):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary[name] = {
+            "calls": len(values),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+        }
+    return summary
+
+
+def run_load(fn, workload, concurrency=1):
+    """
+    Closed-loop replay: `concurrency` workers issue requests back to back.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def call(req):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            fn(req)
+            ok = True
+        except Exception as e:
+            ok = False
+            print(f"[BENCH] request failed: {e!r}")
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for req in workload:
+            call(req)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(call, workload))
+    wall = time.perf_counter() - start
+
+    return summarize_latencies(latencies, wall, errors)
+
+
+# ---------------- API SERVER ---------------- #
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def serve_api(recommender):
+    """
+    Run the real FastAPI app in-process with `recommender` installed,
+    on a background uvicorn server.
+    """
+    import uvicorn
+
+    api = importlib.import_module(f"{os.path.basename(PACKAGE_DIR)}.api")
+    api.recommender = recommender
+
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("API server failed to start")
+        time.sleep(0.05)
+
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+# ---------------- COMPARISON ---------------- #
+
+def compare_results(current, baseline, tolerance=0.10):
+    """
+    Compare latency percentiles stage by stage.
+    Returns a list of regressions beyond `tolerance`.
+    """
+    regressions = []
+
+    print(f"\n[BENCH] Comparing against baseline from {baseline['meta'].get('timestamp')}")
+    for name, entry in current["stages"].items():
+        base = baseline["stages"].get(name, {})
+        cur_lat = entry.get("latency_ms")
+        base_lat = base.get("latency_ms")
+        if not cur_lat or not base_lat:
+            continue
+
+        for pct in ("p50", "p95", "p99"):
+            cur, old = cur_lat[pct], base_lat[pct]
+            change = (cur - old) / old if old else 0.0
+            flag = ""
+            if change > tolerance:
+                flag = "  <-- REGRESSION"
+                regressions.append({"stage": name, "percentile": pct, "baseline_ms": old, "current_ms": cur})
+            print(f"  {name:<12} {pct}: {old:>10.3f} -> {cur:>10.3f} ms ({change:+.1%}){flag}")
+
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PACKAGE_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ---------------- MAIN ---------------- #
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SmartDine end-to-end latency benchmark")
+    parser.add_argument("--items", type=int, default=10_000, help="catalog size (10k to 10M)")
+    parser.add_argument("--cities", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--surprise-ratio", type=float, default=0.1)
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="fake LLM latency per call")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--weather-ms", type=float, default=150.0, help="fake weather latency on cache miss")
+    parser.add_argument("--encoder", choices=["hashing", "torch", "onnx"], default="hashing",
+                        help="hashing: fast deterministic fake; torch/onnx: the real encoder backends")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--workdir", help="keep indexes here instead of a temp dir")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="result JSON path")
+    parser.add_argument("--compare", help="baseline result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    return parser.parse_args(argv)
+
+
+def run_benchmark(args):
+    stages = {}
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="smartdine-bench-")
+    faiss_dir = os.path.join(workdir, "faiss_indexes")
+
+    if args.encoder == "hashing":
+        encoder = HashingEncoder(seed=args.seed)
+    else:
+        from encoder import get_encoder
+        encoder = get_encoder(args.encoder)
+
+    workload = build_workload(args.queries, args.cities, args.surprise_ratio, seed=args.seed)
+
+    try:
+        with stage("catalog", stages) as entry:
+            df = build_synthetic_catalog(args.items, args.cities, seed=args.seed)
+            entry["rows"] = len(df)
+            entry["df_mb"] = round(df.memory_usage(deep=True).sum() / 2**20, 1)
+
+        with stage("index_build", stages) as entry:
+            build_city_faiss_indexes(df=df, model=encoder, faiss_dir=faiss_dir)
+            entry["index_mb"] = round(
+                sum(os.path.getsize(os.path.join(dp, f)) for dp, _, fs in os.walk(faiss_dir) for f in fs) / 2**20, 1
+            )
+
+        searches = [w for w in workload if not w["surprise"]]
+
+        with stage("encode", stages) as entry:
+            entry.update(run_load(lambda w: encoder.encode([w["query"]]), searches))
+
+        query_vecs = {w["query"]: encoder.encode([w["query"]]) for w in searches}
+
+        with stage("search", stages) as entry:
+            entry.update(run_load(
+                lambda w: search_city(query_vecs[w["query"]], w["city"], FAISS_TOP_K, faiss_dir),
+                searches,
+                args.concurrency
+            ))
+
+        recommender = SmartDineRecommender(
+            df=df,
+            model=encoder,
+            mood_model=MoodModel(model=encoder),
+            explainer=FakeExplainer(args.llm_ms, args.llm_jitter_ms, seed=args.seed),
+            weather_fn=FakeWeather(args.weather_ms),
+            faiss_dir=faiss_dir
+        )
+
+        stage_timings = []
+
+        def recommend(w):
+            with collect_timings() as timings:
+                recommender.recommend(**w)
+            stage_timings.append(timings)
+
+        with stage("recommend", stages) as entry:
+            entry.update(run_load(recommend, workload, args.concurrency))
+            entry["stages_ms"] = summarize_stage_timings(stage_timings)
+
+        if not args.skip_api:
+            import requests
+
+            with serve_api(recommender) as base_url:
+                session = requests.Session()
+
+                def post(w):
+                    res = session.post(f"{base_url}/recommend", json=w, timeout=60)
+                    res.raise_for_status()
+
+                with stage("api", stages) as entry:
+                    entry.update(run_load(post, workload, args.concurrency))
+
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "stages": stages
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmark(args)
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"\n[BENCH] Results saved → {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions and args.fail_on_regression:
+            print(f"[BENCH] {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+city_catalog.py
+City list served by GET /cities.
+
+Built once when the recommender loads (and again whenever indexes are
+reloaded), not per request. "cities" lists the display names of the
+cities that can be served (what the frontend picker shows), "city_ids"
+the matching lowercase `city` keys. A city can be served when it has
+rows in the dataset (answered from its index, a retrieval shard in
+sharded mode, or the popular-item fallback) or a local index. Each
+"catalog" entry carries the item count and whether a FAISS index exists
+for the city on this host. The JSON body and its ETag are computed up
+front so the endpoint only compares headers and returns bytes.
+
+CityResolver maps the names users send (other spellings, typos) onto
+those keys.
+"""
+
+import os
+import sys
+import json
+import difflib
+import hashlib
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import CITY_ALIASES, CITY_MATCH_CUTOFF
+from faiss_index import FAISS_DIR
+from preprocess import CITY_STATS_OUTPUT
+
+
+# ---------------- CATALOG ---------------- #
+
+class CityCatalog:
+
+    def __init__(self, entries):
+        self.entries = sorted(entries, key=lambda e: e["id"])
+        served = sorted((e for e in self.entries if e["items"] or e["indexed"]), key=lambda e: e["name"])
+        self.payload = {
+            # Display names for the picker, as /cities always returned them
+            "cities": [e["name"] for e in served],
+            "city_ids": [e["id"] for e in served],
+            "catalog": self.entries
+        }
+        self.body = json.dumps(self.payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:16] + '"'
+
+    def matches(self, if_none_match):
+        """True if an If-None-Match header value covers the current ETag."""
+        if not if_none_match:
+            return False
+        tags = [t.strip() for t in if_none_match.split(",")]
+        # Weak comparison: W/"x" and "x" name the same representation
+        return "*" in tags or self.etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
+# ---------------- CITY NAMES ---------------- #
+
+class CityResolver:
+    """
+    Requested city -> known city key: the key itself, config.CITY_ALIASES,
+    then the closest known name (difflib ratio >= CITY_MATCH_CUTOFF).
+    Answers are cached per spelling, so repeats cost one dict lookup.
+    """
+
+    CACHE_SIZE = 10_000
+    SUGGEST_CUTOFF = 0.5
+
+    def __init__(self, known, aliases=CITY_ALIASES, cutoff=CITY_MATCH_CUTOFF):
+        self.known = sorted(set(known))
+        self._known = set(self.known)
+        self.aliases = {name: city for name, city in aliases.items() if city in self._known}
+        self.cutoff = cutoff
+        self._cache = {}
+
+    @staticmethod
+    def _key(city):
+        return " ".join(str(city).lower().split())
+
+    def resolve(self, city):
+        """Known city key, or None when nothing is close enough."""
+        key = self._key(city)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        if key in self._known:
+            match = key
+        elif key in self.aliases:
+            match = self.aliases[key]
+        else:
+            close = difflib.get_close_matches(key, self.known + list(self.aliases), n=1, cutoff=self.cutoff)
+            match = self.aliases.get(close[0], close[0]) if close else None
+
+        if len(self._cache) >= self.CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = match
+        return match
+
+    def suggest(self, city, n=3):
+        """Up to `n` known cities loosely resembling an unresolvable name."""
+        close = difflib.get_close_matches(
+            self._key(city), self.known + list(self.aliases), n=n * 2, cutoff=self.SUGGEST_CUTOFF
+        )
+        out = []
+        for name in close:
+            name = self.aliases.get(name, name)
+            if name not in out:
+                out.append(name)
+        return out[:n]
+
+# ---------------- BUILD ---------------- #
+
+def _counts_from_df(df):
+    keys = df["city"] if "city" in df.columns else df["City"].str.strip().str.lower()
+    keys = keys.dropna()
+
+    counts = keys.value_counts().to_dict()
+
+    names = {}
+    if "City" in df.columns:
+        # First raw spelling seen for each city key
+        raw = df.loc[keys.index, "City"].astype(str).str.strip()
+        names = raw.groupby(keys).first().to_dict()
+
+    return counts, names
+
+
+def _counts_from_stats(path):
+    stats = pd.read_csv(path)
+    return dict(zip(stats["city"], stats["restaurant_count"].astype(int))), {}
+
+
+def _indexed_cities(faiss_dir):
+    if not os.path.isdir(faiss_dir):
+        return set()
+    return {f[:-len(".index")] for f in os.listdir(faiss_dir) if f.endswith(".index")}
+
+
+def build_city_catalog(df=None, faiss_dir=FAISS_DIR, city_stats_path=CITY_STATS_OUTPUT):
+    """
+    Item counts come from `df` when given, otherwise from city_stats.csv
+    (preprocess.compute_city_statistics). Cities that only exist as an
+    index still appear, with items = 0.
+    """
+    if df is not None:
+        counts, names = _counts_from_df(df)
+    elif os.path.exists(city_stats_path):
+        counts, names = _counts_from_stats(city_stats_path)
+    else:
+        counts, names = {}, {}
+
+    indexed = _indexed_cities(faiss_dir)
+
+    entries = [
+        {
+            "id": city,
+            "name": names.get(city) or city.title(),
+            "items": int(counts.get(city, 0)),
+            "indexed": city in indexed
+        }
+        for city in set(counts) | indexed
+    ]
+
+    return CityCatalog(entries)
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import re
+from item_ids import item_ids, cuisine_ids
 
 # -------------------------------------------------
 # NORMALIZATION UTILITIES
@@ -131,15 +132,16 @@ for col in flag_cols:
         )
 
 # -------------------------------------------------
-# REMOVE DUPLICATES
+# STABLE IDS + REMOVE DUPLICATES
 # -------------------------------------------------
 
+# item_id hashes ITEM_KEY (restaurant, dish, place, city) and cuisine_id
+# the cuisine string; both stay the same across runs (see item_ids.py)
+df["item_id"] = item_ids(df)
+df["cuisine_id"] = cuisine_ids(df["Cuisine"])
+
 before = df.shape[0]
-df.drop_duplicates(
-    subset=["Restaurant_Name", "Item_Name", "Place_Name", "city"],
-    keep="first",
-    inplace=True
-)
+df.drop_duplicates(subset=["item_id"], keep="first", inplace=True)
 after = df.shape[0]
 print(f"[INFO] Removed duplicates: {before - after}")
 
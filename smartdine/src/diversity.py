@@ -0,0 +1,101 @@
+"""
+diversity.py
+Maximal marginal relevance (MMR) selection of the final recommendations.
+
+Each pick maximizes
+
+    MMR_LAMBDA * relevance - (1 - MMR_LAMBDA) * max cosine to the picks so far
+
+over the candidate pool, where relevance is the ranking's final_score
+scaled to 0..1 within the pool and the cosines come from the vectors
+already stored in the city indexes (faiss_index.item_vectors), so
+nothing is re-encoded. On top of that, at most MAX_PER_RESTAURANT picks
+share a restaurant and MAX_PER_CUISINE a primary cuisine; the limits are
+dropped only for the picks the pool cannot fill otherwise.
+
+Without vectors (e.g. the city index lives on a retrieval shard) the
+selection falls back to relevance plus the restaurant/cuisine limits.
+"""
+
+import os
+import sys
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import MMR_LAMBDA, MAX_PER_RESTAURANT, MAX_PER_CUISINE
+from metrics import counter, METRICS_ENABLED
+
+RELAXED = counter(
+    "smartdine_diversity_relaxed_total",
+    "Picks that had to break the per-restaurant / per-cuisine limit to fill the results."
+)
+
+
+def primary_cuisine(item):
+    """'North Indian, Chinese' -> 'north indian'"""
+    cuisine = item.get("Cuisine")
+    if not isinstance(cuisine, str):
+        return ""
+    return cuisine.split(",")[0].strip().lower()
+
+
+def _codes(keys):
+    """Small integer code per distinct key, so limits are checked as array lookups."""
+    index = {}
+    return np.array([index.setdefault(k, len(index)) for k in keys], dtype=np.int64), len(index)
+
+
+def mmr_select(items, relevance, k, vectors=None, lam=MMR_LAMBDA,
+               max_per_restaurant=MAX_PER_RESTAURANT, max_per_cuisine=MAX_PER_CUISINE):
+    """
+    Up to `k` of `items`, in pick order. `relevance` is one score per
+    item (higher is better); `vectors` are their normalized index
+    vectors, shape (n, d), or None.
+    """
+    n = len(items)
+    if n == 0 or k <= 0:
+        return []
+
+    rel = np.asarray(relevance, dtype="float32")
+    spread = float(rel.max() - rel.min())
+    rel = (rel - rel.min()) / spread if spread > 0 else np.ones(n, dtype="float32")
+
+    sim = vectors @ vectors.T if vectors is not None else None
+
+    restaurants, n_restaurants = _codes(str(i.get("Restaurant_Name", "")).strip().lower() for i in items)
+    cuisines, n_cuisines = _codes(primary_cuisine(i) for i in items)
+    per_restaurant = np.zeros(n_restaurants, dtype=np.int64)
+    per_cuisine = np.zeros(n_cuisines, dtype=np.int64)
+
+    redundancy = np.zeros(n, dtype="float32")   # max cosine to anything picked
+    available = np.ones(n, dtype=bool)
+    picks = []
+
+    for strict in (True, False):
+        while len(picks) < min(k, n):
+            allowed = available.copy()
+            if strict:
+                if max_per_restaurant > 0:
+                    allowed &= per_restaurant[restaurants] < max_per_restaurant
+                if max_per_cuisine > 0:
+                    allowed &= per_cuisine[cuisines] < max_per_cuisine
+            if not allowed.any():
+                break
+
+            score = lam * rel - (1.0 - lam) * redundancy
+            score[~allowed] = -np.inf
+            i = int(np.argmax(score))
+
+            picks.append(i)
+            available[i] = False
+            per_restaurant[restaurants[i]] += 1
+            per_cuisine[cuisines[i]] += 1
+            if sim is not None:
+                np.maximum(redundancy, sim[i], out=redundancy)
+            if not strict and METRICS_ENABLED:
+                RELAXED.inc()
+
+    return [items[i] for i in picks]
@@ -0,0 +1,146 @@
+"""
+encoder.py
+Sentence encoders behind one `encode(texts)` interface.
+
+Backends (config.ENCODER_BACKEND):
+- "torch": sentence-transformers on PyTorch (full precision, default)
+- "onnx":  int8-quantized ONNX export of the same model, run with
+           onnxruntime. Never imports torch.
+
+Build and validate the ONNX model with `python src/export_encoder.py`.
+"""
+
+import os
+import sys
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import (
+    EMBEDDING_MODEL_NAME,
+    ENCODER_BACKEND,
+    ENCODER_MAX_LENGTH,
+    ENCODER_THREADS,
+    ONNX_MODEL_DIR,
+    ONNX_MODEL_FILE
+)
+from metrics import record_batch
+
+
+# ---------------- TORCH ---------------- #
+
+class TorchEncoder:
+    """Thin wrapper so callers never depend on sentence-transformers directly."""
+
+    name = "torch"
+
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts, batch_size=64, show_progress_bar=False, **kwargs):
+        single = isinstance(texts, str)
+        record_batch(self.name, 1 if single else len(texts))
+
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True
+        ).astype("float32")
+
+
+# ---------------- ONNX ---------------- #
+
+class OnnxEncoder:
+    """
+    MiniLM exported to ONNX with int8 dynamic quantization.
+
+    Reproduces the sentence-transformers pipeline for all-MiniLM-L6-v2:
+    transformer -> attention-masked mean pooling -> L2 normalize.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_dir=ONNX_MODEL_DIR,
+        model_file=ONNX_MODEL_FILE,
+        max_length=ENCODER_MAX_LENGTH,
+        num_threads=ENCODER_THREADS
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, model_file)
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+
+        if not os.path.exists(model_path) or not os.path.exists(tokenizer_path):
+            raise FileNotFoundError(
+                f"ONNX encoder not found in {model_dir}. Run: python src/export_encoder.py"
+            )
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+
+        input_ids = np.array([e.ids for e in encodings], dtype="int64")
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype="int64")
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype="int64")
+
+        hidden = self.session.run(None, feeds)[0]
+
+        mask = attention_mask[:, :, None].astype("float32")
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype("float32")
+
+    def encode(self, texts, batch_size=64, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        record_batch(self.name, len(texts))
+
+        out = [
+            self._encode_batch([str(t) for t in texts[i:i + batch_size]])
+            for i in range(0, len(texts), batch_size)
+        ]
+        embeddings = np.vstack(out) if out else np.zeros((0, 0), dtype="float32")
+
+        return embeddings[0] if single else embeddings
+
+
+# ---------------- FACTORY ---------------- #
+
+def get_encoder(backend=None):
+    backend = backend or ENCODER_BACKEND
+
+    if backend == "torch":
+        return TorchEncoder()
+    if backend == "onnx":
+        return OnnxEncoder()
+
+    raise ValueError(f"Unknown encoder backend: {backend!r} (expected 'torch' or 'onnx')")
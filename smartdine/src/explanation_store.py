@@ -0,0 +1,352 @@
+"""
+explanation_store.py
+Pre-generated explanations for each city's top items.
+
+An offline job asks the LLM (through LLMExplainer, rate-limited) for a
+few explanation variants per (item, mood, weather category) of every
+city's PREGEN_TOP_ITEMS items, and LLMExplainer serves them before it
+calls the LLM.
+
+    EXPLANATION_STORE_DIR/journal.jsonl     one line per generated key
+    EXPLANATION_STORE_DIR/store/keys.npy    sorted uint64 keys
+    EXPLANATION_STORE_DIR/store/starts.npy  key i -> variants starts[i]:starts[i+1]
+    EXPLANATION_STORE_DIR/store/offsets.npy variant j -> texts.bin[offsets[j]:offsets[j+1]]
+    EXPLANATION_STORE_DIR/store/texts.bin   UTF-8 text, all variants
+
+The key hashes the city, the item facts the prompt uses (dish,
+restaurant, cuisine, rating, price), the mood and the weather category.
+When the menu or an item's rating changes its key changes too, so
+`generate` only asks for keys that are not in the journal yet and
+`compile` drops keys that are no longer wanted. Every key is appended to
+the journal as soon as it is generated, so an interrupted run resumes
+where it stopped. The compiled arrays are memory-mapped, so loading
+them costs nothing up front and the pages are shared between workers.
+
+Usage:
+    python src/explanation_store.py generate [--data path.csv] [--top 50] [--rate 2]
+    python src/explanation_store.py compile
+    python src/explanation_store.py stats
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import argparse
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import (
+    EXPLANATION_STORE_DIR,
+    PREGEN_TOP_ITEMS,
+    PREGEN_VARIANTS,
+    PREGEN_RATE_PER_SECOND,
+    PREPROCESSED_DATA
+)
+from metrics import record_cache
+from intent_lists import base_feature_score
+
+JOURNAL_FILE = "journal.jsonl"
+STORE_DIR = "store"
+
+# Weather categories from weather._classify_weather; "none" is an item
+# explained without weather (every result except the weather pick)
+WEATHER_KEYS = ("none", "hot", "cold", "rainy", "cloudy", "pleasant")
+
+
+# ---------------- KEYS ---------------- #
+
+def _rating(value):
+    try:
+        return f"{float(value):.1f}"
+    except (TypeError, ValueError):
+        return "n/a"
+
+
+def weather_key(weather):
+    category = weather.get("category") if weather else None
+    return category if category in WEATHER_KEYS else "none"
+
+
+def explanation_key(item, city, mood, weather):
+    """uint64 key of one (item facts, city, mood, weather category)."""
+    parts = (
+        str(city).strip().lower(),
+        str(item.get("Item_Name", "")),
+        str(item.get("Restaurant_Name", "")),
+        str(item.get("Cuisine", "")),
+        _rating(item.get("Average_Rating")),
+        "budget" if item.get("Is_Expensive") == 0 else "premium",
+        str(mood or "").lower(),
+        weather_key(weather)
+    )
+    digest = hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+# ---------------- STORE ---------------- #
+
+class ExplanationStore:
+    """Read side: memory-mapped lookup of pre-generated variants."""
+
+    def __init__(self, keys=None, starts=None, offsets=None, texts=b""):
+        self.keys = keys if keys is not None else np.zeros(0, dtype=np.uint64)
+        self.starts = starts if starts is not None else np.zeros(1, dtype=np.int64)
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self.texts = texts
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def open(cls, root=EXPLANATION_STORE_DIR):
+        """The compiled store under `root`, or an empty one if there is none."""
+        path = os.path.join(root, STORE_DIR)
+        if not os.path.exists(os.path.join(path, "keys.npy")):
+            return cls()
+
+        keys = np.load(os.path.join(path, "keys.npy"), mmap_mode="r")
+        starts = np.load(os.path.join(path, "starts.npy"), mmap_mode="r")
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        texts_path = os.path.join(path, "texts.bin")
+        texts = np.memmap(texts_path, dtype=np.uint8, mode="r") if os.path.getsize(texts_path) else b""
+
+        print(f"[INFO] Explanation store: {len(keys)} keys, {len(offsets) - 1} variants")
+        return cls(keys, starts, offsets, texts)
+
+    def lookup(self, *, item, city, mood, weather=None):
+        """A random pre-generated variant, or None to call the LLM."""
+        if not len(self.keys):
+            return None
+
+        key = explanation_key(item, city, mood, weather)
+        i = int(np.searchsorted(self.keys, np.uint64(key)))
+        if i >= len(self.keys) or int(self.keys[i]) != key:
+            record_cache("explanations", hit=False)
+            return None
+
+        record_cache("explanations", hit=True)
+        return self._text(random.randrange(int(self.starts[i]), int(self.starts[i + 1])))
+
+    def _text(self, j):
+        return bytes(self.texts[int(self.offsets[j]):int(self.offsets[j + 1])]).decode("utf-8")
+
+
+# ---------------- JOURNAL ---------------- #
+
+def read_journal(root=EXPLANATION_STORE_DIR):
+    """key -> journal entry; later lines win."""
+    entries = {}
+    path = os.path.join(root, JOURNAL_FILE)
+    if not os.path.exists(path):
+        return entries
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue   # torn last line of an interrupted run
+            if entry.get("variants"):
+                entries[int(entry["key"], 16)] = entry
+    return entries
+
+
+def compile_store(root=EXPLANATION_STORE_DIR, keep=None):
+    """
+    Write the memory-mapped store from the journal. With `keep` (a set of
+    keys), entries outside it are dropped from both store and journal.
+    The new store is built aside and swapped in by rename.
+    """
+    entries = read_journal(root)
+    if keep is not None:
+        entries = {k: e for k, e in entries.items() if k in keep}
+
+    keys = np.array(sorted(entries), dtype=np.uint64)
+    starts, offsets, chunks, size = [0], [0], [], 0
+    for key in keys:
+        for text in entries[int(key)]["variants"]:
+            data = text.encode("utf-8")
+            chunks.append(data)
+            size += len(data)
+            offsets.append(size)
+        starts.append(len(offsets) - 1)
+
+    build_path = os.path.join(root, ".building-store")
+    shutil.rmtree(build_path, ignore_errors=True)
+    os.makedirs(build_path)
+
+    np.save(os.path.join(build_path, "keys.npy"), keys)
+    np.save(os.path.join(build_path, "starts.npy"), np.array(starts, dtype=np.int64))
+    np.save(os.path.join(build_path, "offsets.npy"), np.array(offsets, dtype=np.int64))
+    with open(os.path.join(build_path, "texts.bin"), "wb") as f:
+        f.write(b"".join(chunks))
+
+    final_path = os.path.join(root, STORE_DIR)
+    old_path = os.path.join(root, ".old-store")
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(final_path):
+        os.rename(final_path, old_path)
+    os.rename(build_path, final_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    if keep is not None:
+        # Compact the journal to what the store holds
+        journal = os.path.join(root, JOURNAL_FILE)
+        with open(journal + ".tmp", "w", encoding="utf-8") as f:
+            for key in keys:
+                f.write(json.dumps(entries[int(key)]) + "\n")
+        os.replace(journal + ".tmp", journal)
+
+    print(f"[SUCCESS] Explanation store: {len(keys)} keys, {len(offsets) - 1} variants, {size} bytes → {final_path}")
+    return len(keys)
+
+
+# ---------------- GENERATION ---------------- #
+
+def top_items(df, top_n=PREGEN_TOP_ITEMS):
+    """(city, item dict) for each city's top_n items by base feature score."""
+    scores = base_feature_score(
+        df["Average_Rating"].to_numpy(dtype="float64"),
+        df["Restaurant_Popularity"].to_numpy(dtype="float64"),
+        df["Is_Bestseller"].to_numpy()
+    )
+    ranked = df.assign(_score=scores).sort_values(["city", "_score"], ascending=[True, False], kind="stable")
+
+    for city, city_df in ranked.groupby("city", sort=True):
+        for item in city_df.head(top_n).drop(columns="_score").to_dict("records"):
+            yield str(city), item
+
+
+def plan_keys(df, moods, weathers=WEATHER_KEYS, top_n=PREGEN_TOP_ITEMS):
+    """key -> (city, item, mood, weather category) for everything the store should hold."""
+    wanted = {}
+    for city, item in top_items(df, top_n):
+        for mood in moods:
+            for category in weathers:
+                weather = None if category == "none" else {"category": category}
+                wanted[explanation_key(item, city, mood, weather)] = (city, item, mood, category)
+    return wanted
+
+
+def generate(explainer, df, moods, root=EXPLANATION_STORE_DIR, top_n=PREGEN_TOP_ITEMS,
+             variants=PREGEN_VARIANTS, weathers=WEATHER_KEYS, limit=None):
+    """
+    Generate every planned key missing from the journal, then compile.
+    Keys the LLM gave nothing for are left out and retried next run.
+    """
+    os.makedirs(root, exist_ok=True)
+    wanted = plan_keys(df, moods, weathers, top_n)
+    done = read_journal(root)
+    todo = [key for key in wanted if key not in done]
+    if limit is not None:
+        todo = todo[:limit]
+
+    print(f"[INFO] {len(wanted)} keys planned, {len(wanted) - len(todo)} already generated, {len(todo)} to go")
+
+    breaker = explainer.gateway.breaker
+    generated = failed = 0
+    start = time.perf_counter()
+
+    with open(os.path.join(root, JOURNAL_FILE), "a", encoding="utf-8") as journal:
+        for n, key in enumerate(todo, start=1):
+            city, item, mood, category = wanted[key]
+
+            while not breaker.allow():
+                # Provider is down: wait for the breaker's probe to close it
+                time.sleep(breaker.probe_seconds)
+
+            texts = explainer.explain_variants(
+                item=item,
+                city=city.title(),
+                mood=mood,
+                weather=None if category == "none" else {"category": category},
+                n=variants
+            )
+            if not texts:
+                failed += 1
+                continue
+
+            journal.write(json.dumps({
+                "key": f"{key:016x}",
+                "city": city,
+                "dish": item.get("Item_Name"),
+                "restaurant": item.get("Restaurant_Name"),
+                "mood": mood,
+                "weather": category,
+                "variants": texts
+            }) + "\n")
+            journal.flush()
+            generated += 1
+
+            if n % 100 == 0:
+                print(f"[INFO] {n}/{len(todo)} keys ({time.perf_counter() - start:.0f}s)")
+
+    print(f"[INFO] Generated {generated} keys, {failed} failed (retried next run)")
+    return compile_store(root, keep=set(wanted))
+
+
+# ---------------- ENTRY ---------------- #
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate LLM explanations for top items")
+    parser.add_argument("--root", default=EXPLANATION_STORE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="generate missing keys, then compile")
+    gen.add_argument("--data", default=None, help="preprocessed CSV (default: CURRENT snapshot, else PREPROCESSED_DATA)")
+    gen.add_argument("--top", type=int, default=PREGEN_TOP_ITEMS, help="items per city")
+    gen.add_argument("--variants", type=int, default=PREGEN_VARIANTS)
+    gen.add_argument("--rate", type=float, default=PREGEN_RATE_PER_SECOND, help="LLM calls per second")
+    gen.add_argument("--limit", type=int, default=None, help="stop after this many keys")
+
+    sub.add_parser("compile", help="rebuild the store from the journal")
+    sub.add_parser("stats")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        compile_store(args.root)
+        return
+
+    if args.command == "stats":
+        entries = read_journal(args.root)
+        store = ExplanationStore.open(args.root)
+        cities = sorted({e["city"] for e in entries.values()})
+        print(f"[INFO] journal: {len(entries)} keys across {len(cities)} cities; store: {len(store)} keys")
+        return
+
+    from llm_explainer import LLMExplainer
+    from llm_gateway import LLMGateway, TokenBucket
+    from mood_model import MOOD_PHRASES
+    from snapshots import load_snapshot, read_current
+    from utils import load_csv
+
+    if args.data:
+        df = load_csv(args.data)
+    elif read_current():
+        df = load_snapshot().df
+    else:
+        df = load_csv(PREPROCESSED_DATA)
+
+    # Wait for rate tokens rather than skipping keys
+    gateway = LLMGateway(limiter=TokenBucket(rate=args.rate, burst=1), rate_wait_ms=60_000)
+    if not gateway.api_key:
+        raise SystemExit("GROQ_API_KEY is required to generate explanations")
+    explainer = LLMExplainer(gateway=gateway, store=ExplanationStore())
+
+    generate(
+        explainer, df, list(MOOD_PHRASES), args.root,
+        top_n=args.top, variants=args.variants, limit=args.limit
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+export_encoder.py
+Export the query encoder to int8-quantized ONNX and validate it.
+
+Steps:
+1. Export the sentence model's transformer to ONNX (fp32).
+2. Quantize the weights to int8 (onnxruntime dynamic quantization).
+3. Save the tokenizer next to it (tokenizer.json).
+4. Validate against the PyTorch model:
+   - cosine similarity of query embeddings
+   - top-k overlap of retrieval over a document sample
+   - per-query latency, batch throughput and cold start (import + load)
+
+Exits non-zero when the mean top-k overlap is below --min-overlap, so it
+can gate switching config.ENCODER_BACKEND to "onnx".
+
+Usage:
+    python src/export_encoder.py
+    python src/export_encoder.py --validate-only --k 10 --min-overlap 0.9
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import inspect
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SRC_DIR)
+for path in (SRC_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from config import EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR, ONNX_MODEL_FILE, PREPROCESSED_DATA
+from encoder import TorchEncoder, OnnxEncoder
+
+FP32_MODEL_FILE = "model.onnx"
+
+VALIDATION_QUERIES = [
+    "something cheesy and italian", "cheap", "spicy", "dessert",
+    "comfort food after a rough day", "paneer tikka", "healthy salad",
+    "party snacks with friends", "not expensive biryani", "hot and spicy food",
+    "italian but not too heavy", "something sweet with chocolate",
+    "fine dining premium dinner", "margherita", "feeling low need something filling",
+    "light food for a hot day", "street food", "masala dosa for breakfast",
+    "creamy pasta", "budget friendly chinese", "grilled chicken", "cold coffee",
+    "home style dal rice", "celebration dinner with family", "quick bite",
+    "low calorie lunch", "butter chicken and naan", "south indian meals",
+    "late night burger", "rainy day snacks", "ice cream", "fiery tandoori",
+    "veg momos", "seafood curry", "something fresh", "biryani",
+    "kid friendly food", "sizzling brownie", "soup for a cold evening", "pizza"
+]
+
+
+# ---------------- EXPORT ---------------- #
+
+def export_onnx(model_name, out_dir, opset=14):
+    """Export the underlying HF transformer (last_hidden_state) to ONNX."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    print(f"[INFO] Loading {model_name} ...")
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer.save_pretrained(out_dir)   # writes tokenizer.json
+
+    class _LastHidden(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    sample = tokenizer(["a sample query used for tracing"], return_tensors="pt")
+    inputs = (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"])
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+
+    fp32_path = os.path.join(out_dir, FP32_MODEL_FILE)
+
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False   # TorchScript exporter handles dynamic axes here
+
+    print(f"[INFO] Exporting ONNX (opset {opset}) → {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHidden(transformer),
+            inputs,
+            fp32_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={n: {0: "batch", 1: "sequence"} for n in names + ["last_hidden_state"]},
+            opset_version=opset,
+            do_constant_folding=True,
+            **kwargs
+        )
+
+    return fp32_path
+
+
+def quantize_int8(fp32_path, int8_path):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    print(f"[INFO] Quantizing to int8 → {int8_path}")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    fp32_mb = os.path.getsize(fp32_path) / 2**20
+    int8_mb = os.path.getsize(int8_path) / 2**20
+    print(f"[INFO] Model size: {fp32_mb:.1f} MB fp32 → {int8_mb:.1f} MB int8")
+    return {"fp32_mb": round(fp32_mb, 1), "int8_mb": round(int8_mb, 1)}
+
+
+# ---------------- VALIDATION ---------------- #
+
+def load_documents(n_docs, seed=0):
+    """Sample embedding texts from the preprocessed dataset (synthetic if absent)."""
+    if os.path.exists(PREPROCESSED_DATA):
+        df = pd.read_csv(PREPROCESSED_DATA, usecols=["embedding_text"])
+        source = PREPROCESSED_DATA
+    else:
+        from benchmark import build_synthetic_catalog
+        df = build_synthetic_catalog(n_docs, 4, seed=seed)
+        source = "synthetic catalog"
+
+    df = df.dropna(subset=["embedding_text"])
+    df = df.sample(min(n_docs, len(df)), random_state=seed)
+    print(f"[INFO] Validating on {len(df)} documents from {source}")
+    return df["embedding_text"].astype(str).tolist()
+
+
+def topk_overlap(docs, q_ref, q_new, k):
+    ref = np.argsort(-(q_ref @ docs.T), axis=1)[:, :k]
+    new = np.argsort(-(q_new @ docs.T), axis=1)[:, :k]
+    return np.array([len(set(a) & set(b)) / k for a, b in zip(ref, new)])
+
+
+def time_single_queries(encoder, queries, repeats=3):
+    encoder.encode(["warm up"])
+    latencies = []
+    for _ in range(repeats):
+        for q in queries:
+            start = time.perf_counter()
+            encoder.encode([q])
+            latencies.append((time.perf_counter() - start) * 1000)
+    p50, p95 = np.percentile(latencies, [50, 95])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3)}
+
+
+def time_batch(encoder, docs, batch_size=64):
+    start = time.perf_counter()
+    encoder.encode(docs, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return {"texts_per_s": round(len(docs) / elapsed, 1)}
+
+
+def cold_start_seconds(constructor):
+    """Fresh interpreter: import the encoder module, load, encode once."""
+    code = (
+        "import time; t = time.perf_counter();"
+        "import encoder;"
+        f"encoder.{constructor}.encode(['warm up']);"
+        "print(time.perf_counter() - t)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=SRC_DIR, capture_output=True, text=True, timeout=600
+    )
+    if out.returncode != 0:
+        print(f"[WARN] cold start for {constructor} failed: {out.stderr.strip()[-300:]}")
+        return None
+    return round(float(out.stdout.strip().splitlines()[-1]), 3)
+
+
+def validate(model_name, model_dir, k=10, n_docs=2000, min_overlap=0.9):
+    torch_enc = TorchEncoder(model_name)
+    onnx_enc = OnnxEncoder(model_dir=model_dir)
+
+    docs_text = load_documents(n_docs)
+    docs = torch_enc.encode(docs_text)   # index side stays full precision
+
+    q_ref = torch_enc.encode(VALIDATION_QUERIES)
+    q_new = onnx_enc.encode(VALIDATION_QUERIES)
+
+    cosine = np.sum(q_ref * q_new, axis=1)
+    overlap = topk_overlap(docs, q_ref, q_new, k)
+
+    report = {
+        "k": k,
+        "documents": len(docs_text),
+        "queries": len(VALIDATION_QUERIES),
+        "cosine": {"mean": round(float(cosine.mean()), 4), "min": round(float(cosine.min()), 4)},
+        f"top{k}_overlap": {"mean": round(float(overlap.mean()), 4), "min": round(float(overlap.min()), 4)},
+        "min_overlap_threshold": min_overlap,
+        "passed": bool(overlap.mean() >= min_overlap),
+        "query_latency": {
+            "torch": time_single_queries(torch_enc, VALIDATION_QUERIES),
+            "onnx": time_single_queries(onnx_enc, VALIDATION_QUERIES),
+        },
+        "batch_throughput": {
+            "torch": time_batch(torch_enc, docs_text[:512]),
+            "onnx": time_batch(onnx_enc, docs_text[:512]),
+        },
+        "cold_start_s": {
+            "torch": cold_start_seconds(f"TorchEncoder({model_name!r})"),
+            "onnx": cold_start_seconds(f"OnnxEncoder(model_dir={model_dir!r})"),
+        },
+    }
+
+    print("\n[RESULT] Encoder validation")
+    print(f"  cosine(torch, onnx)     mean {report['cosine']['mean']:.4f}  min {report['cosine']['min']:.4f}")
+    print(f"  top-{k} overlap          mean {overlap.mean():.4f}  min {overlap.min():.4f}  (threshold {min_overlap})")
+    for backend in ("torch", "onnx"):
+        lat = report["query_latency"][backend]
+        print(
+            f"  {backend:<6} query p50 {lat['p50_ms']:.2f} ms  p95 {lat['p95_ms']:.2f} ms  "
+            f"batch {report['batch_throughput'][backend]['texts_per_s']} texts/s  "
+            f"cold start {report['cold_start_s'][backend]} s"
+        )
+
+    return report
+
+
+# ---------------- ENTRY ---------------- #
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and validate the int8 ONNX query encoder")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--out-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--validate-only", action="store_true")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--min-overlap", type=float, default=0.9)
+    args = parser.parse_args(argv)
+
+    report = {}
+    if not args.validate_only:
+        fp32_path = export_onnx(args.model, args.out_dir, args.opset)
+        report["size"] = quantize_int8(fp32_path, os.path.join(args.out_dir, ONNX_MODEL_FILE))
+
+    report.update(validate(args.model, args.out_dir, args.k, args.docs, args.min_overlap))
+
+    report_path = os.path.join(args.out_dir, "validation.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\n[INFO] Validation report saved → {report_path}")
+
+    if not report["passed"]:
+        print("[FAIL] Top-k overlap below threshold; keep ENCODER_BACKEND = 'torch'.")
+        return 1
+
+    print("[SUCCESS] ONNX encoder is within tolerance.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,23 @@
 import os
+import sys
 import faiss
+import json
 import pickle
+import threading
 import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer
+from metrics import span, counter, record_cache, METRICS_ENABLED
+from lexical_index import LexicalIndex, build_lexical_index, lexical_dir, row_tags, tokenize
+from intent_lists import intent_lists_path, build_intent_lists, save_intent_lists, load_intent_lists
+from mood_model import mood_centroids
+from vector_compression import VectorCompressor, compression_path, load_compressor, sample_texts, encode_normalized
+from item_ids import ItemTable, assign_ids
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import VECTOR_DIM, VECTOR_REDUCTION, VECTOR_STORAGE
 
 # ---------------- PATHS ---------------- #
 
@@ -14,27 +28,155 @@ META_DIR = os.path.join(FAISS_DIR, "metadata")
 EMBEDDING_DIM = 384
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
+# Rating thresholds that get a precomputed ">= bucket" bitmap
+RATING_BUCKETS = (3.0, 3.5, 4.0, 4.5)
+
+# Fallback when an index type rejects an ID selector: widen k until
+# enough filtered hits come back
+WIDEN_FACTOR = 4
+
+# Reciprocal rank fusion constant for hybrid (FAISS + BM25) search
+RRF_K = 60
+
+# Set bits per byte value, for counting allowed rows in a packed bitmap
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+FILTERED_SEARCHES = counter(
+    "smartdine_filtered_search_total",
+    "Attribute-filtered FAISS searches by execution mode.",
+    ["mode"]
+)
+
+
+class IndexNotFoundError(ValueError):
+    """No index for the city on this host (or any retrieval shard)."""
+
+
+class IndexMismatchError(Exception):
+    """
+    A city index does not fit its directory's compression settings (a
+    config or rebuild mistake). Deliberately not a ValueError, which
+    callers read as "no index for this city".
+    """
+
+
 # ---------------- UTILS ---------------- #
 
-def ensure_dirs():
-    os.makedirs(FAISS_DIR, exist_ok=True)
-    os.makedirs(META_DIR, exist_ok=True)
+def ensure_dirs(faiss_dir=FAISS_DIR):
+    os.makedirs(faiss_dir, exist_ok=True)
+    os.makedirs(os.path.join(faiss_dir, "metadata"), exist_ok=True)
+
+
+def attrs_path(city, faiss_dir=FAISS_DIR):
+    return os.path.join(faiss_dir, "metadata", f"{city}.attrs.npz")
+
+
+def items_path(city, faiss_dir=FAISS_DIR):
+    return os.path.join(faiss_dir, "metadata", f"{city}.items.npz")
+
+
+def mood_affinity_path(city, faiss_dir=FAISS_DIR):
+    return os.path.join(faiss_dir, "metadata", f"{city}.moods.npz")
+
+
+def cuisine_tags(cuisine):
+    """'North Indian, Chinese' -> ['north indian', 'chinese']"""
+    if not isinstance(cuisine, str):
+        return []
+    return [t.strip().lower() for t in cuisine.split(",") if t.strip()]
+
+# ---------------- ATTRIBUTE BITMAPS ---------------- #
+
+def build_attribute_bitmaps(city_df):
+    """
+    Packed (little bit order, as faiss.IDSelectorBitmap expects) bitmaps
+    over FAISS row ids: rating buckets, Is_Expensive, Is_Bestseller and
+    one per cuisine tag.
+    """
+    rating = pd.to_numeric(city_df["Average_Rating"], errors="coerce").fillna(0).to_numpy()
+
+    bitmaps = {
+        f"rating_ge_{b}": np.packbits(rating >= b, bitorder="little")
+        for b in RATING_BUCKETS
+    }
+    bitmaps["is_expensive"] = np.packbits(city_df["Is_Expensive"].to_numpy() == 1, bitorder="little")
+    bitmaps["is_bestseller"] = np.packbits(city_df["Is_Bestseller"].to_numpy() == 1, bitorder="little")
+
+    row_tags = [cuisine_tags(c) for c in city_df["Cuisine"]]
+    tags = sorted({t for ts in row_tags for t in ts})
+    tag_pos = {t: i for i, t in enumerate(tags)}
+
+    tag_matrix = np.zeros((len(tags), len(city_df)), dtype=bool)
+    for row, ts in enumerate(row_tags):
+        for t in ts:
+            tag_matrix[tag_pos[t], row] = True
+
+    bitmaps["cuisine_tags"] = np.array(tags, dtype=str)
+    bitmaps["cuisine_bitmaps"] = np.packbits(tag_matrix, axis=1, bitorder="little")
+
+    return bitmaps
+
+# ---------------- MOOD AFFINITY ---------------- #
+
+def build_mood_affinity(embeddings, centroids):
+    """
+    Cosine of every (normalized) item embedding with every mood
+    centroid, min-max scaled per mood within the city so a mood's
+    best-matching items score 1. float16, shape (items, moods).
+    """
+    affinity = embeddings @ centroids.T
+    low, high = affinity.min(axis=0), affinity.max(axis=0)
+    scaled = (affinity - low) / np.where(high > low, high - low, 1.0)
+    return scaled.astype("float16")
 
 # ---------------- BUILD INDEXES ---------------- #
 
-def build_city_faiss_indexes():
+def build_city_faiss_indexes(df=None, model=None, faiss_dir=FAISS_DIR,
+                             dim=VECTOR_DIM, reduction=VECTOR_REDUCTION, storage=VECTOR_STORAGE):
     """
     Builds ONE FAISS index PER CITY.
+
+    `df`, `model` and `faiss_dir` default to the production dataset,
+    sentence model and index directory; the benchmark passes its own.
+
+    `dim`, `reduction` and `storage` compress the stored vectors (see
+    vector_compression.py); the defaults come from config.
     """
-    ensure_dirs()
+    ensure_dirs(faiss_dir)
+    meta_dir = os.path.join(faiss_dir, "metadata")
 
-    print("[INFO] Loading preprocessed dataset...")
-    df = pd.read_csv(DATA_PATH)
+    if df is None:
+        print("[INFO] Loading preprocessed dataset...")
+        df = pd.read_csv(DATA_PATH)
 
     if "embedding_text" not in df.columns or "city" not in df.columns:
         raise ValueError("Dataset must contain 'embedding_text' and 'city' columns")
 
-    model = SentenceTransformer(MODEL_NAME)
+    if "item_id" not in df.columns or "cuisine_id" not in df.columns:
+        # Datasets preprocessed before item ids existed
+        df = assign_ids(df.copy())
+
+    if model is None:
+        # Documents are always embedded at full precision; only the
+        # query side is switchable (config.ENCODER_BACKEND).
+        from encoder import TorchEncoder
+        model = TorchEncoder(MODEL_NAME)
+
+    # Mood centroids from the document encoder, shared by every city
+    moods, centroids = mood_centroids(model)
+
+    # One projection for all cities, so every query maps the same way
+    compressor = VectorCompressor(dim, reduction, storage)
+    if compressor.needs_fit:
+        print(f"[INFO] Fitting {reduction} to {compressor.dim} dims...")
+        compressor.fit(encode_normalized(model, sample_texts(df)))
+
+    if compressor.identity:
+        if os.path.exists(compression_path(faiss_dir)):
+            os.remove(compression_path(faiss_dir))
+    else:
+        compressor.save(compression_path(faiss_dir))
+        print(f"[INFO] Vector compression: {json.dumps(compressor.describe())}")
 
     for city, city_df in df.groupby("city"):
         print(f"\n[INFO] Building FAISS index for city: {city}")
@@ -56,17 +198,33 @@ def build_city_faiss_indexes():
         # Normalize for cosine similarity
         faiss.normalize_L2(embeddings)
 
-        index = faiss.IndexFlatIP(EMBEDDING_DIM)
-        index.add(embeddings)
+        index = compressor.build_index(compressor.project(embeddings))
 
         # Save index
-        index_path = os.path.join(FAISS_DIR, f"{city}.index")
+        index_path = os.path.join(faiss_dir, f"{city}.index")
         faiss.write_index(index, index_path)
 
-        # Save metadata aligned with FAISS vectors
-        meta_path = os.path.join(META_DIR, f"{city}.pkl")
-        with open(meta_path, "wb") as f:
-            pickle.dump(city_df.to_dict(orient="records"), f)
+        # Save metadata aligned with FAISS vectors, dictionary-encoded
+        ItemTable.from_frame(city_df).save(items_path(city, faiss_dir))
+        legacy_path = os.path.join(meta_dir, f"{city}.pkl")
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+        # Attribute bitmaps for filtered search
+        np.savez(attrs_path(city, faiss_dir), **build_attribute_bitmaps(city_df))
+
+        # BM25 postings for hybrid search
+        build_lexical_index(city_df, lexical_dir(city, faiss_dir))
+
+        # Per-item mood affinity, so ranking uses the mood without inference
+        np.savez(
+            mood_affinity_path(city, faiss_dir),
+            moods=np.array(moods),
+            affinity=build_mood_affinity(embeddings, centroids)
+        )
+
+        # Ranked lists for keyword-only queries (no encode, no FAISS)
+        save_intent_lists(city_df, intent_lists_path(city, faiss_dir))
 
         print(f"[SUCCESS] {city}: indexed {index.ntotal} items")
 
@@ -74,48 +232,394 @@ def build_city_faiss_indexes():
 
 # ---------------- LOAD INDEX ---------------- #
 
-def load_city_index(city):
+def load_city_index(city, faiss_dir=FAISS_DIR):
     """
-    Load FAISS index + metadata for a given city.
+    Load FAISS index + metadata (an ItemTable) for a given city. Metadata
+    pickled as records by older builds is converted on load.
     """
     city = city.lower().strip()
 
-    index_path = os.path.join(FAISS_DIR, f"{city}.index")
-    meta_path = os.path.join(META_DIR, f"{city}.pkl")
+    index_path = os.path.join(faiss_dir, f"{city}.index")
 
     if not os.path.exists(index_path):
-        raise ValueError(f"No FAISS index found for city: {city}")
+        raise IndexNotFoundError(f"No FAISS index found for city: {city}")
 
     index = faiss.read_index(index_path)
 
-    with open(meta_path, "rb") as f:
-        metadata = pickle.load(f)
+    if os.path.exists(items_path(city, faiss_dir)):
+        metadata = ItemTable.load(items_path(city, faiss_dir))
+    else:
+        with open(os.path.join(faiss_dir, "metadata", f"{city}.pkl"), "rb") as f:
+            metadata = ItemTable.from_records(pickle.load(f))
 
     return index, metadata
 
+class CityIndex:
+    """
+    FAISS index, metadata, attribute bitmaps, BM25 postings, ranked
+    intent lists and mood affinities for one city. Loaded once and kept
+    in memory (see get_city_index).
+    """
+
+    def __init__(self, city, index, metadata, bitmaps, lexical=None, intent_lists=None, moods=None, compressor=None):
+        self.city = city
+        self.index = index
+        self.compressor = compressor
+        self.metadata = metadata
+        self.ntotal = index.ntotal
+        self.bitmaps = bitmaps
+        self.lexical = lexical
+        self.intent_lists = intent_lists or {}
+        # (mood names, float16 items x moods), or None for older index dirs
+        self.mood_names, self.mood_affinity = moods if moods is not None else ([], None)
+        self.tag_rows = {t: i for i, t in enumerate(bitmaps["cuisine_tags"].tolist())}
+
+        # Cuisine keyword tags (lexical_index.CUISINE_TAGS), once per row,
+        # so ranking checks membership instead of scanning strings
+        self.row_tags = row_tags(metadata.column("Cuisine"))
+
+        # Packed bitmaps carry padding bits past ntotal; clear them after NOT
+        valid = np.ones(self.ntotal, dtype=bool)
+        self._valid = np.packbits(valid, bitorder="little")
+
+    def filter_bitmap(self, filters):
+        """
+        AND together the bitmaps for `filters`:
+            min_rating  float  -> closest precomputed bucket at or below it
+            expensive   bool   -> Is_Expensive == 1 / == 0
+            bestseller  bool   -> Is_Bestseller == 1 / == 0
+            cuisines    list   -> any of these cuisine tags
+
+        Returns None when nothing restricts the search. A min_rating
+        between buckets gives a superset; callers keep their exact check.
+        """
+        if not filters:
+            return None
+
+        mask = None
+
+        def _and(bits):
+            nonlocal mask
+            mask = bits.copy() if mask is None else np.bitwise_and(mask, bits)
+
+        min_rating = filters.get("min_rating")
+        if min_rating is not None:
+            usable = [b for b in RATING_BUCKETS if b <= min_rating]
+            if usable:
+                _and(self.bitmaps[f"rating_ge_{max(usable)}"])
+
+        for key, name in (("expensive", "is_expensive"), ("bestseller", "is_bestseller")):
+            wanted = filters.get(key)
+            if wanted is None:
+                continue
+            bits = self.bitmaps[name]
+            _and(bits if wanted else np.bitwise_and(np.invert(bits), self._valid))
+
+        cuisines = filters.get("cuisines")
+        if cuisines:
+            rows = [self.tag_rows[c] for c in (t.lower() for t in cuisines) if c in self.tag_rows]
+            if rows:
+                _and(np.bitwise_or.reduce(self.bitmaps["cuisine_bitmaps"][rows], axis=0))
+            else:
+                _and(np.zeros_like(self._valid))
+
+        return mask
+
+    def prepare_query(self, query_embedding):
+        """Normalized float32 (1, d) query in this index's vector space."""
+        query = query_embedding.astype("float32").reshape(1, -1)
+        faiss.normalize_L2(query)
+        if self.compressor is not None:
+            query = self.compressor.project(query)
+        return query
+
+    def search(self, query, top_k, filters=None):
+        """
+        Top-k (scores, row ids) for one normalized query, restricted to
+        rows passing `filters`.
+        """
+        bitmap = self.filter_bitmap(filters)
+        if bitmap is None:
+            scores, ids = self.index.search(query, top_k)
+            return scores[0], ids[0]
+
+        allowed = int(_POPCOUNT[bitmap].sum())
+        if allowed == 0:
+            return np.empty(0, dtype="float32"), np.empty(0, dtype="int64")
+
+        top_k = min(top_k, allowed)
+
+        try:
+            # `bitmap` must outlive the search: the selector only holds a pointer
+            selector = faiss.IDSelectorBitmap(self.ntotal, faiss.swig_ptr(bitmap))
+            scores, ids = self.index.search(
+                query, top_k, params=faiss.SearchParameters(sel=selector)
+            )
+            if METRICS_ENABLED:
+                FILTERED_SEARCHES.inc(mode="selector")
+            return scores[0], ids[0]
+        except (RuntimeError, TypeError):
+            if METRICS_ENABLED:
+                FILTERED_SEARCHES.inc(mode="widen")
+            return self._search_widening(query, top_k, bitmap)
+
+    def hybrid_search(self, query, query_text, top_k, filters=None):
+        """
+        FAISS and BM25 top-k fused by reciprocal rank. Returns
+        (row ids, cosine, bm25, rrf) in fused order. Rows found only
+        lexically get their cosine from the stored vectors.
+        """
+        sem_scores, sem_ids = self.search(query, top_k, filters)
+        lex_scores, lex_ids = self.lexical.search(tokenize(query_text), top_k, self.filter_bitmap(filters))
+
+        fused, cosine, bm25 = {}, {}, {}
+        for rank, (idx, score) in enumerate(zip(sem_ids.tolist(), sem_scores.tolist())):
+            if idx >= 0:
+                fused[idx] = 1.0 / (RRF_K + rank + 1)
+                cosine[idx] = score
+        for rank, (idx, score) in enumerate(zip(lex_ids.tolist(), lex_scores.tolist())):
+            fused[idx] = fused.get(idx, 0.0) + 1.0 / (RRF_K + rank + 1)
+            bm25[idx] = score
+
+        ids = sorted(fused, key=fused.get, reverse=True)[:top_k]
+
+        missing = [i for i in ids if i not in cosine]
+        if missing:
+            vectors = self.index.reconstruct_batch(np.asarray(missing, dtype="int64"))
+            cosine.update(zip(missing, (vectors @ query[0]).tolist()))
+
+        return (
+            ids,
+            [cosine[i] for i in ids],
+            [bm25.get(i, 0.0) for i in ids],
+            [fused[i] for i in ids]
+        )
+
+    def ranked(self, name, top_k, filters=None):
+        """
+        First `top_k` row ids of ranked intent list `name` that pass
+        `filters`, best first. None when the list does not exist.
+        """
+        order = self.intent_lists.get(name)
+        if order is None:
+            return None
+
+        bitmap = self.filter_bitmap(filters)
+        if bitmap is not None:
+            keep = ((bitmap[order >> 3] >> (order & 7)) & 1).astype(bool)
+            order = order[keep]
+
+        return order[:top_k]
+
+    def mood_rows(self, ids):
+        """Per-row {mood: affinity} for row ids (one gather), or Nones."""
+        if self.mood_affinity is None:
+            return [None] * len(ids)
+        rows = self.mood_affinity[np.asarray(ids, dtype="int64")].astype("float32")
+        return [dict(zip(self.mood_names, row)) for row in rows.tolist()]
+
+    def _search_widening(self, query, top_k, bitmap):
+        allowed = np.unpackbits(bitmap, bitorder="little", count=self.ntotal).astype(bool)
+        k = top_k
+
+        while True:
+            k = min(k * WIDEN_FACTOR, self.ntotal)
+            scores, ids = self.index.search(query, k)
+            keep = (ids[0] >= 0) & allowed[np.clip(ids[0], 0, None)]
+            if keep.sum() >= top_k or k >= self.ntotal:
+                return scores[0][keep][:top_k], ids[0][keep][:top_k]
+
+
+_CITY_INDEXES = {}
+_CITY_INDEXES_LOCK = threading.Lock()
+
+
+def get_city_index(city, faiss_dir=FAISS_DIR):
+    """
+    Cached CityIndex for `city`. Indexes built before attribute bitmaps,
+    lexical postings or intent lists existed get them computed from
+    metadata on first load; mood affinities need a rebuild.
+    """
+    city = city.lower().strip()
+    key = (faiss_dir, city)
+
+    cached = _CITY_INDEXES.get(key)
+    if cached is not None:
+        record_cache("city_index", hit=True)
+        return cached
+
+    record_cache("city_index", hit=False)
+
+    with _CITY_INDEXES_LOCK:
+        cached = _CITY_INDEXES.get(key)
+        if cached is not None:
+            return cached
+
+        index, metadata = load_city_index(city, faiss_dir)
+
+        try:
+            compressor = load_compressor(faiss_dir)
+        except ValueError as e:
+            raise IndexMismatchError(f"Bad compression settings in {faiss_dir}: {e}") from e
+        expected = compressor.dim if compressor is not None else EMBEDDING_DIM
+        if index.d != expected:
+            raise IndexMismatchError(
+                f"FAISS index for {city} has {index.d} dims, expected {expected}; "
+                f"rebuild the indexes in {faiss_dir}"
+            )
+
+        path = attrs_path(city, faiss_dir)
+        if os.path.exists(path):
+            with np.load(path) as f:
+                bitmaps = {k: f[k] for k in f.files}
+        else:
+            bitmaps = build_attribute_bitmaps(metadata.frame())
+
+        lex_path = lexical_dir(city, faiss_dir)
+        if os.path.exists(os.path.join(lex_path, "vocab.json")):
+            lexical = LexicalIndex.load(lex_path)
+        else:
+            lexical = LexicalIndex.from_frame(metadata.frame())
+
+        path = intent_lists_path(city, faiss_dir)
+        if os.path.exists(path):
+            intent_lists = load_intent_lists(path)
+        else:
+            intent_lists = build_intent_lists(metadata.frame())
+
+        path = mood_affinity_path(city, faiss_dir)
+        if os.path.exists(path):
+            with np.load(path) as f:
+                moods = (f["moods"].tolist(), f["affinity"])
+        else:
+            # Needs the document encoder; rebuild the indexes to get it
+            moods = None
+
+        city_index = CityIndex(city, index, metadata, bitmaps, lexical, intent_lists, moods, compressor)
+        _CITY_INDEXES[key] = city_index
+        return city_index
+
+
+def clear_index_cache(faiss_dir=None):
+    """Drop cached indexes: all of them, or only those loaded from `faiss_dir`."""
+    with _CITY_INDEXES_LOCK:
+        if faiss_dir is None:
+            _CITY_INDEXES.clear()
+            return
+        for key in [k for k in _CITY_INDEXES if k[0] == faiss_dir]:
+            del _CITY_INDEXES[key]
+
+def item_vectors(items, faiss_dir=FAISS_DIR):
+    """
+    Stored index vectors (normalized, in the index's possibly compressed
+    space) for search results, by their `city` and `item_id`: one
+    reconstruct_batch per city, no encoding. Rows are looked up by item
+    id rather than trusting `row_id`, which may come from a shard's
+    index of another version. None when an item has no id, its city
+    index is not on this host, or the index does not hold it.
+    """
+    rows = {}
+    for pos, item in enumerate(items):
+        if item.get("item_id") is None or not item.get("city"):
+            return None
+        rows.setdefault(item["city"], []).append(pos)
+
+    out = None
+    for city, positions in rows.items():
+        try:
+            city_index = get_city_index(city, faiss_dir)
+        except IndexNotFoundError:
+            return None
+        ids = city_index.metadata.rows_for([items[p]["item_id"] for p in positions])
+        if (ids < 0).any():
+            return None
+        vectors = city_index.index.reconstruct_batch(ids)
+        if out is None:
+            out = np.empty((len(items), vectors.shape[1]), dtype="float32")
+        out[positions] = vectors
+
+    return out
+
 # ---------------- SEARCH ---------------- #
 
 def search_city(
     query_embedding: np.ndarray,
     city: str,
-    top_k: int = 20
+    top_k: int = 20,
+    faiss_dir: str = FAISS_DIR,
+    filters: dict = None,
+    query_text: str = None
 ):
     """
     Search FAISS index for a specific city.
+
+    `filters` (see CityIndex.filter_bitmap) are applied inside the FAISS
+    scan, so every returned item already satisfies them.
+
+    With `query_text`, BM25 hits over dish/cuisine/restaurant tokens are
+    fused with the FAISS hits (CityIndex.hybrid_search); items then also
+    carry `lexical_score` and `rrf_score`.
+
+    Items carry `mood_affinity` ({mood: 0..1}) when the index has it.
     """
-    index, metadata = load_city_index(city)
+    with span("index_load"):
+        city_index = get_city_index(city, faiss_dir)
+
+    query_embedding = city_index.prepare_query(query_embedding)
+
+    if query_text:
+        with span("hybrid_search"):
+            indices, scores, lexical, fused = city_index.hybrid_search(
+                query_embedding, query_text, top_k, filters
+            )
+    else:
+        with span("search"):
+            scores, indices = city_index.search(query_embedding, top_k, filters)
+        lexical = fused = None
 
-    query_embedding = query_embedding.astype("float32").reshape(1, -1)
-    faiss.normalize_L2(query_embedding)
+    metadata = city_index.metadata
+    valid = [pos for pos, idx in enumerate(indices) if 0 <= idx < len(metadata)]
+    mood_rows = city_index.mood_rows([indices[pos] for pos in valid])
+
+    results = []
+    for pos, moods in zip(valid, mood_rows):
+        idx = indices[pos]
+        item = metadata[idx]
+        item["tags"] = city_index.row_tags[idx]
+        item["semantic_score"] = float(scores[pos])
+        item["row_id"] = int(idx)
+        if fused is not None:
+            item["lexical_score"] = float(lexical[pos])
+            item["rrf_score"] = float(fused[pos])
+        if moods is not None:
+            item["mood_affinity"] = moods
+        results.append(item)
+
+    return results
+
+
+def ranked_city(city: str, name: str, top_k: int = 20, faiss_dir: str = FAISS_DIR, filters: dict = None):
+    """
+    Top items of ranked intent list `name` (see intent_lists.py) that
+    pass `filters`, without a query embedding, so items carry no
+    `semantic_score`. None when the list does not exist.
+    """
+    with span("index_load"):
+        city_index = get_city_index(city, faiss_dir)
 
-    scores, indices = index.search(query_embedding, top_k)
+    with span("ranked_list"):
+        ids = city_index.ranked(name, top_k, filters)
+    if ids is None:
+        return None
 
     results = []
-    for score, idx in zip(scores[0], indices[0]):
-        if idx < len(metadata):
-            item = metadata[idx]
-            item["semantic_score"] = float(score)
-            results.append(item)
+    for idx, moods in zip(ids.tolist(), city_index.mood_rows(ids)):
+        item = city_index.metadata[idx]
+        item["tags"] = city_index.row_tags[idx]
+        item["row_id"] = idx
+        if moods is not None:
+            item["mood_affinity"] = moods
+        results.append(item)
 
     return results
 
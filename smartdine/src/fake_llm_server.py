@@ -0,0 +1,163 @@
+"""
+fake_llm_server.py
+Local stand-in for the Groq API, for testing LLMGateway without a key
+or quota. Serves the two routes the gateway uses and injects faults:
+
+    POST /openai/v1/chat/completions   canned completion
+    GET  /openai/v1/models             circuit-breaker probe
+    GET  /faults                       current fault settings
+    POST /faults  {"latency_ms": 0, "jitter_ms": 0, "error_rate": 0.0,
+                   "error_status": 503, "down": false, "drop_rate": 0.0}
+                                       change them while running
+                                       (bad values are rejected with 422)
+
+`down` fails every call (probes included) until it is switched off,
+which is how an outage and its recovery are simulated. JSON-mode
+requests (batched explanations) get one entry per "[n]" dish line in
+the prompt; `drop_rate` leaves entries out to exercise the fallback.
+
+Run:
+    python src/fake_llm_server.py --port 8300 --latency-ms 400 --error-rate 0.2
+    SMARTDINE_LLM_BASE_URL=http://127.0.0.1:8300 GROQ_API_KEY=test python api.py
+"""
+
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+
+# ---------------- FAULTS ---------------- #
+
+FAULTS = {
+    "latency_ms": 0,
+    "jitter_ms": 0,
+    "error_rate": 0.0,
+    "error_status": 503,
+    "down": False,
+    "drop_rate": 0.0
+}
+
+STATS = {"completions": 0, "models": 0, "failed": 0}
+
+
+async def inject(route):
+    """Sleep for the configured latency; an error response, or None to answer normally."""
+    STATS[route] += 1
+    delay = FAULTS["latency_ms"] + random.uniform(0, FAULTS["jitter_ms"])
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+    if FAULTS["down"] or random.random() < FAULTS["error_rate"]:
+        STATS["failed"] += 1
+        return JSONResponse(
+            status_code=FAULTS["error_status"],
+            content={"error": {"message": "injected failure", "type": "fake_llm_server"}}
+        )
+    return None
+
+
+# ---------------- API ---------------- #
+
+app = FastAPI(title="Fake LLM provider")
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(body: dict):
+    error = await inject("completions")
+    if error is not None:
+        return error
+
+    prompt = body.get("messages", [{}])[-1].get("content", "")
+    prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+    content = f"A fake but confident explanation ({len(prompt)} prompt chars)."
+
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        ids = [int(n) for n in re.findall(r"^\[(\d+)\]", prompt, re.M)]
+        content = json.dumps({"explanations": [
+            {"id": n, "text": f"Fake explanation for dish {n}."}
+            for n in ids if random.random() >= FAULTS["drop_rate"]
+        ]})
+
+    return {
+        "id": f"fake-{STATS['completions']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {
+                "role": "assistant",
+                "content": content
+            }
+        }],
+        # Rough count: ~4 characters per token
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                  "total_tokens": prompt_tokens + len(content) // 4}
+    }
+
+
+@app.get("/openai/v1/models")
+async def models():
+    error = await inject("models")
+    if error is not None:
+        return error
+    return {"object": "list", "data": [{"id": "llama3-8b-8192", "object": "model", "owned_by": "fake"}]}
+
+
+@app.get("/faults")
+def get_faults():
+    return {"faults": FAULTS, "stats": STATS}
+
+
+class FaultUpdate(BaseModel):
+    """Fields left out (or null) keep their current value."""
+    latency_ms: Optional[int] = Field(None, ge=0)
+    jitter_ms: Optional[int] = Field(None, ge=0)
+    error_rate: Optional[float] = Field(None, ge=0.0, le=1.0)
+    error_status: Optional[int] = Field(None, ge=400, le=599)
+    down: Optional[bool] = None
+    drop_rate: Optional[float] = Field(None, ge=0.0, le=1.0)
+
+
+@app.post("/faults")
+def set_faults(update: FaultUpdate):
+    values = update.model_dump() if hasattr(update, "model_dump") else update.dict()
+    FAULTS.update({key: value for key, value in values.items() if value is not None})
+    return {"faults": FAULTS, "stats": STATS}
+
+
+# ---------------- ENTRY ---------------- #
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Groq-compatible LLM server with fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8300)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--jitter-ms", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    FAULTS.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        drop_rate=args.drop_rate
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+intent_lists.py
+Per-city, per-intent ranked item lists for keyword-only queries.
+
+A query made only of intent keywords ("cheap", "spicy", "dessert")
+carries nothing for the embedding to match beyond what the cuisine tags
+and price flag already say. Such queries are answered from these lists
+instead of encoding the query and searching FAISS (see
+MoodModel.keyword_query and SmartDineRecommender.retrieve_ranked).
+
+Each list holds FAISS row ids ordered by base_feature_score, the rating,
+popularity and bestseller part of the recommender's feature_score:
+
+    all      every row
+    cheesy   rows tagged cheesy  (lexical_index.CUISINE_TAGS)
+    spicy    rows tagged spicy
+    sweet    rows tagged sweet
+
+Price and rating filters are applied at query time with the attribute
+bitmaps, so one list serves "spicy", "cheap spicy" and "premium spicy".
+Saved next to the FAISS metadata as <faiss_dir>/metadata/<city>.intents.npz.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from lexical_index import tag_flags
+
+# ---------------- CONFIG ---------------- #
+
+ALL_ITEMS = "all"
+
+# Intents that select items by cuisine tag; each gets its own list
+TAG_INTENTS = ("cheesy", "spicy", "sweet")
+
+
+# ---------------- SCORING ---------------- #
+
+def base_feature_score(rating, popularity, bestseller):
+    """
+    Query-independent part of feature_score. Works on scalars and on
+    numpy arrays, so ranking and list building share one formula.
+    """
+    return (
+        0.4 * (rating / 5)
+        + 0.2 * np.minimum(popularity / 1000, 1)
+        + 0.2 * (bestseller == 1)
+    )
+
+
+def list_for_intents(intents):
+    """
+    Ranked list answering `intents`, or None when more than one tag
+    intent is set (their combined ranking is left to the full path).
+    """
+    wanted = [t for t in TAG_INTENTS if intents.get(t)]
+    if len(wanted) > 1:
+        return None
+    return wanted[0] if wanted else ALL_ITEMS
+
+
+# ---------------- BUILD ---------------- #
+
+def intent_lists_path(city, faiss_dir):
+    return os.path.join(faiss_dir, "metadata", f"{city}.intents.npz")
+
+
+def build_intent_lists(city_df):
+    """{list name: int32 row ids, best first} for one city (FAISS row order)."""
+    def column(name):
+        return pd.to_numeric(city_df[name], errors="coerce").fillna(0).to_numpy(dtype="float64")
+
+    scores = base_feature_score(
+        column("Average_Rating"),
+        column("Restaurant_Popularity"),
+        column("Is_Bestseller")
+    )
+    # Stable: equal scores keep catalog order, so rebuilds are reproducible
+    order = np.argsort(-scores, kind="stable").astype("int32")
+
+    lists = {ALL_ITEMS: order}
+    flags = tag_flags(city_df["Cuisine"])
+    for tag in TAG_INTENTS:
+        lists[tag] = order[flags[tag][order]]
+
+    return lists
+
+
+def fallback_rows(city_df, size, min_rating=4.0):
+    """
+    Positions of a city's `size` best rows by base_feature_score (the
+    ALL_ITEMS order), rows at or above `min_rating` first. Served when
+    search has nothing usable for the city.
+    """
+    def column(name):
+        return pd.to_numeric(city_df[name], errors="coerce").fillna(0).to_numpy(dtype="float64")
+
+    rating = column("Average_Rating")
+    scores = base_feature_score(rating, column("Restaurant_Popularity"), column("Is_Bestseller"))
+    order = np.lexsort((-scores, rating < min_rating))
+    return order[:size]
+
+
+def save_intent_lists(city_df, path):
+    np.savez(path, **build_intent_lists(city_df))
+
+
+def load_intent_lists(path):
+    with np.load(path) as f:
+        return {k: f[k] for k in f.files}
@@ -0,0 +1,209 @@
+"""
+intent_matcher.py
+Intent keywords and negation, matched in one regex pass.
+
+The vocabulary is data (config.INTENT_VOCAB_PATH, intent_vocabulary.json):
+
+    {
+      "intents":  {"spicy": ["spicy", "hot", ...], ...},
+      "negation": {
+        "cues":    ["not", "no", "without", ...],
+        "scope":   3,          # words after a cue that it negates
+        "breaks":  ["but", ",", ...],   # end a negation scope early
+        "implies": {"expensive": "cheap"}   # negating one asserts another
+      }
+    }
+
+Keywords, cues and breaks are compiled into a single alternation with
+word boundaries (longest phrase first, so "not expensive" is one
+keyword), and finditer walks the query once. A keyword inside a cue's
+scope is negated: "not spicy" and "no cheese" do not set the intent,
+while another, non-negated keyword still does ("dessert, not chocolate"
+is sweet).
+
+Parity with the previous per-keyword loop is tested in
+tests/test_intent_matcher.py. Micro-benchmark against that loop:
+    python src/intent_matcher.py
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import INTENT_VOCAB_PATH
+from lexical_index import tokenize
+
+# Scope breaks that are punctuation rather than words
+_PUNCTUATION = set(",.;:!?")
+
+
+def _alternation(phrases):
+    return "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+
+
+class IntentMatcher:
+
+    def __init__(self, intents, negation=None):
+        negation = negation or {}
+
+        self.intents = {name: list(words) for name, words in intents.items()}
+        self.scope = int(negation.get("scope", 3))
+        self.implies = dict(negation.get("implies", {}))
+
+        # keyword -> intents it signals
+        self.keywords = {}
+        for name, words in self.intents.items():
+            for word in words:
+                self.keywords.setdefault(word.lower(), []).append(name)
+
+        cues = [c.lower() for c in negation.get("cues", [])]
+        breaks = [b.lower() for b in negation.get("breaks", [])]
+        word_breaks = [b for b in breaks if b not in _PUNCTUATION]
+        punct_breaks = "".join(re.escape(b) for b in breaks if b in _PUNCTUATION)
+
+        # Keywords first: at the same position "not expensive" beats the cue "not"
+        groups = [rf"(?P<keyword>\b(?:{_alternation(self.keywords)})\b)"]
+        if cues:
+            groups.append(rf"(?P<cue>\b(?:{_alternation(cues)})\b)")
+        if word_breaks or punct_breaks:
+            parts = []
+            if word_breaks:
+                parts.append(rf"\b(?:{_alternation(word_breaks)})\b")
+            if punct_breaks:
+                parts.append(f"[{punct_breaks}]")
+            groups.append(f"(?P<brk>{'|'.join(parts)})")
+
+        self.pattern = re.compile("|".join(groups))
+
+    @classmethod
+    def load(cls, path=INTENT_VOCAB_PATH):
+        with open(path, encoding="utf-8") as f:
+            vocab = json.load(f)
+        return cls(vocab["intents"], vocab.get("negation"))
+
+    def _scan(self, text_lower):
+        """Yields (kind, match, negated) for keywords, cues and breaks."""
+        scope_left = 0
+        pos = 0
+
+        for m in self.pattern.finditer(text_lower):
+            if scope_left:
+                scope_left = max(0, scope_left - len(text_lower[pos:m.start()].split()))
+            pos = m.end()
+
+            kind = m.lastgroup
+            if kind == "cue":
+                scope_left = self.scope
+                yield kind, m, False
+            elif kind == "brk":
+                scope_left = 0
+                yield kind, m, False
+            else:
+                negated = scope_left > 0
+                if negated:
+                    scope_left = max(0, scope_left - len(m.group().split()))
+                yield kind, m, negated
+
+    def extract(self, text):
+        """{intent: bool} for every intent in the vocabulary."""
+        positive, negative = set(), set()
+
+        for kind, m, negated in self._scan(text.lower()):
+            if kind == "keyword":
+                (negative if negated else positive).update(self.keywords[m.group()])
+
+        intents = {name: name in positive for name in self.intents}
+
+        # "not costly" -> cheap
+        for name in negative - positive:
+            implied = self.implies.get(name)
+            if implied in intents and implied not in negative - positive:
+                intents[implied] = True
+
+        return intents
+
+    def keyword_only(self, text):
+        """
+        Keywords matched when `text` is only intent keywords, stopwords
+        and punctuation, with no negation; None otherwise.
+        """
+        text_lower = text.lower()
+        found, rest, pos = [], [], 0
+
+        for kind, m, _ in self._scan(text_lower):
+            if kind == "cue":
+                return None
+            rest.append(text_lower[pos:m.start()])
+            pos = m.end()
+            if kind == "keyword":
+                found.append(m.group())
+
+        rest.append(text_lower[pos:])
+        if not found or tokenize(" ".join(rest)):
+            return None
+        return found
+
+
+# ---------------- BENCHMARK ---------------- #
+
+def _legacy_extract_intents(text, intent_keywords):
+    """MoodModel.extract_intents before the compiled matcher."""
+    text_lower = text.lower()
+    intents = {}
+
+    for intent, words in intent_keywords.items():
+        intents[intent] = any(
+            re.search(rf"\b{w}\b", text_lower) for w in words
+        )
+
+    if "not expensive" in text_lower or "not costly" in text_lower:
+        intents["cheap"] = True
+        intents["expensive"] = False
+
+    return intents
+
+
+BENCHMARK_QUERIES = [
+    "something cheesy and italian", "cheap", "spicy", "dessert",
+    "comfort food after a rough day", "paneer tikka", "healthy salad",
+    "party snacks with friends", "not expensive biryani", "hot and spicy food",
+    "italian but not too heavy", "something sweet with chocolate",
+    "fine dining premium dinner", "margherita", "Cheap AND Cheesy!",
+    "budget masala dosa", "creamy pasta, low price", "luxury dessert buffet",
+    "not spicy", "no cheese please", "I don't want anything sweet"
+]
+
+
+def _time_per_call(fn, queries, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for q in queries:
+            fn(q)
+    return (time.perf_counter() - start) / (iterations * len(queries)) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Intent matcher micro-benchmark")
+    parser.add_argument("--vocab", default=INTENT_VOCAB_PATH)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    matcher = IntentMatcher.load(args.vocab)
+
+    legacy_us = _time_per_call(
+        lambda q: _legacy_extract_intents(q, matcher.intents), BENCHMARK_QUERIES, args.iterations
+    )
+    compiled_us = _time_per_call(matcher.extract, BENCHMARK_QUERIES, args.iterations)
+    print(f"[INFO] Per-keyword loop: {legacy_us:.1f} us/query")
+    print(f"[INFO] Compiled matcher: {compiled_us:.1f} us/query ({legacy_us / compiled_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
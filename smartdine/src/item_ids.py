@@ -0,0 +1,172 @@
+"""
+item_ids.py
+Stable integer ids for menu items and cuisines, and the dictionary-encoded
+item tables the city indexes keep in memory.
+
+    item_id     hash of ITEM_KEY (restaurant, dish, place, city)
+    cuisine_id  hash of the Cuisine string
+
+Both are assigned in clean_dataset.py and carried as columns through
+preprocess.py, the FAISS metadata and every result, so session memory,
+ranking and delta updates compare integers instead of strings. Ids come
+from the key itself (lowercased, stripped), not from row order, so the
+same item keeps its id across rebuilds, delta updates and snapshots.
+They are 53-bit (blake2b, like the explanation store keys) so they stay
+exact as JSON numbers in the browser.
+
+ItemTable stores a city's metadata by column: numbers as arrays, strings
+as int32 codes into a table of each column's distinct values (UTF-8 text
+plus offsets, as in the explanation store). Rows are decoded to dicts
+only for the items a request returns.
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Columns that identify one menu item (the clean_dataset.py dedup key)
+ITEM_KEY = ["Restaurant_Name", "Item_Name", "Place_Name", "city"]
+
+ID_BITS = 53
+
+# ---------------- IDS ---------------- #
+
+def _part(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return str(value).strip().lower()
+
+
+def stable_id(*parts):
+    """Non-negative 53-bit id of `parts` (case and surrounding spaces ignored)."""
+    key = "\x1f".join(_part(p) for p in parts)
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") >> (64 - ID_BITS)
+
+
+def item_ids(df):
+    """int64 item id per row. Uses `City` when `city` is missing; Place_Name is optional."""
+    cities = df["city"] if "city" in df.columns else df["City"]
+    places = df["Place_Name"] if "Place_Name" in df.columns else [""] * len(df)
+    return np.fromiter(
+        (stable_id(*key) for key in zip(df["Restaurant_Name"], df["Item_Name"], places, cities)),
+        dtype=np.int64,
+        count=len(df)
+    )
+
+
+def cuisine_ids(cuisines):
+    """int64 cuisine id per Cuisine string; each distinct string is hashed once."""
+    codes, uniques = pd.factorize(pd.Series(cuisines, dtype=object).map(_part))
+    return np.array([stable_id(u) for u in uniques], dtype=np.int64)[codes]
+
+
+def assign_ids(df):
+    """Adds item_id and cuisine_id to `df` (in place) where missing; returns `df`."""
+    if "item_id" not in df.columns:
+        df["item_id"] = item_ids(df)
+    if "cuisine_id" not in df.columns:
+        df["cuisine_id"] = cuisine_ids(df["Cuisine"])
+    return df
+
+# ---------------- ITEM TABLE ---------------- #
+
+class ItemTable:
+    """
+    Column store of one city's item metadata, aligned with its FAISS rows.
+    table[row] gives a fresh dict like the records it replaces, and
+    rows_for() maps item ids back to FAISS rows.
+    """
+
+    def __init__(self, columns, strings):
+        self.columns = columns      # name -> numeric values, or int32 codes (-1 = missing)
+        self.strings = strings      # name -> (offsets, UTF-8 bytes) of a column's distinct values
+        self.names = list(columns)
+        self._len = len(next(iter(columns.values()))) if columns else 0
+        self._id_order = None
+
+    @classmethod
+    def from_frame(cls, df):
+        df = assign_ids(df.reset_index(drop=True).copy())
+        columns, strings = {}, {}
+        for name in df.columns:
+            values = df[name]
+            if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                columns[name] = values.to_numpy()
+            else:
+                codes, uniques = pd.factorize(values.astype(object).where(values.notna(), None))
+                columns[name] = codes.astype(np.int32)
+                strings[name] = _encode_strings(uniques)
+        return cls(columns, strings)
+
+    @classmethod
+    def from_records(cls, records):
+        return cls.from_frame(pd.DataFrame(records))
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, row):
+        item = {}
+        for name in self.names:
+            value = self.columns[name][row]
+            if name in self.strings:
+                item[name] = self._string(name, value) if value >= 0 else float("nan")
+            else:
+                item[name] = value.item()
+        return item
+
+    def _string(self, name, code):
+        offsets, data = self.strings[name]
+        return data[offsets[code]:offsets[code + 1]].decode("utf-8")
+
+    def column(self, name):
+        """Decoded values of one column (missing strings as NaN)."""
+        values = self.columns[name]
+        if name not in self.strings:
+            return values
+        table = np.array([self._string(name, i) for i in range(len(self.strings[name][0]) - 1)] + [np.nan], dtype=object)
+        return table[values]     # code -1 picks the trailing NaN
+
+    def frame(self):
+        return pd.DataFrame({name: self.column(name) for name in self.names})
+
+    def rows_for(self, ids):
+        """FAISS row of each item id in `ids`, -1 where the index does not have it."""
+        ids = np.asarray(ids, dtype=np.int64)
+        item_col = self.columns["item_id"]
+        if not len(item_col):
+            return np.full(len(ids), -1, dtype=np.int64)
+        if self._id_order is None:
+            self._id_order = np.argsort(item_col, kind="stable")
+        pos = np.searchsorted(item_col, ids, sorter=self._id_order)
+        rows = self._id_order[np.minimum(pos, len(item_col) - 1)]
+        return np.where(item_col[rows] == ids, rows, -1)
+
+    # ---------------- STORAGE ---------------- #
+
+    def save(self, path):
+        arrays = {f"col_{name}": values for name, values in self.columns.items()}
+        for name, (offsets, data) in self.strings.items():
+            arrays[f"off_{name}"] = offsets
+            arrays[f"txt_{name}"] = np.frombuffer(data, dtype=np.uint8)
+        np.savez(path, names=np.asarray(self.names, dtype=str), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            names = f["names"].tolist()
+            columns = {name: f[f"col_{name}"] for name in names}
+            strings = {
+                name: (f[f"off_{name}"], f[f"txt_{name}"].tobytes())
+                for name in names if f"off_{name}" in f.files
+            }
+        return cls(columns, strings)
+
+
+def _encode_strings(values):
+    """(offsets, UTF-8 bytes): value i is data[offsets[i]:offsets[i + 1]]."""
+    encoded = [str(v).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
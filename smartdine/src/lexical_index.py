@@ -0,0 +1,216 @@
+"""
+lexical_index.py
+Per-city BM25 inverted index over dish, cuisine and restaurant tokens,
+plus the cuisine keyword tags used by ranking and Surprise Me.
+
+Built next to each FAISS index from the `*_clean` columns written by
+clean_dataset.py (raw columns are normalized the same way when absent).
+Postings are stored CSR-style as plain .npy arrays and opened with
+mmap_mode="r", so a city's lexical index costs no load time and only the
+pages a query touches:
+
+    <faiss_dir>/lexical/<city>/vocab.json    term -> term id
+    <faiss_dir>/lexical/<city>/indptr.npy    int64, postings of term t are
+                                             [indptr[t], indptr[t + 1])
+    <faiss_dir>/lexical/<city>/doc_ids.npy   int32 FAISS row ids
+    <faiss_dir>/lexical/<city>/tf.npy        float32 field-weighted tf
+    <faiss_dir>/lexical/<city>/doc_len.npy   float32 field-weighted length
+"""
+
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+# ---------------- CONFIG ---------------- #
+
+# BM25F-style field weights: a dish-name hit outweighs a cuisine or restaurant hit
+FIELD_WEIGHTS = {
+    "Item_Name": 3.0,
+    "Cuisine": 1.5,
+    "Restaurant_Name": 1.0,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "with", "for", "in", "on", "to", "or",
+    "some", "something", "anything", "food", "dish", "want", "need", "me",
+    "i", "im", "my", "but", "not", "too", "very", "like", "feel", "feeling"
+}
+
+# Cuisine keyword groups, matched as substrings of the lowercased Cuisine
+# once per row (index load / snapshot load) instead of per request.
+CUISINE_TAGS = {
+    "cheesy": ("pizza", "italian", "cheese"),
+    "spicy": ("spicy", "tandoor", "chilli"),
+    "warming": ("spicy", "tandoor", "grill", "soup"),
+    "cooling": ("salad", "juice", "light", "cool"),
+    "sweet": ("dessert", "bakery", "ice cream", "sweet", "mithai"),
+}
+
+
+# ---------------- TEXT ---------------- #
+
+_NON_ALNUM = re.compile(r"[^a-z0-9 ]+")
+
+
+def normalize_text(text):
+    """Same normalization as clean_dataset.normalize_text."""
+    if not isinstance(text, str):
+        return ""
+    return " ".join(_NON_ALNUM.sub(" ", text.lower()).split())
+
+
+def tokenize(text):
+    return [t for t in normalize_text(text).split() if t not in STOPWORDS]
+
+
+def field_column(df, field):
+    clean = f"{field}_clean"
+    if clean in df.columns:
+        return df[clean].fillna("").astype(str)
+    return df[field].map(normalize_text) if field in df.columns else pd.Series([""] * len(df))
+
+
+# ---------------- TAGS ---------------- #
+
+def tag_flags(cuisines):
+    """{tag: bool array} for a Series of Cuisine strings."""
+    lowered = pd.Series(cuisines).fillna("").astype(str).str.lower()
+    return {
+        tag: lowered.str.contains("|".join(keywords), regex=True).to_numpy()
+        for tag, keywords in CUISINE_TAGS.items()
+    }
+
+
+def row_tags(cuisines):
+    """Per-row tuple of tag names, aligned with `cuisines`."""
+    flags = tag_flags(cuisines)
+    names = list(flags)
+    matrix = np.column_stack([flags[t] for t in names]) if names else np.zeros((len(cuisines), 0), bool)
+    return [tuple(n for n, hit in zip(names, row) if hit) for row in matrix]
+
+
+# ---------------- BUILD ---------------- #
+
+def lexical_dir(city, faiss_dir):
+    return os.path.join(faiss_dir, "lexical", city)
+
+
+def build_postings(city_df):
+    """CSR postings arrays for one city (rows in FAISS order)."""
+    columns = {field: field_column(city_df, field).tolist() for field in FIELD_WEIGHTS}
+
+    vocab = {}
+    terms, docs, tfs = [], [], []
+    doc_len = np.zeros(len(city_df), dtype="float32")
+
+    for doc_id in range(len(city_df)):
+        tf = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(columns[field][doc_id]):
+                tf[token] = tf.get(token, 0.0) + weight
+                doc_len[doc_id] += weight
+
+        for token, value in tf.items():
+            terms.append(vocab.setdefault(token, len(vocab)))
+            docs.append(doc_id)
+            tfs.append(value)
+
+    terms = np.asarray(terms, dtype="int64")
+    order = np.lexsort((np.asarray(docs), terms))
+
+    indptr = np.zeros(len(vocab) + 1, dtype="int64")
+    np.cumsum(np.bincount(terms, minlength=len(vocab)), out=indptr[1:])
+
+    return {
+        "vocab": vocab,
+        "indptr": indptr,
+        "doc_ids": np.asarray(docs, dtype="int32")[order],
+        "tf": np.asarray(tfs, dtype="float32")[order],
+        "doc_len": doc_len
+    }
+
+
+def build_lexical_index(city_df, out_dir):
+    postings = build_postings(city_df)
+    os.makedirs(out_dir, exist_ok=True)
+
+    with open(os.path.join(out_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(postings["vocab"], f)
+    for name in ("indptr", "doc_ids", "tf", "doc_len"):
+        np.save(os.path.join(out_dir, f"{name}.npy"), postings[name])
+
+    return len(postings["vocab"])
+
+
+# ---------------- SEARCH ---------------- #
+
+class LexicalIndex:
+
+    def __init__(self, vocab, indptr, doc_ids, tf, doc_len):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tf = tf
+        self.doc_len = doc_len
+        self.n_docs = len(doc_len)
+        self.avgdl = float(np.mean(doc_len)) if self.n_docs else 1.0
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "vocab.json"), encoding="utf-8") as f:
+            vocab = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in ("indptr", "doc_ids", "tf", "doc_len")
+        }
+        return cls(vocab, **arrays)
+
+    @classmethod
+    def from_frame(cls, city_df):
+        """In-memory index for cities built before lexical indexes existed."""
+        return cls(**build_postings(city_df))
+
+    def search(self, tokens, top_k, allowed=None):
+        """
+        BM25 top-k as (scores, row ids), best first. `allowed` is a packed
+        little-bit-order row bitmap (CityIndex.filter_bitmap) or None.
+        """
+        ids, weights = [], []
+
+        for token in set(tokens):
+            term = self.vocab.get(token)
+            if term is None:
+                continue
+
+            start, end = self.indptr[term], self.indptr[term + 1]
+            docs = np.asarray(self.doc_ids[start:end])
+            tf = np.asarray(self.tf[start:end])
+
+            df = end - start
+            idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(self.doc_len[docs]) / self.avgdl)
+
+            ids.append(docs)
+            weights.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+
+        if not ids:
+            return np.empty(0, dtype="float32"), np.empty(0, dtype="int64")
+
+        docs, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights)).astype("float32")
+
+        if allowed is not None:
+            keep = ((allowed[docs >> 3] >> (docs & 7)) & 1).astype(bool)
+            docs, scores = docs[keep], scores[keep]
+
+        if len(docs) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            docs, scores = docs[top], scores[top]
+
+        order = np.argsort(-scores, kind="stable")
+        return scores[order], docs[order].astype("int64")
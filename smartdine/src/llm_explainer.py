@@ -1,16 +1,57 @@
-import os
+import json
 import random
-from dotenv import load_dotenv
-from groq import Groq
+from llm_gateway import LLMGateway, LLMUnavailable
+from explanation_store import ExplanationStore
+from metrics import counter, METRICS_ENABLED
 
+EXPLANATIONS = counter(
+    "smartdine_explanations_total",
+    "Explanations by source (store/llm/template) and mode (single/batch).",
+    ["source", "mode"]
+)
 
-load_dotenv()
+STYLES = [
+    "friendly foodie tone",
+    "warm and comforting",
+    "casual and conversational",
+    "short and energetic",
+    "descriptive and thoughtful"
+]
 
-api_key = os.getenv("GROQ_API_KEY")
-if not api_key:
-    raise RuntimeError("GROQ_API_KEY not found in environment.")
+SYSTEM_PROMPT = (
+    "You are a food recommendation assistant like Swiggy or Zomato.\n"
+    "Every explanation must be unique.\n"
+    "Avoid generic phrases like 'solid pick', 'fits the moment', or 'quietly delivers'.\n"
+    "Mention at least one concrete attribute such as flavor, spice level, texture, or richness.\n"
+    "Sound natural and human."
+)
 
-client = Groq(api_key=api_key)
+TOKENS_PER_EXPLANATION = 90
+
+
+def template_explanation(*, item, city, weather=None) -> str:
+    """
+    No-LLM explanation: used when the LLM call fails, and by the
+    recommender when a request's deadline leaves no time for it.
+    """
+    dish = item.get("Item_Name", "this dish")
+    restaurant = item.get("Restaurant_Name", "this restaurant")
+    weather_category = weather.get("category") if weather else None
+
+    if weather_category:
+        fallbacks = [
+            f"In {city}’s {weather_category} weather, the flavors of {dish} at {restaurant} feel especially comforting.",
+            f"The {dish.lower()} from {restaurant} works well right now, particularly with the {weather_category} conditions.",
+            f"{dish} at {restaurant} feels like a natural choice given the {weather_category} weather in {city}."
+        ]
+    else:
+        fallbacks = [
+            f"{dish} from {restaurant} stands out for its flavors and is an easy choice if you’re deciding quickly.",
+            f"If you’re in the mood for something familiar, {restaurant} does this dish particularly well.",
+            f"This dish offers a satisfying balance of taste and comfort without overthinking the choice."
+        ]
+
+    return random.choice(fallbacks)
 
 
 class LLMExplainer:
@@ -21,8 +62,16 @@ class LLMExplainer:
     - Unique wording per item
     - Natural tone (no forced patterns)
     - Weather mentioned ONLY when relevant
+
+    Pre-generated explanations (src/explanation_store.py) are served
+    first. Calls go through LLMGateway (pooled client, timeouts, circuit
+    breaker, rate limit); anything it refuses gets a template.
     """
 
+    def __init__(self, gateway=None, store=None):
+        self.gateway = gateway if gateway is not None else LLMGateway()
+        self.store = store if store is not None else ExplanationStore.open()
+
     def explain(
         self,
         *,
@@ -30,36 +79,18 @@ class LLMExplainer:
         city,
         mood=None,
         weather=None,
-        surprise=False
+        surprise=False,
+        timeout_ms=None
     ) -> str:
 
-        dish = item.get("Item_Name", "this dish")
-        restaurant = item.get("Restaurant_Name", "this restaurant")
-        rating = item.get("Average_Rating", "N/A")
-        cuisine = item.get("Cuisine", "the cuisine")
-        price = "budget-friendly" if item.get("Is_Expensive") == 0 else "premium"
+        stored = self.store.lookup(item=item, city=city, mood=mood, weather=weather)
+        if stored:
+            _record("store", "single")
+            return stored
 
+        facts = _item_facts(item)
         weather_category = weather.get("category") if weather else None
 
-        
-        style = random.choice([
-            "friendly foodie tone",
-            "warm and comforting",
-            "casual and conversational",
-            "short and energetic",
-            "descriptive and thoughtful"
-        ])
-
-        
-        system_prompt = (
-            "You are a food recommendation assistant like Swiggy or Zomato.\n"
-            "Every explanation must be unique.\n"
-            "Avoid generic phrases like 'solid pick', 'fits the moment', or 'quietly delivers'.\n"
-            "Mention at least one concrete attribute such as flavor, spice level, texture, or richness.\n"
-            "Sound natural and human."
-        )
-
-        
         weather_instruction = ""
         if weather_category:
             weather_instruction = (
@@ -67,16 +98,15 @@ class LLMExplainer:
                 "- Do NOT force weather if it sounds unnatural.\n"
             )
 
-        
         user_prompt = f"""
-Write a {style} explanation in 1–2 sentences.
+Write a {random.choice(STYLES)} explanation in 1–2 sentences.
 
-Dish: {dish}
-Restaurant: {restaurant}
+Dish: {facts["dish"]}
+Restaurant: {facts["restaurant"]}
 City: {city}
-Cuisine: {cuisine}
-Rating: {rating}/5
-Price: {price}
+Cuisine: {facts["cuisine"]}
+Rating: {facts["rating"]}/5
+Price: {facts["price"]}
 Mood: {mood or "unspecified"}
 Surprise mode: {surprise}
 
@@ -88,30 +118,181 @@ Guidelines:
 """
 
         try:
-            response = client.chat.completions.create(
-                model="llama3-8b-8192",
-                messages=[
-                    {"role": "system", "content": system_prompt},
+            text = self.gateway.complete(
+                [
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=random.uniform(0.9, 1.1),
-                max_tokens=90
+                max_tokens=TOKENS_PER_EXPLANATION,
+                timeout_ms=timeout_ms
             )
-            return response.choices[0].message.content.strip()
-
-        except Exception:
-            
-            if weather_category:
-                fallbacks = [
-                    f"In {city}’s {weather_category} weather, the flavors of {dish} at {restaurant} feel especially comforting.",
-                    f"The {dish.lower()} from {restaurant} works well right now, particularly with the {weather_category} conditions.",
-                    f"{dish} at {restaurant} feels like a natural choice given the {weather_category} weather in {city}."
-                ]
+            _record("llm", "single")
+            return text
+
+        except LLMUnavailable:
+            _record("template", "single")
+            return template_explanation(item=item, city=city, weather=weather)
+
+    def explain_batch(
+        self,
+        *,
+        items,
+        city,
+        mood=None,
+        weather=None,
+        weather_index=None,
+        surprise=False,
+        timeout_ms=None
+    ) -> list:
+        """
+        One LLM call for all of a request's items that have no stored
+        explanation. `weather` is used for the item at `weather_index`
+        only, as explain() does per item. `timeout_ms` bounds the call
+        (LLMGateway.complete).
+
+        The model answers in JSON mode; every item whose explanation is
+        missing or empty in the reply (or all of them, if the call fails)
+        gets a template instead. Returns one string per item, in order.
+        """
+        if not items:
+            return []
+
+        explanations = [
+            self.store.lookup(item=item, city=city, mood=mood, weather=weather if i == weather_index else None)
+            for i, item in enumerate(items)
+        ]
+        missing = [i for i, text in enumerate(explanations) if not text]
+        _record("store", "batch", len(items) - len(missing))
+        if not missing:
+            return explanations
+
+        weather_category = weather.get("category") if weather else None
+        lines = [
+            _dish_line(n, items[i], weather_category if i == weather_index else None)
+            for n, i in enumerate(missing, start=1)
+        ]
+        texts = self._complete_batch(lines, city=city, mood=mood, surprise=surprise, timeout_ms=timeout_ms)
+
+        for i, text in zip(missing, texts):
+            if text:
+                _record("llm", "batch")
+                explanations[i] = text
             else:
-                fallbacks = [
-                    f"{dish} from {restaurant} stands out for its flavors and is an easy choice if you’re deciding quickly.",
-                    f"If you’re in the mood for something familiar, {restaurant} does this dish particularly well.",
-                    f"This dish offers a satisfying balance of taste and comfort without overthinking the choice."
-                ]
+                _record("template", "batch")
+                explanations[i] = template_explanation(
+                    item=items[i], city=city, weather=weather if i == weather_index else None
+                )
+        return explanations
+
+    def explain_variants(self, *, item, city, mood=None, weather=None, n=3) -> list:
+        """
+        Up to `n` differently styled LLM explanations of one item, in one
+        call; used by the pre-generation job. No templates: an empty list
+        means the call failed.
+        """
+        weather_category = weather.get("category") if weather else None
+        lines = [_dish_line(k, item, weather_category) for k in range(1, n + 1)]
+        texts = self._complete_batch(lines, city=city, mood=mood, surprise=False)
+        return list(dict.fromkeys(text for text in texts if text))
+
+    def _complete_batch(self, lines, *, city, mood, surprise, timeout_ms=None):
+        """One JSON-mode call for the numbered dish lines; text or None per line."""
+        user_prompt = f"""
+Write one explanation of 1–2 sentences for each dish below, in the style given for it.
+
+City: {city}
+Mood: {mood or "unspecified"}
+Surprise mode: {surprise}
+
+Dishes:
+{chr(10).join(lines)}
+
+Guidelines:
+- Each explanation must use different wording and sentence patterns
+- Avoid vague wording
+- Focus on why someone would enjoy this dish
+- Only mention weather where asked to
+
+Answer with JSON only, one entry per dish number:
+{{"explanations": [{{"id": 1, "text": "..."}}, {{"id": 2, "text": "..."}}]}}
+"""
+
+        try:
+            reply = self.gateway.complete(
+                [
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=random.uniform(0.9, 1.1),
+                max_tokens=TOKENS_PER_EXPLANATION * len(lines) + 20,
+                response_format={"type": "json_object"},
+                timeout_ms=timeout_ms
+            )
+        except LLMUnavailable:
+            return [None] * len(lines)
+
+        return parse_batch(reply, len(lines))
+
+
+# ---------------- HELPERS ---------------- #
+
+def _item_facts(item):
+    return {
+        "dish": item.get("Item_Name", "this dish"),
+        "restaurant": item.get("Restaurant_Name", "this restaurant"),
+        "rating": item.get("Average_Rating", "N/A"),
+        "cuisine": item.get("Cuisine", "the cuisine"),
+        "price": "budget-friendly" if item.get("Is_Expensive") == 0 else "premium"
+    }
+
+
+def _dish_line(number, item, weather_category=None):
+    facts = _item_facts(item)
+    line = (
+        f"[{number}] Dish: {facts['dish']} | Restaurant: {facts['restaurant']} | "
+        f"Cuisine: {facts['cuisine']} | Rating: {facts['rating']}/5 | "
+        f"Price: {facts['price']} | Style: {random.choice(STYLES)}"
+    )
+    if weather_category:
+        line += f" | Weather: relate it to the {weather_category} weather only if natural"
+    return line
+
+
+def parse_batch(reply, n_items):
+    """
+    Explanations by position from a batch reply: a list of n_items
+    strings, with None for every id that is missing, out of range or
+    empty. Tolerates code fences and text around the JSON object.
+    """
+    texts = [None] * n_items
+
+    start, end = reply.find("{"), reply.rfind("}")
+    if start < 0 or end <= start:
+        return texts
+    try:
+        payload = json.loads(reply[start:end + 1])
+    except ValueError:
+        return texts
+
+    entries = payload.get("explanations") if isinstance(payload, dict) else None
+    if not isinstance(entries, list):
+        return texts
+
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            i = int(entry.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        text = entry.get("text")
+        if 0 <= i < n_items and texts[i] is None and isinstance(text, str) and text.strip():
+            texts[i] = text.strip()
+
+    return texts
+
 
-            return random.choice(fallbacks)
+def _record(source, mode, amount=1):
+    if METRICS_ENABLED and amount:
+        EXPLANATIONS.inc(amount, source=source, mode=mode)
@@ -0,0 +1,347 @@
+"""
+llm_gateway.py
+Resilient client for the LLM provider (Groq's OpenAI-compatible API).
+
+One Groq client on a pooled keep-alive HTTP connection is shared by
+every explanation thread, with:
+
+- per-call connect/read timeouts (shortened to a request's remaining
+  deadline when the caller passes one) and no SDK retries
+- a circuit breaker: after LLM_FAILURE_THRESHOLD failures in a row,
+  calls fail fast while a background thread probes the provider every
+  LLM_PROBE_SECONDS; the first successful probe closes the circuit
+- a token bucket that keeps us under the provider's request quota
+
+A call that is refused or fails raises LLMUnavailable, and the caller
+falls back to a template explanation.
+
+Try it against the fake provider (src/fake_llm_server.py):
+    python src/fake_llm_server.py --port 8300 --latency-ms 300 --error-rate 0.5
+    SMARTDINE_LLM_BASE_URL=http://127.0.0.1:8300 GROQ_API_KEY=test \\
+        python src/llm_gateway.py --requests 200 --concurrency 16
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from dotenv import load_dotenv
+from groq import Groq, APITimeoutError
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import (
+    LLM_BASE_URL,
+    LLM_MODEL,
+    LLM_CONNECT_TIMEOUT_MS,
+    LLM_TIMEOUT_MS,
+    LLM_MAX_CONNECTIONS,
+    LLM_KEEPALIVE_CONNECTIONS,
+    LLM_FAILURE_THRESHOLD,
+    LLM_PROBE_SECONDS,
+    LLM_RATE_PER_SECOND,
+    LLM_RATE_BURST,
+    LLM_RATE_WAIT_MS
+)
+from metrics import counter, histogram, gauge, METRICS_ENABLED
+
+load_dotenv()
+
+LLM_REQUESTS = counter(
+    "smartdine_llm_requests_total",
+    "LLM calls by result (ok/timeout/error/open/rate_limited/no_key).",
+    ["result"]
+)
+LLM_SECONDS = histogram(
+    "smartdine_llm_seconds",
+    "Latency of LLM calls that reached the provider."
+)
+LLM_TOKENS = counter(
+    "smartdine_llm_tokens_total",
+    "Tokens used by successful LLM calls (prompt/completion), as reported by the provider.",
+    ["kind"]
+)
+LLM_CIRCUIT_OPENED = counter(
+    "smartdine_llm_circuit_opened_total",
+    "Times the LLM circuit breaker opened."
+)
+
+# Breaker of the most recently built gateway (the one serving requests);
+# registered once, since the registry keeps the first metric per name
+_current_breaker = None
+
+LLM_CIRCUIT_OPEN = gauge(
+    "smartdine_llm_circuit_open",
+    "1 while the LLM circuit breaker is open.",
+    fn=lambda: {(): int(_current_breaker is not None and _current_breaker.state == CircuitBreaker.OPEN)}
+)
+
+
+class LLMUnavailable(Exception):
+    """The call was not made, or failed; `reason` is the metrics result label."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+# ---------------- RATE LIMIT ---------------- #
+
+class TokenBucket:
+    """`rate` calls per second with bursts up to `burst`; rate <= 0 disables it."""
+
+    def __init__(self, rate=LLM_RATE_PER_SECOND, burst=LLM_RATE_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=0.0):
+        """Take a token, waiting up to `timeout` seconds; False if none came."""
+        if self.rate <= 0:
+            return True
+
+        give_up = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+
+            if now + wait > give_up:
+                return False
+            time.sleep(wait)
+
+
+# ---------------- CIRCUIT BREAKER ---------------- #
+
+class CircuitBreaker:
+    """
+    Closed: calls go through and consecutive failures are counted.
+    Open: calls are refused; a daemon thread runs `probe` every
+    `probe_seconds` and closes the circuit when it returns. Requests
+    never act as the probe, so none of them waits on a dead provider.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+
+    def __init__(self, probe, failure_threshold=LLM_FAILURE_THRESHOLD, probe_seconds=LLM_PROBE_SECONDS):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_seconds = probe_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.OPEN or self.failures < self.failure_threshold:
+                return
+            self.state = self.OPEN
+
+        if METRICS_ENABLED:
+            LLM_CIRCUIT_OPENED.inc()
+        print(f"[WARN] LLM circuit open after {self.failures} failures; probing every {self.probe_seconds}s")
+        threading.Thread(target=self._probe_loop, name="llm-probe", daemon=True).start()
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.probe_seconds)
+            try:
+                self.probe()
+            except Exception:
+                continue
+
+            with self._lock:
+                self.state = self.CLOSED
+                self.failures = 0
+            print("[INFO] LLM circuit closed: provider answered the probe")
+            return
+
+
+# ---------------- GATEWAY ---------------- #
+
+class LLMGateway:
+
+    def __init__(
+        self,
+        api_key=None,
+        base_url=LLM_BASE_URL,
+        model=LLM_MODEL,
+        timeout_ms=LLM_TIMEOUT_MS,
+        connect_timeout_ms=LLM_CONNECT_TIMEOUT_MS,
+        max_connections=LLM_MAX_CONNECTIONS,
+        keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+        breaker=None,
+        limiter=None,
+        rate_wait_ms=LLM_RATE_WAIT_MS
+    ):
+        self.api_key = api_key if api_key is not None else os.getenv("GROQ_API_KEY")
+        self.base_url = base_url or None
+        self.model = model
+        self.timeout_ms = timeout_ms
+        self.connect_timeout_ms = connect_timeout_ms
+        self.timeout = httpx.Timeout(timeout_ms / 1000, connect=connect_timeout_ms / 1000)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=keepalive_connections,
+            keepalive_expiry=30
+        )
+        self.breaker = breaker or CircuitBreaker(self._probe)
+        self.limiter = limiter or TokenBucket()
+        self.rate_wait = rate_wait_ms / 1000
+        self._client = None
+        self._client_lock = threading.Lock()
+
+        if not self.api_key:
+            print("[WARN] GROQ_API_KEY not set; explanations will use templates")
+
+        global _current_breaker
+        _current_breaker = self.breaker
+
+    @property
+    def client(self):
+        """Groq client on one pooled httpx.Client, created on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = Groq(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        timeout=self.timeout,
+                        max_retries=0,
+                        http_client=httpx.Client(limits=self.limits, timeout=self.timeout)
+                    )
+        return self._client
+
+    def complete(self, messages, timeout_ms=None, **params):
+        """
+        Chat completion text. Raises LLMUnavailable without calling the
+        provider when there is no key, the circuit is open or the rate
+        limit is hit, and on any failed call.
+
+        `timeout_ms` (a request's remaining deadline) shortens this call's
+        rate-limit wait and timeouts; it never extends them past the
+        gateway's own.
+        """
+        timeout, rate_wait = self.timeout, self.rate_wait
+        if timeout_ms is not None:
+            timeout_ms = max(0.0, min(timeout_ms, self.timeout_ms))
+            timeout = httpx.Timeout(timeout_ms / 1000, connect=min(timeout_ms, self.connect_timeout_ms) / 1000)
+            rate_wait = min(rate_wait, timeout_ms / 1000)
+
+        if not self.api_key:
+            raise self._refuse("no_key")
+        if not self.breaker.allow():
+            raise self._refuse("open")
+        if timeout_ms is not None and timeout_ms <= 0:
+            raise self._refuse("timeout")
+        if not self.limiter.acquire(rate_wait):
+            raise self._refuse("rate_limited")
+
+        start = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(
+                model=params.pop("model", self.model),
+                messages=messages,
+                timeout=timeout,
+                **params
+            )
+            text = response.choices[0].message.content.strip()
+        except Exception as e:
+            if self._provider_failure(e):
+                self.breaker.record_failure()
+            raise self._refuse("timeout" if isinstance(e, APITimeoutError) else "error") from e
+        finally:
+            if METRICS_ENABLED:
+                LLM_SECONDS.observe(time.perf_counter() - start)
+
+        self.breaker.record_success()
+        if METRICS_ENABLED:
+            LLM_REQUESTS.inc(result="ok")
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                LLM_TOKENS.inc(usage.prompt_tokens or 0, kind="prompt")
+                LLM_TOKENS.inc(usage.completion_tokens or 0, kind="completion")
+        return text
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+
+    def _probe(self):
+        """Cheapest authenticated call: list models."""
+        self.client.models.list()
+
+    @staticmethod
+    def _provider_failure(error):
+        """Errors that say the provider is unhealthy; a rejected request (400/422) is not one."""
+        status = getattr(error, "status_code", None)
+        return status is None or status in (408, 429) or status >= 500
+
+    @staticmethod
+    def _refuse(reason):
+        if METRICS_ENABLED:
+            LLM_REQUESTS.inc(result=reason)
+        return LLMUnavailable(reason)
+
+
+# ---------------- ENTRY ---------------- #
+
+def main(argv=None):
+    """Fire concurrent calls and report results and breaker state."""
+    parser = argparse.ArgumentParser(description="Exercise the LLM gateway")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    gateway = LLMGateway()
+    results = {}
+    lock = threading.Lock()
+
+    def call(i):
+        start = time.perf_counter()
+        try:
+            gateway.complete([{"role": "user", "content": f"ping {i}"}], max_tokens=8)
+            result = "ok"
+        except LLMUnavailable as e:
+            result = e.reason
+        ms = (time.perf_counter() - start) * 1000
+        with lock:
+            results.setdefault(result, []).append(ms)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(call, range(args.requests)))
+    total = time.perf_counter() - start
+
+    print(f"[INFO] {args.requests} calls in {total:.2f}s, circuit {gateway.breaker.state}")
+    for result, times in sorted(results.items()):
+        times.sort()
+        print(f"  {result:<13} {len(times):>5}  p50 {times[len(times) // 2]:8.1f} ms  max {times[-1]:8.1f} ms")
+    gateway.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -20,8 +20,9 @@ class SessionMemory:
         mem["moods"].append(mood)
         mem["city"] = city
 
+        # Integer ids (item_ids.py), so ranking compares ints, not strings
         for r in results:
-            if r.get("Cuisine"):
-                mem["cuisines"].append(r["Cuisine"])
-            if r.get("Item_Name"):
-                mem["items"].append(r["Item_Name"])
+            if r.get("cuisine_id") is not None:
+                mem["cuisines"].append(int(r["cuisine_id"]))
+            if r.get("item_id") is not None:
+                mem["items"].append(int(r["item_id"]))
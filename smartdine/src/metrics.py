@@ -0,0 +1,289 @@
+"""
+metrics.py
+Lightweight span timing and Prometheus-style metrics for SmartDine.
+
+    with span("encode"):
+        q_emb = model.encode(...)
+
+Each span feeds the `smartdine_stage_seconds` histogram and, inside a
+`collect_timings()` block, the per-request timings dict returned to
+debug requests. With metrics disabled and no timings being collected,
+`span` returns a shared no-op object.
+"""
+
+import os
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# ---------------- CONFIG ---------------- #
+
+METRICS_ENABLED = os.getenv("SMARTDINE_METRICS", "1") != "0"
+
+# Seconds: 1 ms .. 10 s covers everything from a FAISS search to an LLM call
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+# ---------------- METRIC TYPES ---------------- #
+
+def _label_str(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(l, "") for l in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(l, "") for l in self.labelnames)
+        return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, val in items:
+            lines.append(f"{self.name}{_label_str(self.labelnames, key)} {val}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is computed by a callback at scrape time."""
+
+    def __init__(self, name, help, labelnames=(), fn=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, val in sorted(self.fn().items()):
+            lines.append(f"{self.name}{_label_str(self.labelnames, key)} {val}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(l, "") for l in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_label_str(self.labelnames, key, ('le', bound))} {cumulative}"
+                )
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+# ---------------- REGISTRY ---------------- #
+
+_REGISTRY = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _register(metric):
+    with _REGISTRY_LOCK:
+        existing = _REGISTRY.get(metric.name)
+        if existing is not None:
+            return existing
+        _REGISTRY[metric.name] = metric
+        return metric
+
+
+def counter(name, help, labelnames=()):
+    return _register(Counter(name, help, labelnames))
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    return _register(Histogram(name, help, labelnames, buckets))
+
+
+def gauge(name, help, labelnames=(), fn=None):
+    return _register(Gauge(name, help, labelnames, fn))
+
+
+def render_metrics():
+    """Text exposition format (Prometheus 0.0.4)."""
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- CORE METRICS ---------------- #
+
+STAGE_SECONDS = histogram(
+    "smartdine_stage_seconds",
+    "Time spent in each recommendation pipeline stage.",
+    ["stage"]
+)
+
+BATCH_SIZE = histogram(
+    "smartdine_inference_batch_size",
+    "Number of texts per model inference call.",
+    ["model"],
+    buckets=BATCH_BUCKETS
+)
+
+CACHE_REQUESTS = counter(
+    "smartdine_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss).",
+    ["cache", "result"]
+)
+
+
+def _cache_hit_ratios():
+    totals = {}
+    with CACHE_REQUESTS._lock:
+        for (cache, result), val in CACHE_REQUESTS._values.items():
+            hits, total = totals.get(cache, (0, 0))
+            totals[cache] = (hits + (val if result == "hit" else 0), total + val)
+    return {(cache,): round(hits / total, 4) for cache, (hits, total) in totals.items() if total}
+
+
+CACHE_HIT_RATIO = gauge(
+    "smartdine_cache_hit_ratio",
+    "Hit ratio per cache since process start.",
+    ["cache"],
+    fn=_cache_hit_ratios
+)
+
+
+def record_cache(cache, hit):
+    if METRICS_ENABLED:
+        CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_batch(model, size):
+    if METRICS_ENABLED:
+        BATCH_SIZE.observe(size, model=model)
+
+
+# ---------------- SPANS ---------------- #
+
+_timings = contextvars.ContextVar("smartdine_timings", default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start", "timings")
+
+    def __init__(self, name, timings):
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+
+        if METRICS_ENABLED:
+            STAGE_SECONDS.observe(elapsed, stage=self.name)
+
+        if self.timings is not None:
+            # Stages can repeat within a request (one explain per item)
+            self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed * 1000
+
+        return False
+
+
+def span(name):
+    timings = _timings.get()
+    if not METRICS_ENABLED and timings is None:
+        return _NOOP_SPAN
+    return _Span(name, timings)
+
+
+def record_timing(name, ms):
+    """Add a measured duration to the current request's debug timings, if any."""
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + ms
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collect per-stage milliseconds for the current request:
+
+        with collect_timings() as timings:
+            response = recommender.recommend(...)
+    """
+    timings = {}
+    token = _timings.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings["total"] = (time.perf_counter() - start) * 1000
+        _timings.reset(token)
+        for k in timings:
+            timings[k] = round(timings[k], 3)
@@ -1,92 +1,130 @@
-import re
-from sentence_transformers import SentenceTransformer, util
 import numpy as np
+from encoder import get_encoder
+from intent_matcher import IntentMatcher
+
+
+# ---------------- MOODS ---------------- #
+
+MOOD_PHRASES = {
+    "comfort": [
+        "comfort food", "feeling low", "rough day",
+        "tired", "need something filling", "home style"
+    ],
+    "party": [
+        "party", "snacks", "friends", "celebration",
+        "fast food", "street food"
+    ],
+    "healthy": [
+        "healthy", "light food", "low calorie",
+        "fresh", "diet", "salad"
+    ],
+    "premium": [
+        "luxury", "fine dining", "fancy",
+        "premium", "expensive restaurant"
+    ],
+}
+
+
+def mood_centroids(model, mood_phrases=MOOD_PHRASES):
+    """
+    (mood names, unit-length centroid per mood) from one encode of all
+    phrases. Used offline to score every item against every mood
+    (faiss_index.build_mood_affinity).
+    """
+    moods = list(mood_phrases)
+    phrases = [p for mood in moods for p in mood_phrases[mood]]
+
+    vectors = MoodModel._normalize(np.asarray(model.encode(phrases), dtype="float32"))
+
+    centroids, start = [], 0
+    for mood in moods:
+        end = start + len(mood_phrases[mood])
+        centroids.append(vectors[start:end].mean(axis=0))
+        start = end
+
+    return moods, MoodModel._normalize(np.stack(centroids))
 
 
 class MoodModel:
     """
     Extracts:
     - primary mood (comfort, party, healthy, premium, etc.)
-    - intent signals (cheap, expensive, cheesy, spicy, sweet)
+    - intent signals (cheap, expensive, cheesy, spicy, sweet, ...)
     """
 
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model=None, intent_matcher=None):
+        # Share the recommender's encoder when given one
+        self.model = model if model is not None else get_encoder()
 
         # ---------------- MOODS ---------------- #
-        self.mood_phrases = {
-            "comfort": [
-                "comfort food", "feeling low", "rough day",
-                "tired", "need something filling", "home style"
-            ],
-            "party": [
-                "party", "snacks", "friends", "celebration",
-                "fast food", "street food"
-            ],
-            "healthy": [
-                "healthy", "light food", "low calorie",
-                "fresh", "diet", "salad"
-            ],
-            "premium": [
-                "luxury", "fine dining", "fancy",
-                "premium", "expensive restaurant"
-            ],
-        }
+        self.mood_phrases = MOOD_PHRASES
 
         # ---------------- INTENTS ---------------- #
-        self.intent_keywords = {
-            "cheap": [
-                "cheap", "affordable", "budget",
-                "not expensive", "low price"
-            ],
-            "expensive": [
-                "expensive", "premium", "costly", "luxury"
-            ],
-            "cheesy": [
-                "cheesy", "cheese", "creamy"
-            ],
-            "spicy": [
-                "spicy", "hot", "fiery", "masala"
-            ],
-            "sweet": [
-                "sweet", "dessert", "chocolate", "sugar"
-            ]
-        }
+        # Keywords and negation cues come from config.INTENT_VOCAB_PATH
+        self.intent_matcher = intent_matcher if intent_matcher is not None else IntentMatcher.load()
+        self.intent_keywords = self.intent_matcher.intents
 
-        # Precompute mood embeddings
+        # Precompute mood embeddings (L2-normalized, so dot = cosine)
         self.mood_embeddings = {
-            mood: self.model.encode(phrases, convert_to_tensor=True)
+            mood: self._normalize(np.asarray(self.model.encode(phrases), dtype="float32"))
             for mood, phrases in self.mood_phrases.items()
         }
 
+        # Intent keyword embeddings: the mood of a keyword-only query is
+        # read from these instead of encoding it (see keyword_query)
+        keywords = sorted({w.lower() for words in self.intent_keywords.values() for w in words})
+        self.keyword_embeddings = dict(zip(
+            keywords,
+            self._normalize(np.asarray(self.model.encode(keywords), dtype="float32"))
+        ))
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.atleast_2d(vectors)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
     # -------------------------------------------------
     # Keyword-based intent detection
     # -------------------------------------------------
     def extract_intents(self, text):
-        text_lower = text.lower()
-        intents = {}
+        # One precompiled pass; "not spicy" / "no cheese" negate the intent
+        return self.intent_matcher.extract(text)
 
-        for intent, words in self.intent_keywords.items():
-            intents[intent] = any(
-                re.search(rf"\b{w}\b", text_lower) for w in words
-            )
+    def keyword_query(self, text):
+        """
+        (mood, mood_score, intents) for a query made only of intent
+        keywords and stopwords ("cheap", "something spicy"), without
+        running the encoder; None for any other query, including negated
+        ones.
 
-        # Handle negation: "not expensive"
-        if "not expensive" in text_lower or "not costly" in text_lower:
-            intents["cheap"] = True
-            intents["expensive"] = False
+        The mood is scored against the mean of the keywords' precomputed
+        embeddings, which is exact for a single keyword.
+        """
+        found = self.intent_matcher.keyword_only(text)
+        if found is None:
+            return None
 
-        return intents
+        query_emb = np.mean([self.keyword_embeddings[w] for w in found], axis=0)
+        mood, mood_score = self.detect_mood(text, query_emb)
+
+        return mood, mood_score, self.extract_intents(text)
 
     # -------------------------------------------------
     # Embedding-based mood score
     # -------------------------------------------------
-    def detect_mood(self, text):
-        query_emb = self.model.encode(text, convert_to_tensor=True)
+    def detect_mood(self, text, query_emb=None):
+        """
+        `query_emb` lets the recommender reuse the embedding it already
+        computed for retrieval instead of encoding the query twice.
+        """
+        if query_emb is None:
+            query_emb = self.model.encode(text)
+        query_emb = self._normalize(np.asarray(query_emb, dtype="float32"))[0]
 
         scores = {}
         for mood, emb in self.mood_embeddings.items():
-            scores[mood] = util.cos_sim(query_emb, emb).mean().item()
+            scores[mood] = float((emb @ query_emb).mean())
 
         best_mood = max(scores, key=scores.get)
 
@@ -99,14 +137,14 @@ class MoodModel:
     # -------------------------------------------------
     # Public API
     # -------------------------------------------------
-    def get_mood(self, text):
+    def get_mood(self, text, query_emb=None):
         """
         Returns:
         mood: str
         mood_score: float (0–1)
         intents: dict
         """
-        mood, mood_score = self.detect_mood(text)
+        mood, mood_score = self.detect_mood(text, query_emb)
         intents = self.extract_intents(text)
 
         return mood, mood_score, intents
@@ -1,12 +1,54 @@
+"""
+preprocess.py
+Cleaned dataset -> preprocessed dataset (embedding text, *_norm columns)
+and city_stats.csv.
+
+City and global statistics are kept as mergeable running aggregates
+(count, sum and sum of squares of each numeric column per city) in
+city_stats_running.csv, next to city_stats.csv. A daily delta of menu
+rows then only updates them:
+
+    python src/preprocess.py                                  # full rebuild
+    python src/preprocess.py --add new_rows.csv --remove gone_rows.csv
+
+Added rows are normalized with the mean/std the existing *_norm columns
+were computed with (norm_stats.json). All *_norm columns are recomputed
+only once the global mean or std has drifted more than
+NORM_DRIFT_THRESHOLD from those. An add-only update without that drift
+appends to the preprocessed CSV instead of rewriting it, so its cost
+follows the delta size. Removals rewrite the file; removed rows are
+matched on item_id (item_ids.py), computed from the key columns when the
+removal file has none.
+"""
+
+import os
+import json
+import argparse
 import pandas as pd
 import numpy as np
-import os
+from item_ids import assign_ids, item_ids
 
 # ---------------- PATHS ---------------- #
 
 CLEANED_DATA_PATH = "D:/Deltaforge/smartdine/data/processed/smartdine_cleaned.csv"
 CITY_STATS_OUTPUT = "D:/Deltaforge/smartdine/data/processed/city_stats.csv"
 PROCESSED_OUTPUT = "D:/Deltaforge/smartdine/data/processed/smartdine_preprocessed.csv"
+CITY_AGGREGATES_OUTPUT = "D:/Deltaforge/smartdine/data/processed/city_stats_running.csv"
+NORM_STATS_OUTPUT = "D:/Deltaforge/smartdine/data/processed/norm_stats.json"
+
+# ---------------- CONFIG ---------------- #
+
+# Normalized for hybrid ranking (<col>_norm) and aggregated per city
+NUMERIC_COLS = [
+    "Prices",
+    "Average_Rating",
+    "Restaurant_Popularity",
+    "Votes"
+]
+
+# Recompute every *_norm column once a global mean moves this many
+# (stored) standard deviations, or a std changes by this fraction
+NORM_DRIFT_THRESHOLD = 0.05
 
 # ---------------- HELPERS ---------------- #
 
@@ -37,10 +79,17 @@ def build_embedding_text(row):
 
 # ---------------- LOAD DATA ---------------- #
 
-def load_clean_data(path=CLEANED_DATA_PATH):
+def load_clean_data(path=None):
+    path = path or CLEANED_DATA_PATH
     print(f"[INFO] Loading cleaned dataset from: {path}")
     df = pd.read_csv(path)
+    validate_columns(df)
+
+    print(f"[INFO] Loaded dataset with {df.shape[0]} rows.")
+    return df
 
+
+def validate_columns(df):
     required_cols = [
         "Restaurant_Name", "Item_Name", "Cuisine", "City",
         "Prices", "Average_Rating", "Votes",
@@ -52,51 +101,160 @@ def load_clean_data(path=CLEANED_DATA_PATH):
     if missing:
         raise ValueError(f"ERROR: Missing required columns: {missing}")
 
-    print(f"[INFO] Loaded dataset with {df.shape[0]} rows.")
+
+def prepare_rows(df):
+    """
+    Cleaned rows -> lowercase `city`, embedding text and item/cuisine ids
+    (rows without a city dropped). Ids from clean_dataset.py are kept.
+    """
+    df = df.copy()
+    df["city"] = df["City"].apply(normalize_city)
+    df = df.dropna(subset=["city"])
+    assign_ids(df)
+    df["embedding_text"] = df.apply(build_embedding_text, axis=1)
     return df
 
+# ---------------- RUNNING AGGREGATES ---------------- #
+
+def city_aggregates(df):
+    """
+    Per city: count, sum and sum of squares of each NUMERIC_COLS column
+    (non-null values) plus restaurant_count. Aggregates of disjoint row
+    sets add up, and removing rows subtracts theirs.
+    """
+    values = df[NUMERIC_COLS].apply(pd.to_numeric, errors="coerce")
+    by_city = df["city"]
+
+    aggs = pd.concat([
+        values.groupby(by_city).count().add_suffix("_count"),
+        values.groupby(by_city).sum().add_suffix("_sum"),
+        (values ** 2).groupby(by_city).sum().add_suffix("_sumsq"),
+        df["Restaurant_Name"].groupby(by_city).count().rename("restaurant_count")
+    ], axis=1)
+
+    aggs.index.name = "city"
+    return aggs.astype("float64")
+
+
+def merge_aggregates(base, delta, sign=1):
+    """base + delta (sign=1) or base - delta (sign=-1); emptied cities are dropped."""
+    merged = base.add(sign * delta, fill_value=0.0)
+    count_cols = [c for c in merged.columns if c.endswith("_count")]
+    return merged[merged[count_cols].round(6).gt(0).any(axis=1)]
+
+
+def _mean_std(count, total, sumsq):
+    """Mean and sample std (ddof=1, as pandas) from running sums."""
+    if count <= 0:
+        return 0.0, 0.0
+    mean = total / count
+    if count < 2:
+        return mean, 0.0
+    var = (sumsq - total * mean) / (count - 1)
+    # Cancellation leaves tiny residue where the column is constant
+    if var <= 1e-12 * max(1.0, mean * mean):
+        return mean, 0.0
+    return mean, float(np.sqrt(var))
+
+
+def global_stats(aggs):
+    """{column: (mean, std)} over every city."""
+    totals = aggs.sum()
+    return {
+        col: _mean_std(totals[f"{col}_count"], totals[f"{col}_sum"], totals[f"{col}_sumsq"])
+        for col in NUMERIC_COLS
+    }
+
+
+def save_aggregates(aggs, path=None):
+    path = path or CITY_AGGREGATES_OUTPUT
+    aggs.reset_index().to_csv(path, index=False)
+
+
+def load_aggregates(path=None):
+    path = path or CITY_AGGREGATES_OUTPUT
+    return pd.read_csv(path).set_index("city").astype("float64")
+
 # ---------------- CITY STATS ---------------- #
 
-def compute_city_statistics(df):
-    print("[INFO] Computing city-level statistics...")
+def city_stats_from_aggregates(aggs):
+    """city_stats.csv rows (per-city means and row count) from running aggregates."""
+    def mean(col):
+        return aggs[f"{col}_sum"] / aggs[f"{col}_count"].where(aggs[f"{col}_count"] > 0)
+
+    city_stats = pd.DataFrame({
+        "avg_price_city": mean("Prices"),
+        "avg_rating_city": mean("Average_Rating"),
+        "avg_popularity_city": mean("Restaurant_Popularity"),
+        "avg_votes_city": mean("Votes"),
+        "restaurant_count": aggs["restaurant_count"].round().astype("int64")
+    })
+
+    return city_stats.sort_index().reset_index()
 
-    city_stats = (
-        df.groupby("city")
-        .agg(
-            avg_price_city=("Prices", "mean"),
-            avg_rating_city=("Average_Rating", "mean"),
-            avg_popularity_city=("Restaurant_Popularity", "mean"),
-            avg_votes_city=("Votes", "mean"),
-            restaurant_count=("Restaurant_Name", "count")
-        )
-        .reset_index()
-    )
 
-    return city_stats
+def compute_city_statistics(df):
+    print("[INFO] Computing city-level statistics...")
+    return city_stats_from_aggregates(city_aggregates(df))
 
 # ---------------- NORMALIZATION ---------------- #
 
-def normalize_numeric_columns(df, columns):
+def normalize_numeric_columns(df, columns, stats=None):
+    """
+    <col>_norm = (col - mean) / std. `stats` ({col: (mean, std)}) defaults
+    to the columns' own mean and std.
+    """
     print("[INFO] Normalizing numeric columns...")
 
     for col in columns:
         if col in df.columns:
-            std = df[col].std()
-            mean = df[col].mean()
+            if stats is not None:
+                mean, std = stats[col]
+            else:
+                std = df[col].std()
+                mean = df[col].mean()
             df[col + "_norm"] = 0.0 if std == 0 else (df[col] - mean) / (std + 1e-8)
 
     return df
 
+
+def norm_drift(current, used):
+    """Largest change of any column's mean (in used stds) or std (relative)."""
+    drift = 0.0
+    for col, (mean, std) in current.items():
+        used_mean, used_std = used[col]
+        scale = used_std if used_std > 0 else max(std, 1e-8)
+        drift = max(drift, abs(mean - used_mean) / scale, abs(std - used_std) / scale)
+    return drift
+
+
+def save_norm_stats(stats, path=None):
+    path = path or NORM_STATS_OUTPUT
+    with open(path, "w") as f:
+        json.dump({col: {"mean": mean, "std": std} for col, (mean, std) in stats.items()}, f, indent=2)
+
+
+def load_norm_stats(path=None):
+    path = path or NORM_STATS_OUTPUT
+    with open(path) as f:
+        return {col: (v["mean"], v["std"]) for col, v in json.load(f).items()}
+
 # ---------------- SAVE ---------------- #
 
-def save_outputs(df, city_stats):
+def save_outputs(df, city_stats, aggs=None, norm_stats=None):
     os.makedirs(os.path.dirname(PROCESSED_OUTPUT), exist_ok=True)
 
     city_stats.to_csv(CITY_STATS_OUTPUT, index=False)
     print(f"[INFO] City statistics saved → {CITY_STATS_OUTPUT}")
 
-    df.to_csv(PROCESSED_OUTPUT, index=False)
-    print(f"[INFO] Preprocessed dataset saved → {PROCESSED_OUTPUT}")
+    if aggs is not None:
+        save_aggregates(aggs)
+    if norm_stats is not None:
+        save_norm_stats(norm_stats)
+
+    if df is not None:
+        df.to_csv(PROCESSED_OUTPUT, index=False)
+        print(f"[INFO] Preprocessed dataset saved → {PROCESSED_OUTPUT}")
 
 # ---------------- MAIN ---------------- #
 
@@ -105,33 +263,118 @@ def preprocess():
 
     df = load_clean_data()
 
-    # Normalize city
-    df["city"] = df["City"].apply(normalize_city)
-    df = df.dropna(subset=["city"])
+    # Normalize city and build conversational embedding text
+    print("[INFO] Building conversational embedding text...")
+    df = prepare_rows(df)
 
     print(f"[INFO] Unique cities: {df['city'].nunique()}")
 
-    # Build conversational embedding text
-    print("[INFO] Building conversational embedding text...")
-    df["embedding_text"] = df.apply(build_embedding_text, axis=1)
-
-    # City statistics
-    city_stats = compute_city_statistics(df)
+    # City statistics, kept as running aggregates for incremental updates
+    print("[INFO] Computing city-level statistics...")
+    aggs = city_aggregates(df)
+    city_stats = city_stats_from_aggregates(aggs)
 
     # Normalize numeric columns (for hybrid ranking later)
-    numeric_cols = [
-        "Prices",
-        "Average_Rating",
-        "Restaurant_Popularity",
-        "Votes"
-    ]
-    df = normalize_numeric_columns(df, numeric_cols)
+    stats = global_stats(aggs)
+    df = normalize_numeric_columns(df, NUMERIC_COLS, stats)
 
-    save_outputs(df, city_stats)
+    save_outputs(df, city_stats, aggs, stats)
 
     print("\n✅ Preprocessing completed successfully!\n")
 
+# ---------------- INCREMENTAL UPDATE ---------------- #
+
+def update_preprocessed(added=None, removed=None, threshold=NORM_DRIFT_THRESHOLD):
+    """
+    Apply a delta of cleaned rows to the preprocessed dataset and its
+    statistics. `added` holds new rows, `removed` rows to drop (matched
+    on item_id); either may be None. Falls back to a full preprocess()
+    when the running aggregates do not exist yet.
+
+    Returns a summary: rows added/removed, drift, and whether the *_norm
+    columns were recomputed.
+    """
+    if not (os.path.exists(CITY_AGGREGATES_OUTPUT) and os.path.exists(NORM_STATS_OUTPUT)
+            and os.path.exists(PROCESSED_OUTPUT)):
+        print("[WARN] No running aggregates yet; running a full preprocess")
+        preprocess()
+        return {"full_rebuild": True}
+
+    aggs = load_aggregates()
+    used = load_norm_stats()
+    df = None
+    n_removed = 0
+
+    if removed is not None and len(removed):
+        # Subtract the rows as stored, not as given, so the sums stay exact
+        df = assign_ids(pd.read_csv(PROCESSED_OUTPUT))
+        ids = removed["item_id"] if "item_id" in removed.columns else item_ids(removed)
+        gone = df["item_id"].isin(ids).to_numpy()
+        n_removed = int(gone.sum())
+        if n_removed:
+            aggs = merge_aggregates(aggs, city_aggregates(df[gone]), sign=-1)
+            df = df[~gone]
+        else:
+            df = None
+
+    new_rows = None
+    if added is not None and len(added):
+        validate_columns(added)
+        new_rows = prepare_rows(added)
+        aggs = merge_aggregates(aggs, city_aggregates(new_rows))
+
+    stats = global_stats(aggs)
+    drift = norm_drift(stats, used)
+    renormalize = bool(drift > threshold)
+
+    if renormalize:
+        print(f"[INFO] Normalization drift {drift:.3f} > {threshold}; recomputing *_norm columns")
+        if df is None:
+            df = pd.read_csv(PROCESSED_OUTPUT)
+        if new_rows is not None:
+            df = pd.concat([df, new_rows], ignore_index=True)
+        df = normalize_numeric_columns(df, NUMERIC_COLS, stats)
+        used = stats
+    elif new_rows is not None:
+        new_rows = normalize_numeric_columns(new_rows, NUMERIC_COLS, used)
+        if df is not None:
+            df = pd.concat([df, new_rows], ignore_index=True)
+
+    save_outputs(df, city_stats_from_aggregates(aggs), aggs, used)
+
+    if df is None and new_rows is not None:
+        # Add-only, same normalization: append instead of rewriting
+        header = pd.read_csv(PROCESSED_OUTPUT, nrows=0).columns
+        new_rows.reindex(columns=header).to_csv(PROCESSED_OUTPUT, mode="a", header=False, index=False)
+        print(f"[INFO] Appended {len(new_rows)} rows → {PROCESSED_OUTPUT}")
+
+    summary = {
+        "added": 0 if new_rows is None else len(new_rows),
+        "removed": n_removed,
+        "drift": round(float(drift), 4),
+        "renormalized": renormalize
+    }
+    print(f"[INFO] Incremental update: {json.dumps(summary)}")
+    return summary
+
 # ---------------- ENTRY ---------------- #
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SmartDine preprocessing (full or incremental)")
+    parser.add_argument("--add", help="CSV of new cleaned rows to apply incrementally")
+    parser.add_argument("--remove", help="CSV of rows to drop (item_id, or restaurant, item, place and city)")
+    parser.add_argument("--drift-threshold", type=float, default=NORM_DRIFT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.add or args.remove:
+        update_preprocessed(
+            added=pd.read_csv(args.add) if args.add else None,
+            removed=pd.read_csv(args.remove) if args.remove else None,
+            threshold=args.drift_threshold
+        )
+    else:
+        preprocess()
+
+
 if __name__ == "__main__":
-    preprocess()
+    main()
@@ -0,0 +1,330 @@
+"""
+profiling.py
+Opt-in per-request profiling for diagnosing slow requests in production.
+
+A request is profiled when it is sampled (PROFILE_SAMPLE_RATE) or sends
+`X-SmartDine-Profile: 1` (or `sampling` / `cprofile` to pick the mode):
+
+    with profiler.profile(mode, meta={...}) as prof:
+        response = recommender.recommend(...)
+    prof.id   # returned to the client in X-SmartDine-Profile-Id
+
+- sampling: one shared daemon thread snapshots the stacks of the threads
+  being profiled every PROFILE_INTERVAL_MS, cut at the `with` frame.
+  Output is collapsed stacks ("a;b;c <samples>"), which flamegraph.pl,
+  speedscope and inferno read as-is.
+- cprofile: deterministic cProfile of the request thread, saved as a
+  .prof file (pstats, snakeviz). Only one can run at a time, so a
+  request that finds it busy is sampled instead.
+
+Work handed to other threads (weather lookups, per-item explanations in
+per_item mode) is not captured. Profiles go to PROFILE_DIR as
+<id>.json plus <id>.collapsed or <id>.prof. The newest PROFILE_KEEP are
+kept, and at most PROFILE_MAX_ACTIVE run at once (others are skipped).
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import uuid
+import random
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import (
+    PROFILE_SAMPLE_RATE,
+    PROFILE_MODE,
+    PROFILE_INTERVAL_MS,
+    PROFILE_DIR,
+    PROFILE_KEEP,
+    PROFILE_MAX_ACTIVE
+)
+from metrics import counter, METRICS_ENABLED
+
+PROFILES = counter(
+    "smartdine_profiles_total",
+    "Profiled requests by mode (sampling/cprofile) and trigger (sampled/header/skipped).",
+    ["mode", "trigger"]
+)
+
+MODES = ("sampling", "cprofile")
+TOP_N = 20
+
+
+def _frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+# ---------------- PROFILES ---------------- #
+
+class Profile:
+    """One profiled request."""
+
+    def __init__(self, mode, meta=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.mode = mode
+        self.meta = dict(meta or {})
+        self.thread_id = threading.get_ident()
+        self.anchor = None          # sampling: the frame stacks are cut at
+        self.stacks = {}            # sampling: collapsed stack -> samples
+        self.samples = 0
+        self.cprofile = None
+        self.started = time.perf_counter()
+        self.duration_ms = None
+
+    def add_sample(self, frame):
+        names = []
+        while frame is not None:
+            names.append(_frame_name(frame.f_code))
+            if frame is self.anchor:
+                break
+            frame = frame.f_back
+        if not names:
+            return
+        stack = ";".join(reversed(names))
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+    def top_stacks(self, n=TOP_N):
+        return _top_stacks(self.stacks, n)
+
+    def summary(self, n=TOP_N):
+        entry = {
+            "id": self.id,
+            "mode": self.mode,
+            "created_at": self.meta.get("created_at"),
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            **{k: v for k, v in self.meta.items() if k != "created_at"}
+        }
+        if self.mode == "sampling":
+            entry["samples"] = self.samples
+            entry["interval_ms"] = PROFILE_INTERVAL_MS
+            entry["top_stacks"] = self.top_stacks(n)
+            entry["top_functions"] = _top_functions(self.stacks, n)
+        elif self.cprofile is not None:
+            out = io.StringIO()
+            pstats.Stats(self.cprofile, stream=out).sort_stats("cumulative").print_stats(n)
+            entry["top_functions_text"] = out.getvalue()
+        return entry
+
+
+def _top_stacks(stacks, n):
+    ranked = sorted(stacks.items(), key=lambda kv: -kv[1])[:n]
+    return [
+        {"stack": stack, "samples": count, "ms": round(count * PROFILE_INTERVAL_MS, 1)}
+        for stack, count in ranked
+    ]
+
+
+def _top_functions(stacks, n):
+    """Inclusive (on stack) and self (leaf) samples per function."""
+    inclusive, own = {}, {}
+    for stack, count in stacks.items():
+        names = stack.split(";")
+        for name in set(names):
+            inclusive[name] = inclusive.get(name, 0) + count
+        own[names[-1]] = own.get(names[-1], 0) + count
+
+    ranked = sorted(inclusive, key=lambda k: (-own.get(k, 0), -inclusive[k]))[:n]
+    return [
+        {
+            "function": name,
+            "self_ms": round(own.get(name, 0) * PROFILE_INTERVAL_MS, 1),
+            "total_ms": round(inclusive[name] * PROFILE_INTERVAL_MS, 1)
+        }
+        for name in ranked
+    ]
+
+
+# ---------------- PROFILER ---------------- #
+
+class RequestProfiler:
+
+    def __init__(self, sample_rate=PROFILE_SAMPLE_RATE, mode=PROFILE_MODE, interval_ms=PROFILE_INTERVAL_MS,
+                 directory=PROFILE_DIR, keep=PROFILE_KEEP, max_active=PROFILE_MAX_ACTIVE):
+        self.sample_rate = sample_rate
+        self.mode = mode if mode in MODES else "sampling"
+        self.interval = interval_ms / 1000
+        self.directory = directory
+        self.keep = keep
+        self.max_active = max_active
+
+        self._active = {}   # thread id -> sampling Profile
+        self._n_active = 0
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()
+        self._sampler = None
+
+    def wanted(self, header=None):
+        """Mode to profile this request in, or None. `header` is X-SmartDine-Profile."""
+        if header:
+            header = header.strip().lower()
+            if header in MODES:
+                return header
+            if header in ("1", "true"):
+                return self.mode
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.mode
+        return None
+
+    @contextmanager
+    def profile(self, mode, meta=None, trigger="header"):
+        """Profile the body of the `with` block; yields the Profile, or None if skipped."""
+        with self._lock:
+            if self._n_active >= self.max_active:
+                mode = None
+            else:
+                self._n_active += 1
+
+        if mode is None:
+            self._record("none", "skipped")
+            yield None
+            return
+
+        if mode == "cprofile" and not self._cprofile_lock.acquire(blocking=False):
+            mode = "sampling"
+
+        prof = Profile(mode, {"created_at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), **(meta or {})})
+        try:
+            if mode == "cprofile":
+                prof.cprofile = cProfile.Profile()
+                prof.cprofile.enable()
+            else:
+                # Frame running the `with` statement (past contextlib's __enter__)
+                prof.anchor = sys._getframe(2)
+                self._start_sampling(prof)
+
+            yield prof
+
+        finally:
+            prof.duration_ms = (time.perf_counter() - prof.started) * 1000
+            if mode == "cprofile":
+                prof.cprofile.disable()
+                self._cprofile_lock.release()
+            else:
+                with self._lock:
+                    self._active.pop(prof.thread_id, None)
+            with self._lock:
+                self._n_active -= 1
+
+            self._record(mode, trigger)
+            self.save(prof)
+
+    def _start_sampling(self, prof):
+        with self._lock:
+            self._active[prof.thread_id] = prof
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+                self._sampler.start()
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                active = list(self._active.items())
+
+            frames = sys._current_frames()
+            for thread_id, prof in active:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    prof.add_sample(frame)
+
+    @staticmethod
+    def _record(mode, trigger):
+        if METRICS_ENABLED:
+            PROFILES.inc(mode=mode, trigger=trigger)
+
+    # ---------------- STORAGE ---------------- #
+
+    def save(self, prof):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, prof.id)
+
+        if prof.mode == "sampling":
+            with open(base + ".collapsed", "w", encoding="utf-8") as f:
+                for stack, count in sorted(prof.stacks.items()):
+                    f.write(f"{stack} {count}\n")
+        else:
+            prof.cprofile.dump_stats(base + ".prof")
+
+        summary = prof.summary()
+        summary["stacks"] = prof.stacks if prof.mode == "sampling" else None
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, default=str)
+
+        self._prune()
+
+    def _prune(self):
+        metas = self._meta_files()
+        for name in metas[self.keep:]:
+            stem = name[:-len(".json")]
+            for ext in (".json", ".collapsed", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, stem + ext))
+                except FileNotFoundError:
+                    pass
+
+    def _meta_files(self):
+        """Profile metadata files, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [n for n in os.listdir(self.directory) if n.endswith(".json")]
+        return sorted(names, key=lambda n: os.path.getmtime(os.path.join(self.directory, n)), reverse=True)
+
+    def load(self, profile_id):
+        """Stored summary of one profile, or None."""
+        if not profile_id.isalnum():
+            return None
+        path = os.path.join(self.directory, profile_id + ".json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def artifact(self, profile_id):
+        """Path of the collapsed-stacks or .prof file, or None."""
+        if not profile_id.isalnum():
+            return None
+        for ext in (".collapsed", ".prof"):
+            path = os.path.join(self.directory, profile_id + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def list(self, limit=50):
+        out = []
+        for name in self._meta_files()[:limit]:
+            entry = self.load(name[:-len(".json")])
+            if entry:
+                out.append({k: entry.get(k) for k in ("id", "mode", "created_at", "duration_ms", "route", "city", "query", "samples")})
+        return out
+
+    def summary(self, n=TOP_N, limit=None):
+        """Top stacks and functions across the stored sampling profiles."""
+        stacks, profiles = {}, 0
+        for name in self._meta_files()[:limit]:
+            entry = self.load(name[:-len(".json")])
+            if not entry or not entry.get("stacks"):
+                continue
+            profiles += 1
+            for stack, count in entry["stacks"].items():
+                stacks[stack] = stacks.get(stack, 0) + count
+
+        return {
+            "profiles": profiles,
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "top_stacks": _top_stacks(stacks, n),
+            "top_functions": _top_functions(stacks, n)
+        }
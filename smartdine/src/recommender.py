@@ -1,8 +1,10 @@
 import os
 import sys
 import random
+import logging
+import threading
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
 
 
@@ -11,96 +13,240 @@ load_dotenv()
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SRC_DIR = os.path.join(ROOT_DIR, "src")
 sys.path.append(SRC_DIR)
+sys.path.append(ROOT_DIR)
 
 
 
+from config import (
+    DEGRADE_LLM_MS,
+    DEGRADE_WEATHER_MS,
+    DEGRADE_TOP_K_MS,
+    DEGRADED_TOP_K,
+    EXPLAIN_MODE,
+    MMR_POOL
+)
+from encoder import get_encoder
 from mood_model import MoodModel
-from faiss_index import search_city
+from faiss_index import clear_index_cache, item_vectors, IndexNotFoundError, FAISS_DIR
+from diversity import mmr_select
+from retrieval import get_retriever, merge_topk, nearby_cities
+from intent_lists import base_feature_score, list_for_intents
+from snapshots import DataSnapshot, SnapshotManager, load_snapshot, read_current
 from utils import load_csv
-from weather import get_weather
-from llm_explainer import LLMExplainer
+from weather import get_weather, unknown_weather
+from llm_explainer import LLMExplainer, template_explanation
 from memory import SessionMemory   
+from metrics import span, counter, METRICS_ENABLED
+
+logger = logging.getLogger("smartdine")
 
 DATA_PATH = "D:/Deltaforge/smartdine/data/processed/smartdine_preprocessed.csv"
-SENTENCE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
 FAISS_TOP_K = 40
 RETURN_K = 3
 MIN_RATING = 4.0
+MIN_CITY_CANDIDATES = 10   # below this, neighbouring cities are searched too
+LEXICAL_WEIGHT = 0.15      # exact dish/cuisine token matches (BM25, hybrid search)
+MOOD_WEIGHT = 0.1          # item's precomputed affinity to the detected mood
+
+FAST_PATH = counter(
+    "smartdine_fast_path_total",
+    "Queries by keyword fast path outcome (hit/fallback/skipped).",
+    ["result"]
+)
+
+DEGRADED = counter(
+    "smartdine_degraded_total",
+    "Requests that skipped a pipeline step to meet their deadline (llm/weather/top_k).",
+    ["stage"]
+)
+
+CITY_FALLBACK = counter(
+    "smartdine_city_fallback_total",
+    "Requests served via city name resolution or fallback answers (resolved/unknown_city/popular).",
+    ["reason"]
+)
 
 
 class SmartDineRecommender:
 
-    def __init__(self):
+    def __init__(
+        self,
+        df=None,
+        model=None,
+        mood_model=None,
+        explainer=None,
+        weather_fn=None,
+        faiss_dir=FAISS_DIR,
+        retriever=None
+    ):
+        """
+        Every dependency defaults to the production one; the benchmark
+        injects a synthetic catalog and local fakes for the externals.
+
+        Data comes from the CURRENT snapshot when one is published
+        (src/snapshots.py), else from DATA_PATH and `faiss_dir`.
+        """
         print("[SmartDine] Initializing recommender...")
-        self.df = load_csv(DATA_PATH)
-        self.model = SentenceTransformer(SENTENCE_MODEL)
-        self.mood_model = MoodModel()
-        self.explainer = LLMExplainer()
+        if df is not None:
+            snapshot = DataSnapshot("inline", df, faiss_dir)
+        elif faiss_dir == FAISS_DIR and read_current():
+            snapshot = load_snapshot()
+        else:
+            snapshot = DataSnapshot("legacy", load_csv(DATA_PATH), faiss_dir)
+        self.snapshots = SnapshotManager(snapshot)
+
+        # One encoder (backend per config.ENCODER_BACKEND) shared with MoodModel
+        self.model = model if model is not None else get_encoder()
+        self.mood_model = mood_model if mood_model is not None else MoodModel(model=self.model)
+        self.explainer = explainer if explainer is not None else LLMExplainer()
+        self.get_weather = weather_fn if weather_fn is not None else get_weather
+        # Local indexes or the sharded retrieval tier (config.RETRIEVAL_MODE)
+        self.retriever = retriever if retriever is not None else get_retriever()
         self.memory = SessionMemory()   
-        print("[SmartDine] Ready.")
+        # Weather lookups run here when a deadline bounds the wait
+        self._weather_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="weather")
+        self._degrade_lock = threading.Lock()
+        print(f"[SmartDine] Ready (data version {snapshot.version}).")
+
+    # Live data; each request reads it once through snapshots.lease()
+    @property
+    def df(self):
+        return self.snapshots.current.df
+
+    @property
+    def faiss_dir(self):
+        return self.snapshots.current.faiss_dir
+
+    @property
+    def city_catalog(self):
+        return self.snapshots.current.city_catalog
+
+    def reload_indexes(self):
+        """Indexes were rebuilt in place: drop them from cache and rebuild the catalog."""
+        live = self.snapshots.current
+        clear_index_cache(live.faiss_dir)
+        self.snapshots.swap(DataSnapshot(live.version, live.df, live.faiss_dir, live.manifest))
+        print(f"[SmartDine] Indexes reloaded ({len(self.city_catalog.payload['cities'])} cities).")
 
     
     def encode_query(self, query: str) -> np.ndarray:
-        return self.model.encode([query], convert_to_numpy=True).astype("float32")
+        return np.asarray(self.model.encode([query]), dtype="float32")
 
    
-    def surprise_recommend(self, city: str, session_id: str):
-        city_df = self.df[self.df["City"].str.lower() == city]
-
-        if city_df.empty:
-            return None
-
-        weather = get_weather(city)
+    def surprise_pick(self, snapshot, city: str, weather: dict):
+        """
+        Weather-flavoured random pick for Surprise Me.
+        Returns (item, use_weather) or (None, False) for an unknown city.
+        """
         category = weather.get("category")
 
+        # Cuisine-tag pools are precomputed per snapshot (lexical_index.CUISINE_TAGS)
         if category in ["cold", "rainy"]:
-            pool = city_df[city_df["Cuisine"].str.contains("spicy|tandoor|grill|soup", case=False, na=False)]
+            tag = "warming"
         elif category == "hot":
-            pool = city_df[city_df["Cuisine"].str.contains("salad|juice|light|cool", case=False, na=False)]
+            tag = "cooling"
         else:
-            pool = city_df
+            tag = None
 
-        if pool.empty:
-            pool = city_df
+        item = snapshot.sample_item(city, tag)
+        if item is None:
+            return None, False
 
-        item = pool.sample(1).iloc[0].to_dict()
+        return item, random.random() < 0.6
 
-        use_weather = random.random() < 0.6
 
-        item["explanation"] = self.explainer.explain(
-            item=item,
-            city=city.title(),
-            mood="surprise",
-            weather=weather if use_weather else None,
-            surprise=True
-        )
+    def surprise_recommend(self, city: str, session_id: str):
+        with span("weather"):
+            weather = self.get_weather(city)
+
+        with self.snapshots.lease() as snapshot:
+            item, use_weather = self.surprise_pick(snapshot, city, weather)
+        if item is None:
+            return None
+
+        with span("explain"):
+            item["explanation"] = self.explainer.explain(
+                item=item,
+                city=city.title(),
+                mood="surprise",
+                weather=weather if use_weather else None,
+                surprise=True
+            )
 
         return item
 
 
-    def feature_score(self, item, intents, weather, memory):
-        score = 0.0
+    def degrade(self, plan, stage):
+        """Record that `plan` skipped `stage` to stay within its deadline."""
+        with self._degrade_lock:
+            if stage in plan["degraded"]:
+                return
+            plan["degraded"].append(stage)
+        if METRICS_ENABLED:
+            DEGRADED.inc(stage=stage)
+
+
+    def fetch_weather(self, plan, city, deadline=None):
+        """
+        Weather for `city`. With a deadline: skipped below
+        DEGRADE_WEATHER_MS, otherwise waited on only until the budget
+        reaches that mark (the lookup then finishes in the background and
+        still fills the weather cache).
+        """
+        if deadline is None:
+            with span("weather"):
+                return self.get_weather(city)
+
+        wait_ms = deadline.remaining_ms() - DEGRADE_WEATHER_MS
+        if wait_ms > 0:
+            future = self._weather_pool.submit(self.get_weather, city)
+            try:
+                with span("weather"):
+                    return future.result(timeout=wait_ms / 1000)
+            except FutureTimeout:
+                pass
+
+        self.degrade(plan, "weather")
+        return unknown_weather(city)
+
 
-        score += 0.4 * (item.get("Average_Rating", 0) / 5)
-        score += 0.2 * min(item.get("Restaurant_Popularity", 0) / 1000, 1)
+    @staticmethod
+    def retrieval_filters(intents):
+        """Attribute filters pushed into FAISS (see CityIndex.filter_bitmap)."""
+        filters = {"min_rating": MIN_RATING}
 
-        if item.get("Is_Bestseller") == 1:
-            score += 0.2
+        if intents.get("cheap") and not intents.get("expensive"):
+            filters["expensive"] = False
+        elif intents.get("expensive") and not intents.get("cheap"):
+            filters["expensive"] = True
 
-        cuisine = str(item.get("Cuisine", "")).lower()
+        return filters
 
-        if intents.get("cheesy") and any(k in cuisine for k in ["pizza", "italian", "cheese"]):
+
+    def feature_score(self, item, intents, weather, memory):
+        # Rating, popularity and bestseller; the same formula orders the
+        # ranked intent lists used by the keyword fast path
+        score = float(base_feature_score(
+            item.get("Average_Rating", 0),
+            item.get("Restaurant_Popularity", 0),
+            item.get("Is_Bestseller")
+        ))
+
+        # Cuisine keyword tags computed once per row at index load
+        tags = item.get("tags", ())
+
+        if intents.get("cheesy") and "cheesy" in tags:
             score += 0.15
 
-        if intents.get("spicy") and any(k in cuisine for k in ["spicy", "tandoor", "chilli"]):
+        if intents.get("spicy") and "spicy" in tags:
             score += 0.15
 
         
         if memory:
-            if item.get("Cuisine") in memory.get("cuisines", []):
+            if item.get("cuisine_id") in memory.get("cuisines", []):
                 score += 0.1    
-            if item.get("Item_Name") in memory.get("items", []):
+            if item.get("item_id") in memory.get("items", []):
                 score -= 0.2    
 
         
@@ -114,76 +260,388 @@ class SmartDineRecommender:
         return score
 
 
-    def recommend(self, query: str, city: str, surprise: bool = False, session_id: str = "default"):
-        city = city.lower().strip()
-        weather = get_weather(city)
+    def retrieve(self, snapshot, q_emb, city, filters, nearby=False, query_text=None, top_k=FAISS_TOP_K):
+        """
+        Candidates for `city`, topped up from its neighbours (one parallel
+        multi-index search) when the city alone has fewer than
+        MIN_CITY_CANDIDATES, has no index, or `nearby` is requested.
+        Every candidate from the city itself is kept.
+        """
+        neighbours = nearby_cities(city)
+
+        try:
+            candidates = self.retriever.search(q_emb, city, top_k, filters, snapshot.faiss_dir, query_text)
+        except IndexNotFoundError:
+            if not neighbours:
+                raise
+            candidates = []
+
+        if neighbours and (nearby or len(candidates) < MIN_CITY_CANDIDATES):
+            extra = self.retriever.search_many(q_emb, neighbours, top_k, filters, snapshot.faiss_dir, query_text)
+            candidates = merge_topk([candidates, extra], len(candidates) + top_k)
+
+        return candidates
+
+
+    def retrieve_ranked(self, snapshot, query, city, nearby=False):
+        """
+        Fast path for keyword-only queries ("cheap", "spicy", "dessert"):
+        mood from precomputed keyword embeddings and candidates from the
+        city's ranked intent list (intent_lists.py), with no encode and
+        no FAISS search.
+
+        Returns (mood, mood_score, intents, candidates), or None to take
+        the full path: other words in the query, several tag intents,
+        nearby expansion, or fewer than MIN_CITY_CANDIDATES matches.
+        """
+        if nearby:
+            return None
+
+        with span("keyword_match"):
+            matched = self.mood_model.keyword_query(query)
+        if matched is None:
+            result = None
+        else:
+            mood, mood_score, intents = matched
+            name = list_for_intents(intents)
+            candidates = None
+            if name is not None:
+                try:
+                    candidates = self.retriever.ranked(
+                        city, name, FAISS_TOP_K, self.retrieval_filters(intents), snapshot.faiss_dir
+                    )
+                except IndexNotFoundError:
+                    candidates = None   # no index for the city; the full path decides
+            if candidates and len(candidates) >= MIN_CITY_CANDIDATES:
+                result = (mood, mood_score, intents, candidates)
+            else:
+                result = None
+
+        if METRICS_ENABLED:
+            outcome = "skipped" if matched is None else ("hit" if result else "fallback")
+            FAST_PATH.inc(result=outcome)
+
+        return result
+
+
+    def prepare(self, query: str, city: str, surprise: bool = False, session_id: str = "default", nearby: bool = False, deadline=None):
+        """
+        Everything up to the LLM explanations: weather, mood, retrieval,
+        ranking and selection. Returns a plan consumed by recommend()
+        and recommend_stream().
+
+        Holds a lease on the live snapshot, so a hot reload during the
+        request does not release the data it is reading.
+
+        `deadline` (admission.Deadline) makes the pipeline degrade as the
+        budget runs low: template explanations, no weather, then a
+        smaller retrieval depth. Skipped steps are listed in "degraded".
+
+        Misspelled or alternative city names are resolved to a known city
+        ("resolved_city"). When search has nothing usable, the city's
+        precomputed popular items are served ("fallback": "popular"); an
+        unresolvable city gets no results, "fallback": "unknown_city" and
+        close "suggestions" instead of an error.
+        """
+        with self.snapshots.lease() as snapshot:
+            return self._prepare(snapshot, query, city, surprise, session_id, nearby, deadline)
+
+
+    def _prepare(self, snapshot, query, city, surprise, session_id, nearby, deadline=None):
+        requested = city.lower().strip()
+        city = snapshot.city_resolver.resolve(requested)
+
+        plan = {
+            "query": query,
+            "city": city,
+            "session_id": session_id,
+            "surprise": False,
+            "mood_score": None,
+            "results": [],
+            "weather_item": None,
+            "deadline": deadline,
+            "degraded": []
+        }
+
+        if city is None:
+            self.record_fallback("unknown_city")
+            plan.update({
+                "city": requested,
+                "mood": None,
+                "weather": unknown_weather(requested),
+                "fallback": "unknown_city",
+                "suggestions": snapshot.city_resolver.suggest(requested)
+            })
+            return plan
+
+        if city != requested:
+            self.record_fallback("resolved")
+            plan["resolved_city"] = city
+
+        weather = self.fetch_weather(plan, city, deadline)
+        plan["weather"] = weather
 
         memory = self.memory.get(session_id)
 
         
         if surprise or not query.strip():
-            pick = self.surprise_recommend(city, session_id)
-            return {
+            pick, use_weather = self.surprise_pick(snapshot, city, weather)
+            plan.update({
                 "mood": "surprise",
-                "weather": weather,
-                "results": [pick] if pick else []
-            }
-
-        
-        mood, mood_score, intents = self.mood_model.get_mood(query)
-
-        
-        q_emb = self.encode_query(query)
-        candidates = search_city(q_emb, city, FAISS_TOP_K)
+                "surprise": True,
+                "results": [pick] if pick else [],
+                "weather_item": pick if use_weather else None
+            })
+            return plan
+
+        fast = self.retrieve_ranked(snapshot, query, city, nearby)
+        if fast is not None:
+            mood, mood_score, intents, candidates = fast
+        else:
+            with span("encode"):
+                q_emb = self.encode_query(query)
+
+            # Mood reuses the query embedding: one transformer pass per query
+            with span("mood"):
+                mood, mood_score, intents = self.mood_model.get_mood(query, query_emb=q_emb[0])
+
+            top_k = FAISS_TOP_K
+            if deadline is not None and deadline.remaining_ms() < DEGRADE_TOP_K_MS:
+                self.degrade(plan, "top_k")
+                top_k = DEGRADED_TOP_K
+
+            # Rating floor and price intent are applied inside the FAISS scan,
+            # so all FAISS_TOP_K candidates are usable instead of a filtered remnant.
+            filters = self.retrieval_filters(intents)
+            try:
+                # Hybrid: FAISS and BM25 over dish/cuisine tokens, rank-fused
+                candidates = self.retrieve(snapshot, q_emb, city, filters, nearby, query, top_k)
+
+                if not candidates and "expensive" in filters:
+                    # Price intent too strict for this city; keep only the rating floor
+                    candidates = self.retrieve(snapshot, q_emb, city, {"min_rating": MIN_RATING}, nearby, query, top_k)
+            except IndexNotFoundError as e:
+                # No index for the city (nor its neighbours) on this host
+                logger.warning("[SmartDine] %s; serving popular items for %s", e, city)
+                candidates = []
+
+        plan["mood"] = mood
+        plan["mood_score"] = round(float(mood_score), 2)
 
         candidates = [c for c in candidates if c.get("Average_Rating", 0) >= MIN_RATING]
 
         if not candidates:
-            return {"mood": mood, "weather": weather, "results": []}
+            return self.fallback_plan(plan, snapshot)
 
         
-        for c in candidates:
-            c["final_score"] = (
-                0.6 * c["semantic_score"]
-                + 0.4 * self.feature_score(c, intents, weather, memory)
-                + random.uniform(0.03, 0.09)
-            )
+        with span("feature_score"):
+            lex_max = max((c.get("lexical_score", 0.0) for c in candidates), default=0.0)
+            # Offline item-mood affinities (faiss_index.build_mood_affinity), 0 if absent
+            affinity = [(c.get("mood_affinity") or {}).get(mood, 0.0) for c in candidates]
+            for c, mood_fit in zip(candidates, affinity):
+                lexical = c.get("lexical_score", 0.0) / lex_max if lex_max else 0.0
+                c["final_score"] = (
+                    # Fast-path candidates have no embedding match to score
+                    0.6 * c.get("semantic_score", 0.0)
+                    + 0.4 * self.feature_score(c, intents, weather, memory)
+                    + LEXICAL_WEIGHT * lexical
+                    + MOOD_WEIGHT * mood_fit
+                    + random.uniform(0.03, 0.09)
+                )
 
         ranked = sorted(candidates, key=lambda x: x["final_score"], reverse=True)
-        top_pool = ranked[:10]
+        top_pool = ranked[:MMR_POOL]
+
+        # Varied picks (MMR over the stored index vectors, restaurant and
+        # cuisine limits) instead of a random sample of the pool
+        with span("diversify"):
+            final_items = mmr_select(
+                top_pool,
+                [c["final_score"] for c in top_pool],
+                RETURN_K,
+                item_vectors(top_pool, snapshot.faiss_dir)
+            )
 
-        weather_item = random.choice(top_pool)
-        remaining = [c for c in top_pool if c is not weather_item]
-        non_weather = random.sample(remaining, k=min(RETURN_K - 1, len(remaining)))
+        # The best pick carries the weather angle in its explanation
+        weather_item = final_items[0]
 
-        final_items = [weather_item] + non_weather
-        random.shuffle(final_items)
+        plan.update({
+            "results": final_items,
+            "weather_item": weather_item,
+            # Other cities the picks came from (nearby expansion)
+            "nearby": sorted({i.get("city") for i in final_items if i.get("city") not in (None, city)})
+        })
+        return plan
 
-        
-        for item in final_items:
-            item["explanation"] = self.explainer.explain(
+
+    def record_fallback(self, reason):
+        if METRICS_ENABLED:
+            CITY_FALLBACK.inc(reason=reason)
+
+
+    def fallback_plan(self, plan, snapshot):
+        """Serve the city's precomputed popular items (no further retrieval)."""
+        pool = snapshot.fallback_items(plan["city"])
+        if not pool:
+            return plan
+
+        self.record_fallback("popular")
+        # Pool is best first; the same restaurant / cuisine limits apply.
+        # Its rows carry item ids, so index vectors are found without row ids.
+        final_items = mmr_select(
+            pool, list(range(len(pool), 0, -1)), RETURN_K,
+            item_vectors(pool, snapshot.faiss_dir)
+        )
+        plan.update({
+            "results": final_items,
+            "weather_item": final_items[0],
+            "fallback": "popular"
+        })
+        return plan
+
+
+    def explain_item(self, plan: dict, item: dict) -> str:
+        weather = plan["weather"] if item is plan["weather_item"] else None
+
+        deadline = plan.get("deadline")
+        if deadline is not None and deadline.remaining_ms() < DEGRADE_LLM_MS:
+            # No time for an LLM call; a pre-generated explanation costs nothing
+            self.degrade(plan, "llm")
+            store = getattr(self.explainer, "store", None)
+            stored = store and store.lookup(item=item, city=plan["city"], mood=plan["mood"], weather=weather)
+            return stored or template_explanation(item=item, city=plan["city"].title(), weather=weather)
+
+        with span("explain"):
+            return self.explainer.explain(
                 item=item,
-                city=city.title(),
-                mood=mood,
-                weather=weather if item is weather_item else None,
-                surprise=False
+                city=plan["city"].title(),
+                mood=plan["mood"],
+                weather=weather,
+                surprise=plan["surprise"],
+                # The LLM call itself stops at the deadline (capped at LLM_TIMEOUT_MS)
+                timeout_ms=deadline.remaining_ms() if deadline is not None else None
             )
 
-        
+
+    def explain_items(self, plan: dict) -> list:
+        """
+        Explanations for all of plan["results"], in order. In batch mode
+        (config.EXPLAIN_MODE) one LLM call covers every item; explainers
+        without explain_batch are called per item.
+        """
+        items = plan["results"]
+        batch = getattr(self.explainer, "explain_batch", None)
+        if EXPLAIN_MODE != "batch" or batch is None or len(items) < 2:
+            return [self.explain_item(plan, item) for item in items]
+
+        deadline = plan.get("deadline")
+        if deadline is not None and deadline.remaining_ms() < DEGRADE_LLM_MS:
+            return [self.explain_item(plan, item) for item in items]
+
+        weather_index = next((i for i, item in enumerate(items) if item is plan["weather_item"]), None)
+        with span("explain"):
+            return batch(
+                items=items,
+                city=plan["city"].title(),
+                mood=plan["mood"],
+                weather=plan["weather"],
+                weather_index=weather_index,
+                surprise=plan["surprise"],
+                timeout_ms=deadline.remaining_ms() if deadline is not None else None
+            )
+
+
+    def remember(self, plan: dict):
+        if plan["surprise"] or not plan["results"]:
+            return
+
         self.memory.update(
-            session_id=session_id,
-            query=query,
-            results=final_items,
-            mood=mood,
-            city=city
+            session_id=plan["session_id"],
+            query=plan["query"],
+            results=plan["results"],
+            mood=plan["mood"],
+            city=plan["city"]
         )
 
-        return {
-            "mood": mood,
-            "mood_score": round(float(mood_score), 2),
-            "weather": weather,
-            "results": final_items
-        }
+
+    @staticmethod
+    def build_response(plan: dict) -> dict:
+        response = {"mood": plan["mood"]}
+        if plan["mood_score"] is not None:
+            response["mood_score"] = plan["mood_score"]
+        response["weather"] = plan["weather"]
+        for key in ("resolved_city", "fallback", "suggestions"):
+            if plan.get(key):
+                response[key] = plan[key]
+        if plan.get("nearby"):
+            response["nearby"] = plan["nearby"]
+        if plan.get("degraded"):
+            response["degraded"] = list(plan["degraded"])
+        response["results"] = plan["results"]
+        return response
+
+
+    def recommend(self, query: str, city: str, surprise: bool = False, session_id: str = "default", nearby: bool = False, deadline=None):
+        plan = self.prepare(query, city, surprise, session_id, nearby, deadline)
+
+        
+        for item, explanation in zip(plan["results"], self.explain_items(plan)):
+            item["explanation"] = explanation
+
+        
+        self.remember(plan)
+
+        return self.build_response(plan)
+
+
+    def recommend_stream(self, query: str, city: str, surprise: bool = False, session_id: str = "default", nearby: bool = False, deadline=None):
+        """
+        Same pipeline as recommend(), as events so ranked items reach the
+        client before the LLM finishes:
+
+            {"event": "meta", "mood", "mood_score", "weather"}
+            {"event": "results", "results": [...]}          # no explanations yet
+            {"event": "explanation", "index", "explanation"}  # completion order
+            {"event": "done", "degraded"?}
+
+        In batch mode the explanation events all follow the one LLM call.
+        """
+        plan = self.prepare(query, city, surprise, session_id, nearby, deadline)
+        items = plan["results"]
+
+        meta = self.build_response({**plan, "results": []})
+        meta.pop("results")
+        yield {"event": "meta", **meta}
+
+        yield {"event": "results", "results": [dict(item) for item in items]}
+
+        if items and EXPLAIN_MODE == "batch" and hasattr(self.explainer, "explain_batch"):
+            for i, explanation in enumerate(self.explain_items(plan)):
+                items[i]["explanation"] = explanation
+                yield {"event": "explanation", "index": i, "explanation": explanation}
+
+        elif items:
+            # One worker per item: the calls are I/O bound and RETURN_K is small
+            with ThreadPoolExecutor(max_workers=len(items)) as pool:
+                futures = {
+                    pool.submit(self.explain_item, plan, item): i
+                    for i, item in enumerate(items)
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    items[i]["explanation"] = future.result()
+                    yield {
+                        "event": "explanation",
+                        "index": i,
+                        "explanation": items[i]["explanation"]
+                    }
+
+        self.remember(plan)
+
+        done = {"event": "done"}
+        if plan["degraded"]:
+            done["degraded"] = list(plan["degraded"])
+        yield done
 
 
 if __name__ == "__main__":
@@ -0,0 +1,425 @@
+"""
+replay.py
+Shadow-traffic replay for capacity planning.
+
+Reads the [REQUEST] lines the API writes to smartdine.log (JSON or text
+format, rotated files included) or any JSONL of
+{"query", "city", "surprise", "session_id", "ts"?} and replays them:
+
+- timed: the logged arrival pattern, --speedup times faster
+- sweep: open-loop Poisson arrivals at each of --rates (req/s), drawing
+  requests from the logged mix
+
+against a running API (--url) or in-process against SmartDineRecommender
+with the LLM and weather stubbed by the benchmark fakes. At most
+--concurrency requests run at once; later arrivals wait, and latency is
+measured from the scheduled arrival, so queueing counts.
+
+For every run the report gives achieved throughput, latency percentiles,
+errors, 503 rejections and per-stage p95 (debug timings). Saturation
+throughput is the highest offered rate still served at >= 95% of the
+rate with p99 under --slo-ms. The stage that saturates first is the
+one whose p95 grew most (in ms) from the lowest rate to the first rate
+that missed.
+
+Usage:
+    python src/replay.py logs/smartdine.log* --url http://localhost:8000 --rates 5,10,20,40
+    python src/replay.py logs/smartdine.log --url http://localhost:8000 --speedup 20
+    python src/replay.py logs/smartdine.log --synthetic 100000 --llm-ms 300 --rates 10,20,40,80
+"""
+
+import os
+import re
+import ast
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if SRC_DIR not in sys.path:
+    sys.path.append(SRC_DIR)
+
+from benchmark import (
+    PACKAGE_DIR,
+    FakeExplainer,
+    FakeWeather,
+    HashingEncoder,
+    build_synthetic_catalog,
+    city_names,
+    summarize_latencies,
+    summarize_stage_timings
+)
+from metrics import collect_timings
+
+REPLAY_DIR = os.path.join(PACKAGE_DIR, "benchmarks", "replay")
+
+# Text format: "<asctime> | INFO | root | [REQUEST] session=... | city='...' | query='...' | surprise=..."
+TEXT_REQUEST = re.compile(
+    r"^(?P<ts>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d).*?\[REQUEST\] session=(?P<session>.*?) \| "
+    r"city=(?P<city>'.*?'|\".*?\") \| query=(?P<query>'.*'|\".*\") \| surprise=(?P<surprise>\w+)\s*$"
+)
+
+SATURATION_SHARE = 0.95   # achieved / offered rate still counted as keeping up
+
+
+# ---------------- LOG PARSING ---------------- #
+
+def _request(query, city, surprise, session_id, ts=None):
+    return {
+        "query": query or "",
+        "city": str(city).strip().lower(),
+        "surprise": surprise in (True, "True", "true", 1),
+        "session_id": session_id or "default",
+        "ts": ts
+    }
+
+
+def parse_line(line):
+    """A request dict from one log or JSONL line, or None."""
+    line = line.strip()
+    if not line:
+        return None
+
+    if line.startswith("{"):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        if entry.get("event", "request") != "request" or "city" not in entry:
+            return None
+        ts = entry.get("ts")
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts).timestamp()
+        return _request(entry.get("query"), entry["city"], entry.get("surprise"),
+                        entry.get("session") or entry.get("session_id"), ts)
+
+    match = TEXT_REQUEST.match(line)
+    if match is None:
+        return None
+    ts = datetime.strptime(match["ts"], "%Y-%m-%d %H:%M:%S").timestamp()
+    return _request(ast.literal_eval(match["query"]), ast.literal_eval(match["city"]),
+                    match["surprise"], match["session"], ts)
+
+
+def load_requests(paths):
+    """All requests in `paths`, in arrival order when timestamps are known."""
+    requests = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            requests.extend(r for r in map(parse_line, f) if r is not None)
+
+    if requests and all(r["ts"] is not None for r in requests):
+        requests.sort(key=lambda r: r["ts"])
+    return requests
+
+
+def describe(requests):
+    cities = {}
+    for r in requests:
+        cities[r["city"]] = cities.get(r["city"], 0) + 1
+    span_s = None
+    if len(requests) > 1 and requests[0]["ts"] is not None:
+        span_s = requests[-1]["ts"] - requests[0]["ts"]
+    return {
+        "requests": len(requests),
+        "cities": len(cities),
+        "top_cities": sorted(cities.items(), key=lambda kv: -kv[1])[:5],
+        "surprise_share": round(sum(r["surprise"] for r in requests) / max(1, len(requests)), 3),
+        "logged_span_s": span_s,
+        "logged_rps": round(len(requests) / span_s, 2) if span_s else None
+    }
+
+
+# ---------------- TARGETS ---------------- #
+
+class APITarget:
+    """POST /recommend with debug timings; one HTTP session per thread."""
+
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip("/") + "/recommend"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self, request):
+        import requests
+
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+
+        body = {k: request[k] for k in ("query", "city", "surprise", "session_id")}
+        res = session.post(self.url, json={**body, "debug": True}, timeout=self.timeout)
+        if res.status_code == 503:
+            return "rejected", {}
+        res.raise_for_status()
+        payload = res.json()
+        if "error" in payload:
+            raise RuntimeError(payload["error"])
+        return "ok", payload.get("timings", {})
+
+
+class RecommenderTarget:
+    """In-process SmartDineRecommender.recommend with per-stage timings."""
+
+    def __init__(self, recommender, city_map=None):
+        self.recommender = recommender
+        self.city_map = city_map or {}
+
+    def __call__(self, request):
+        with collect_timings() as timings:
+            self.recommender.recommend(
+                query=request["query"],
+                city=self.city_map.get(request["city"], request["city"]),
+                surprise=request["surprise"],
+                session_id=request["session_id"]
+            )
+        return "ok", timings
+
+
+def build_recommender_target(requests, args):
+    from recommender import SmartDineRecommender
+
+    explainer = FakeExplainer(args.llm_ms, args.llm_jitter_ms, seed=args.seed)
+    weather = FakeWeather(args.weather_ms)
+
+    if not args.synthetic:
+        # Production data and encoder, stubbed externals
+        return RecommenderTarget(SmartDineRecommender(explainer=explainer, weather_fn=weather))
+
+    import tempfile
+    from faiss_index import build_city_faiss_indexes
+    from mood_model import MoodModel
+
+    # Logged cities by traffic onto synthetic cities by catalog size (both Zipf-ordered)
+    counts = {}
+    for r in requests:
+        counts[r["city"]] = counts.get(r["city"], 0) + 1
+    logged = sorted(counts, key=lambda c: -counts[c])
+    synthetic = [c.lower() for c in city_names(len(logged))]
+
+    df = build_synthetic_catalog(args.synthetic, len(logged), seed=args.seed)
+    encoder = HashingEncoder(seed=args.seed)
+    faiss_dir = tempfile.mkdtemp(prefix="smartdine-replay-")
+    build_city_faiss_indexes(df=df, model=encoder, faiss_dir=faiss_dir)
+
+    recommender = SmartDineRecommender(
+        df=df, model=encoder, mood_model=MoodModel(model=encoder),
+        explainer=explainer, weather_fn=weather, faiss_dir=faiss_dir
+    )
+    return RecommenderTarget(recommender, dict(zip(logged, synthetic)))
+
+
+# ---------------- REPLAY ---------------- #
+
+def run_schedule(target, requests, offsets, concurrency):
+    """
+    Open loop: request i is released at offsets[i] seconds whether or not
+    earlier ones finished. Latency runs from the release time.
+    """
+    latencies, timings, errors, rejected = [], [], 0, 0
+    lock = threading.Lock()
+
+    def call(request, scheduled):
+        nonlocal errors, rejected
+        started = time.perf_counter()
+        try:
+            status, stage_ms = target(request)
+        except Exception as e:
+            status, stage_ms = "error", {}
+            if errors < 5:
+                print(f"[REPLAY] request failed: {e!r}")
+        finished = time.perf_counter()
+
+        with lock:
+            if status == "ok":
+                latencies.append(finished - scheduled)
+                timings.append({**stage_ms, "queue": (started - scheduled) * 1000})
+            elif status == "rejected":
+                rejected += 1
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for request, offset in zip(requests, offsets):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(call, request, start + offset)
+    wall = time.perf_counter() - start
+
+    summary = summarize_latencies(latencies, wall, errors)
+    summary["rejected"] = rejected
+    summary["offered_rps"] = round(len(requests) / offsets[-1], 2) if len(offsets) > 1 and offsets[-1] > 0 else None
+    summary["stages_ms"] = summarize_stage_timings(timings)
+    return summary
+
+
+def timed_offsets(requests, speedup):
+    if requests[0]["ts"] is None:
+        raise SystemExit("Timed replay needs timestamps; use --rates for an untimed request log")
+    t0 = requests[0]["ts"]
+    return [(r["ts"] - t0) / speedup for r in requests]
+
+
+def poisson_offsets(n, rate, rng):
+    return np.cumsum(rng.exponential(1.0 / rate, size=n)).tolist()
+
+
+def find_saturation(runs, slo_ms):
+    """
+    (saturation rps, first saturating stage, largest stage, per-stage p95
+    growth) from a rate sweep. "queue" saturating first means requests
+    waited for one of the replay's concurrency slots, "admission" that
+    the API answered 503; the largest stage is then what holds the slots.
+    """
+    def error_share(run):
+        return run["errors"] / max(1, run["count"] + run["errors"] + run["rejected"])
+
+    # Requests that fail at the lowest rate too (unknown cities...) are not load
+    base_errors = error_share(runs[0]) if runs else 0.0
+
+    def keeps_up(run):
+        lat = run.get("latency_ms")
+        return (
+            lat is not None
+            and run["rejected"] == 0
+            and error_share(run) <= base_errors + 0.01
+            and run["throughput_rps"] >= SATURATION_SHARE * (run["offered_rps"] or run["rate"])
+            and lat["p99"] <= slo_ms
+        )
+
+    saturation = None
+    knee = None
+    for run in runs:
+        if keeps_up(run):
+            saturation = run["rate"]
+        else:
+            knee = run
+            break
+
+    if knee is None or knee is runs[0] or not knee.get("stages_ms"):
+        return saturation, None, None, {}
+
+    base = runs[0]["stages_ms"]
+    growth = {
+        name: round(stats["p95"] - base.get(name, {}).get("p95", 0.0), 3)
+        for name, stats in knee["stages_ms"].items()
+        if name != "total"
+    }
+    first = max(growth, key=growth.get) if growth else None
+    if knee["rejected"]:
+        first = "admission"   # the API shed load (503) before any stage slowed down
+    service = {n: s["p95"] for n, s in knee["stages_ms"].items() if n not in ("total", "queue")}
+    largest = max(service, key=service.get) if service else None
+    return saturation, first, largest, dict(sorted(growth.items(), key=lambda kv: -kv[1]))
+
+
+def print_run(label, run):
+    lat = run.get("latency_ms") or {}
+    stages = run.get("stages_ms", {})
+    top = sorted(((s["p95"], n) for n, s in stages.items() if n != "total"), reverse=True)[:3]
+    print(
+        f"  {label:>10}  done {run['count']:>6}  err {run['errors']:>4}  503 {run['rejected']:>4}  "
+        f"{run.get('throughput_rps') or 0:>8.1f} rps  "
+        f"p50 {lat.get('p50', 0):>8.1f}  p95 {lat.get('p95', 0):>8.1f}  p99 {lat.get('p99', 0):>8.1f} ms  "
+        + "  ".join(f"{n}={p:.0f}" for p, n in top)
+    )
+
+
+# ---------------- MAIN ---------------- #
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay logged SmartDine traffic for capacity planning")
+    parser.add_argument("logs", nargs="+", help="smartdine.log files (JSON or text) or request JSONL")
+    parser.add_argument("--url", help="API base URL; default: in-process recommender with stubbed externals")
+    parser.add_argument("--speedup", type=float, default=1.0, help="timed replay: arrival gaps divided by this")
+    parser.add_argument("--rates", help="comma-separated open-loop arrival rates (req/s) to sweep instead")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per sweep rate")
+    parser.add_argument("--concurrency", type=int, default=32, help="max requests in flight")
+    parser.add_argument("--limit", type=int, help="timed replay: first N requests only")
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="p99 that still counts as keeping up")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="in-process: synthetic catalog of this many items instead of production data")
+    parser.add_argument("--llm-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--weather-ms", type=float, default=150.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="report JSON path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    logged = load_requests(args.logs)
+    if not logged:
+        raise SystemExit("No [REQUEST] lines found")
+    workload = describe(logged)
+    print(f"[REPLAY] {json.dumps(workload)}")
+
+    target = APITarget(args.url) if args.url else build_recommender_target(logged, args)
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "args": vars(args),
+            "workload": workload
+        },
+        "runs": []
+    }
+
+    if args.rates:
+        rng = np.random.default_rng(args.seed)
+        pick = random.Random(args.seed)
+        print(f"[REPLAY] Open-loop sweep, {args.duration:.0f}s per rate, concurrency {args.concurrency}")
+
+        for rate in (float(r) for r in args.rates.split(",")):
+            n = max(1, int(rate * args.duration))
+            run = run_schedule(target, pick.choices(logged, k=n), poisson_offsets(n, rate, rng), args.concurrency)
+            run["rate"] = rate
+            report["runs"].append(run)
+            print_run(f"{rate:g}/s", run)
+
+        saturation, stage, largest, growth = find_saturation(report["runs"], args.slo_ms)
+        report["saturation_rps"] = saturation
+        report["first_saturating_stage"] = stage
+        report["largest_stage_at_saturation"] = largest
+        report["stage_p95_growth_ms"] = growth
+
+        if saturation is None:
+            print(f"[REPLAY] Saturated at the lowest rate already (p99 <= {args.slo_ms:g} ms); sweep lower rates")
+        else:
+            print(f"[REPLAY] Saturation throughput: {saturation:g} req/s (p99 <= {args.slo_ms:g} ms)")
+        if stage == "admission":
+            print(f"[REPLAY] First to saturate: API admission control (503s); largest stage: {largest}")
+        elif stage == "queue":
+            print(f"[REPLAY] First to saturate: queue (waiting for one of {args.concurrency} slots); "
+                  f"largest stage holding them: {largest}")
+        elif stage:
+            print(f"[REPLAY] First stage to saturate: {stage}")
+        if growth:
+            print(f"[REPLAY] p95 growth to the first missed rate (ms): {json.dumps(dict(list(growth.items())[:5]))}")
+    else:
+        timed = logged[:args.limit] if args.limit else logged
+        run = run_schedule(target, timed, timed_offsets(timed, args.speedup), args.concurrency)
+        run["speedup"] = args.speedup
+        report["runs"].append(run)
+        print(f"[REPLAY] Timed replay at {args.speedup:g}x, concurrency {args.concurrency}")
+        print_run(f"{args.speedup:g}x", run)
+
+    out = args.out or os.path.join(REPLAY_DIR, f"replay-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"[REPLAY] Report saved → {out}")
+
+
+if __name__ == "__main__":
+    main()
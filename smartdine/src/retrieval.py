@@ -0,0 +1,394 @@
+"""
+retrieval.py
+Where city searches run: in-process, or on a tier of retrieval shards.
+
+- LocalRetriever:   search_city() against indexes on this host
+- ShardCoordinator: routes each city to the shards that own it
+                    (consistent hashing with replicas), scatters
+                    multi-city searches and merges the top-k
+
+Both expose the same calls:
+
+    retriever.search(query_emb, city, top_k, filters, faiss_dir, query_text)
+    retriever.search_many(query_emb, cities, top_k, filters, faiss_dir, query_text)
+
+Keyword-only queries skip the embedding and read a ranked intent list
+(faiss_index.ranked_city) through
+
+    retriever.ranked(city, name, top_k, filters, faiss_dir)
+
+which returns None when the list is not available; callers then take
+the full path.
+
+With `query_text` each city search is hybrid (FAISS + BM25, see
+faiss_index.search_city). search_many() searches every city index in parallel, merges the top-k
+with a heap and drops a restaurant's dish when it already came from
+another city. Per-index milliseconds are added to debug timings as
+"index:<city>" and to the smartdine_index_search_seconds histogram.
+
+Shards are started with `python src/retrieval_service.py` (see there).
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import bisect
+import hashlib
+import heapq
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import (
+    RETRIEVAL_MODE,
+    RETRIEVAL_SHARDS,
+    RETRIEVAL_REPLICAS,
+    RETRIEVAL_TIMEOUT_MS,
+    RETRIEVAL_LOCAL_FALLBACK,
+    NEARBY_CITIES,
+    SEARCH_THREADS
+)
+from faiss_index import search_city, ranked_city, IndexNotFoundError, FAISS_DIR
+from snapshots import index_version
+from metrics import counter, histogram, span, record_timing, METRICS_ENABLED
+
+SHARD_REQUESTS = counter(
+    "smartdine_shard_requests_total",
+    "Retrieval shard calls by shard and result (ok/missing/stale/timeout/error).",
+    ["shard", "result"]
+)
+SHARD_SECONDS = histogram(
+    "smartdine_shard_seconds",
+    "Retrieval shard call latency.",
+    ["shard"]
+)
+LOCAL_FALLBACKS = counter(
+    "smartdine_shard_local_fallbacks_total",
+    "Cities searched locally because no shard replica answered."
+)
+INDEX_SEARCH_SECONDS = histogram(
+    "smartdine_index_search_seconds",
+    "Per-city index search latency within multi-city searches.",
+    ["city"]
+)
+
+# A shard that failed is tried last for this long
+EJECT_SECONDS = 5.0
+
+
+# ---------------- HELPERS ---------------- #
+
+def _score(item):
+    # Hybrid results are ordered by fused rank; plain ones by cosine
+    return item.get("rrf_score", item["semantic_score"])
+
+
+def merge_topk(result_lists, top_k):
+    """
+    Merge per-city result lists into one top-k (rrf_score if hybrid,
+    else semantic_score).
+
+    A restaurant's dish found in more than one city (chains) is kept
+    once, from the city where it scored highest. Branches within one
+    city are separate rows and are all kept.
+    """
+    # Lists are short (<= top_k); sorting each keeps heapq.merge lazy
+    ranked = heapq.merge(
+        *(sorted(results, key=_score, reverse=True) for results in result_lists),
+        key=_score,
+        reverse=True
+    )
+
+    seen = {}
+
+    def first_city_only(item):
+        key = (str(item.get("Restaurant_Name", "")).lower(), str(item.get("Item_Name", "")).lower())
+        city = seen.setdefault(key, item.get("city"))
+        return city == item.get("city")
+
+    return list(islice(filter(first_city_only, ranked), top_k))
+
+
+def nearby_cities(city):
+    """Neighbours of `city` from config.NEARBY_CITIES, in both directions."""
+    neighbours = list(NEARBY_CITIES.get(city, []))
+    neighbours += [c for c, near in NEARBY_CITIES.items() if city in near and c not in neighbours]
+    return neighbours
+
+
+def record_index_latencies(latencies):
+    for city, ms in latencies.items():
+        record_timing(f"index:{city}", ms)
+        if METRICS_ENABLED:
+            INDEX_SEARCH_SECONDS.observe(ms / 1000, city=city)
+
+
+def encode_vector(vec):
+    return base64.b64encode(np.asarray(vec, dtype="float32").tobytes()).decode("ascii")
+
+
+def decode_vector(data):
+    return np.frombuffer(base64.b64decode(data), dtype="float32").reshape(1, -1)
+
+
+def parse_shards(spec):
+    """'shard-0=http://host:8101,shard-1=http://host:8102' -> {name: url}"""
+    shards = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, url = part.partition("=")
+        if not url:
+            raise ValueError(f"Bad shard entry {part!r}; expected name=url")
+        shards[name.strip()] = url.strip().rstrip("/")
+    return shards
+
+
+# ---------------- CONSISTENT HASHING ---------------- #
+
+class ConsistentHashRing:
+    """
+    Hash ring with virtual nodes. Adding or removing a shard only moves
+    the cities that hash next to it.
+    """
+
+    def __init__(self, nodes, vnodes=64):
+        self.nodes = sorted(nodes)
+        self._ring = sorted(
+            (self._hash(f"{node}#{i}"), node)
+            for node in self.nodes
+            for i in range(vnodes)
+        )
+        self._keys = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def owners(self, key, n=1):
+        """First `n` distinct nodes clockwise from `key` (primary first)."""
+        if not self._ring:
+            return []
+
+        n = min(n, len(self.nodes))
+        owners = []
+        i = bisect.bisect(self._keys, self._hash(key))
+
+        while len(owners) < n:
+            node = self._ring[i % len(self._ring)][1]
+            if node not in owners:
+                owners.append(node)
+            i += 1
+
+        return owners
+
+
+# ---------------- LOCAL ---------------- #
+
+class LocalRetriever:
+    """Every city index on this host (the default)."""
+
+    def __init__(self, threads=SEARCH_THREADS):
+        # FAISS releases the GIL during search, so city indexes scan in parallel
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="faiss")
+
+    def search(self, query_emb, city, top_k, filters=None, faiss_dir=FAISS_DIR, query_text=None):
+        return search_city(query_emb, city, top_k, faiss_dir, filters=filters, query_text=query_text)
+
+    def ranked(self, city, name, top_k, filters=None, faiss_dir=FAISS_DIR):
+        try:
+            return ranked_city(city, name, top_k, faiss_dir, filters=filters)
+        except IndexNotFoundError:
+            return None   # no index for this city
+
+    @staticmethod
+    def _timed_search(query_emb, city, top_k, filters, faiss_dir, query_text):
+        start = time.perf_counter()
+        try:
+            results = search_city(query_emb, city, top_k, faiss_dir, filters=filters, query_text=query_text)
+        except IndexNotFoundError:
+            return city, None, 0.0   # no index for this city
+        return city, results, (time.perf_counter() - start) * 1000
+
+    def search_many(self, query_emb, cities, top_k, filters=None, faiss_dir=FAISS_DIR, query_text=None):
+        cities = list(dict.fromkeys(c.lower().strip() for c in cities))
+        futures = [
+            self.pool.submit(self._timed_search, query_emb, city, top_k, filters, faiss_dir, query_text)
+            for city in cities
+        ]
+
+        result_lists, latencies = [], {}
+        for future in futures:
+            city, results, ms = future.result()
+            if results is not None:
+                result_lists.append(results)
+                latencies[city] = ms
+
+        record_index_latencies(latencies)
+        return merge_topk(result_lists, top_k)
+
+
+# ---------------- SHARDED ---------------- #
+
+class ShardCoordinator:
+    """
+    Scatter-gather over retrieval shards.
+
+    Each city maps to `replicas` shards on the ring. Cities are grouped by
+    shard so each shard gets one request per query. A city that times
+    out, errors or is missing on one shard moves to its next replica, as
+    does one whose shard serves another snapshot version than `faiss_dir`
+    (409, see retrieval_service.py).
+    With every replica exhausted, the city is searched locally if its
+    index is on this host (`local_fallback`).
+    """
+
+    def __init__(
+        self,
+        shards,
+        replicas=RETRIEVAL_REPLICAS,
+        timeout_ms=RETRIEVAL_TIMEOUT_MS,
+        local_fallback=RETRIEVAL_LOCAL_FALLBACK
+    ):
+        if not shards:
+            raise ValueError("ShardCoordinator needs at least one shard (SMARTDINE_RETRIEVAL_SHARDS)")
+
+        self.shards = dict(shards)
+        self.ring = ConsistentHashRing(self.shards)
+        self.replicas = max(1, min(replicas, len(self.shards)))
+        self.timeout = timeout_ms / 1000
+        self.local_fallback = local_fallback
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.shards), pool_maxsize=32)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.pool = ThreadPoolExecutor(max_workers=max(4, 2 * len(self.shards)), thread_name_prefix="shard")
+        self._ejected = {}   # shard -> monotonic time it may be preferred again
+        self._lock = threading.Lock()
+
+    def owners(self, city):
+        """Replica list for `city`, recently failed shards moved to the end."""
+        owners = self.ring.owners(city, self.replicas)
+        now = time.monotonic()
+        with self._lock:
+            return sorted(owners, key=lambda s: self._ejected.get(s, 0) > now)
+
+    def _eject(self, shard):
+        with self._lock:
+            self._ejected[shard] = time.monotonic() + EJECT_SECONDS
+
+    def _call(self, shard, cities, payload):
+        """
+        One shard request. Returns ({city: results}, {city: ms}) for the
+        cities it served; ms is the shard's own per-index search time.
+        """
+        start = time.perf_counter()
+        try:
+            resp = self.session.post(
+                f"{self.shards[shard]}/search",
+                json={**payload, "cities": cities},
+                timeout=self.timeout
+            )
+            if resp.status_code == 409:
+                # Shard is on another snapshot version (mid-publish)
+                served, took_ms, result = {}, {}, "stale"
+            else:
+                resp.raise_for_status()
+                body = json.loads(resp.content)
+                served, took_ms = body["results"], body.get("took_ms", {})
+                result = "ok" if len(served) == len(cities) else "missing"
+        except requests.Timeout:
+            served, took_ms, result = {}, {}, "timeout"
+        except (requests.RequestException, ValueError, KeyError):
+            served, took_ms, result = {}, {}, "error"
+
+        if METRICS_ENABLED:
+            SHARD_REQUESTS.inc(shard=shard, result=result)
+            SHARD_SECONDS.observe(time.perf_counter() - start, shard=shard)
+
+        if result in ("timeout", "error", "stale"):
+            self._eject(shard)
+
+        return served, took_ms
+
+    def _gather(self, query_emb, cities, top_k, filters, query_text, version=None):
+        payload = {
+            "vector": encode_vector(query_emb),
+            "top_k": top_k,
+            "filters": filters,
+            "query_text": query_text,
+            "version": version
+        }
+        routes = {city: self.owners(city) for city in cities}
+        found, latencies = {}, {}
+
+        for attempt in range(self.replicas):
+            pending = [c for c in cities if c not in found and attempt < len(routes[c])]
+            if not pending:
+                break
+
+            groups = {}
+            for city in pending:
+                groups.setdefault(routes[city][attempt], []).append(city)
+
+            futures = [self.pool.submit(self._call, shard, group, payload) for shard, group in groups.items()]
+            for future in futures:
+                served, took_ms = future.result()
+                found.update(served)
+                latencies.update(took_ms)
+
+        return found, latencies
+
+    def search_many(self, query_emb, cities, top_k, filters=None, faiss_dir=FAISS_DIR, query_text=None, strict=False):
+        cities = list(dict.fromkeys(c.lower().strip() for c in cities))
+
+        with span("shard_search"):
+            found, latencies = self._gather(query_emb, cities, top_k, filters, query_text, index_version(faiss_dir))
+
+        for city in cities:
+            if city in found:
+                continue
+            if self.local_fallback and os.path.exists(os.path.join(faiss_dir, f"{city}.index")):
+                if METRICS_ENABLED:
+                    LOCAL_FALLBACKS.inc()
+                found[city] = search_city(query_emb, city, top_k, faiss_dir, filters=filters, query_text=query_text)
+            elif strict:
+                raise IndexNotFoundError(f"No retrieval shard or local index for city: {city}")
+
+        if not strict:
+            record_index_latencies(latencies)
+        return merge_topk(found.values(), top_k)
+
+    def search(self, query_emb, city, top_k, filters=None, faiss_dir=FAISS_DIR, query_text=None):
+        return self.search_many(query_emb, [city], top_k, filters, faiss_dir, query_text, strict=True)
+
+    def ranked(self, city, name, top_k, filters=None, faiss_dir=FAISS_DIR):
+        # Ranked lists are only read where the city's index is on this
+        # host; otherwise the query goes through the shards as usual
+        city = city.lower().strip()
+        if not os.path.exists(os.path.join(faiss_dir, f"{city}.index")):
+            return None
+        return ranked_city(city, name, top_k, faiss_dir, filters=filters)
+
+
+# ---------------- FACTORY ---------------- #
+
+def get_retriever(mode=None):
+    mode = mode or RETRIEVAL_MODE
+
+    if mode == "local":
+        return LocalRetriever()
+    if mode == "sharded":
+        return ShardCoordinator(parse_shards(RETRIEVAL_SHARDS))
+
+    raise ValueError(f"Unknown retrieval mode: {mode!r} (expected 'local' or 'sharded')")
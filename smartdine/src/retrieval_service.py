@@ -0,0 +1,238 @@
+"""
+retrieval_service.py
+Retrieval shard: serves search_city() for the cities it owns.
+
+Every process is given the same shard list (SMARTDINE_RETRIEVAL_SHARDS)
+and its own name. It owns the cities that the consistent hash ring maps
+to it within the replica count, and it only loads those indexes.
+
+    POST /search   {"cities": [...], "vector": <base64 float32>,
+                    "top_k": 40, "filters": {...}, "query_text": "..."}
+               ->  {"shard": name, "results": {city: [...]},
+                    "missing": [...], "took_ms": {city: ms}}
+    GET  /health   owned and loaded cities, snapshot version
+
+Without --faiss-dir a shard serves the CURRENT data snapshot and follows
+the pointer (every SNAPSHOT_WATCH_SECONDS): the new version's indexes are
+loaded before they replace the old ones. Requests carry the snapshot
+version the API is on ("version"); a shard on another version answers
+409, and the coordinator moves on to the next replica or its local index.
+
+Run one shard:
+    python src/retrieval_service.py serve --shard shard-0 --port 8101
+
+Run a local cluster (one process per shard) for testing:
+    python src/retrieval_service.py cluster --shards 3 --base-port 8101
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import RETRIEVAL_SHARDS, RETRIEVAL_REPLICAS, SNAPSHOT_WATCH_SECONDS
+from faiss_index import search_city, get_city_index, clear_index_cache, FAISS_DIR
+from metrics import render_metrics
+from retrieval import ConsistentHashRing, decode_vector, parse_shards
+from snapshots import read_current, snapshot_path, index_version, INDEX_DIR
+
+
+# ---------------- SHARD STATE ---------------- #
+
+# "live" is replaced as a whole on a snapshot change, so a request sees
+# one consistent (version, faiss_dir, cities)
+SHARD = {
+    "name": None,
+    "live": {"version": None, "faiss_dir": FAISS_DIR, "cities": set()}
+}
+
+
+def default_faiss_dir():
+    """Indexes of the CURRENT data snapshot, else FAISS_DIR."""
+    version = read_current()
+    return os.path.join(snapshot_path(version), INDEX_DIR) if version else FAISS_DIR
+
+
+def owned_cities(name, shards, replicas, faiss_dir):
+    ring = ConsistentHashRing(shards)
+    available = sorted(f[:-len(".index")] for f in os.listdir(faiss_dir) if f.endswith(".index"))
+    return {city for city in available if name in ring.owners(city, replicas)}
+
+
+def configure(name, shards, replicas, faiss_dir):
+    """Load this shard's cities from `faiss_dir`, then make them live."""
+    cities = owned_cities(name, shards, replicas, faiss_dir)
+    version = index_version(faiss_dir)
+
+    print(f"[SHARD] {name}: loading {len(cities)} cities from {faiss_dir}")
+    for city in sorted(cities):
+        get_city_index(city, faiss_dir)
+
+    old = SHARD["live"]
+    SHARD["name"] = name
+    SHARD["live"] = {"version": version, "faiss_dir": faiss_dir, "cities": cities}
+    if old["faiss_dir"] != faiss_dir:
+        clear_index_cache(old["faiss_dir"])
+
+    print(f"[SHARD] {name}: ready on {version or faiss_dir} ({', '.join(sorted(cities))})")
+
+
+def follow_snapshots(name, shards, replicas, interval=SNAPSHOT_WATCH_SECONDS):
+    """Poll CURRENT every `interval` seconds and move to the version it names."""
+    if interval <= 0:
+        return
+
+    def loop():
+        failed = None
+        while True:
+            time.sleep(interval)
+            version = read_current()
+            if version in (None, SHARD["live"]["version"], failed):
+                continue
+            try:
+                configure(name, shards, replicas, os.path.join(snapshot_path(version), INDEX_DIR))
+            except Exception as e:
+                # Keep serving the old version; a failed version is not retried
+                failed = version
+                print(f"[SHARD] {name}: switch to {version} failed: {type(e).__name__}: {e}")
+
+    threading.Thread(target=loop, name="shard-snapshot-watch", daemon=True).start()
+
+
+# ---------------- API ---------------- #
+
+app = FastAPI(title="SmartDine Retrieval Shard")
+
+
+class SearchRequest(BaseModel):
+    cities: List[str]
+    vector: str
+    top_k: int = 40
+    filters: Optional[dict] = None
+    query_text: Optional[str] = None   # hybrid FAISS + BM25 when set
+    version: Optional[str] = None      # caller's snapshot version; checked when both have one
+
+
+def _json_default(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+@app.get("/health")
+def health():
+    live = SHARD["live"]
+    return {"status": "ok", "shard": SHARD["name"], "version": live["version"], "cities": sorted(live["cities"])}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/search")
+def search(req: SearchRequest):
+    live = SHARD["live"]
+    if req.version and live["version"] and req.version != live["version"]:
+        return JSONResponse(
+            status_code=409,
+            content={"shard": SHARD["name"], "version": live["version"], "requested": req.version}
+        )
+
+    query_emb = decode_vector(req.vector)
+    results, took_ms, missing = {}, {}, []
+
+    for city in req.cities:
+        if city not in live["cities"]:
+            missing.append(city)
+            continue
+
+        start = time.perf_counter()
+        results[city] = search_city(
+            query_emb, city, req.top_k, live["faiss_dir"],
+            filters=req.filters, query_text=req.query_text
+        )
+        took_ms[city] = round((time.perf_counter() - start) * 1000, 3)
+
+    body = {"shard": SHARD["name"], "results": results, "missing": missing, "took_ms": took_ms}
+
+    # Plain json.dumps: metadata can hold NaN, which the coordinator reads back as NaN
+    return Response(json.dumps(body, default=_json_default), media_type="application/json")
+
+
+# ---------------- ENTRY ---------------- #
+
+def run_cluster(n_shards, base_port, faiss_dir=None, host="127.0.0.1"):
+    shards = {f"shard-{i}": f"http://{host}:{base_port + i}" for i in range(n_shards)}
+    spec = ",".join(f"{name}={url}" for name, url in shards.items())
+    env = {**os.environ, "SMARTDINE_RETRIEVAL_SHARDS": spec}
+
+    procs = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "serve",
+             "--shard", name, "--host", host, "--port", str(base_port + i)]
+            + (["--faiss-dir", faiss_dir] if faiss_dir else []),
+            env=env
+        )
+        for i, name in enumerate(shards)
+    ]
+
+    print(f"[INFO] Started {n_shards} shards. Point the API at them with:")
+    print(f"       SMARTDINE_RETRIEVAL_MODE=sharded SMARTDINE_RETRIEVAL_SHARDS={spec}")
+
+    try:
+        for proc in procs:
+            proc.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in procs:
+            proc.terminate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SmartDine retrieval shard")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve")
+    serve.add_argument("--shard", required=True, help="this shard's name in SMARTDINE_RETRIEVAL_SHARDS")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8101)
+    serve.add_argument("--faiss-dir", default=None)
+    serve.add_argument("--replicas", type=int, default=RETRIEVAL_REPLICAS)
+
+    cluster = sub.add_parser("cluster")
+    cluster.add_argument("--shards", type=int, default=3)
+    cluster.add_argument("--base-port", type=int, default=8101)
+    cluster.add_argument("--faiss-dir", default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "cluster":
+        run_cluster(args.shards, args.base_port, args.faiss_dir)
+        return
+
+    shards = parse_shards(os.getenv("SMARTDINE_RETRIEVAL_SHARDS", RETRIEVAL_SHARDS))
+    if args.shard not in shards:
+        raise SystemExit(f"Shard {args.shard!r} is not in SMARTDINE_RETRIEVAL_SHARDS")
+
+    configure(args.shard, shards, args.replicas, args.faiss_dir or default_faiss_dir())
+    if args.faiss_dir is None:
+        follow_snapshots(args.shard, shards, args.replicas)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
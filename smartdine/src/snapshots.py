@@ -0,0 +1,430 @@
+"""
+snapshots.py
+Versioned data snapshots and hot reload.
+
+A snapshot is one published build of the dataset and its city indexes:
+
+    SNAPSHOT_DIR/<version>/manifest.json
+    SNAPSHOT_DIR/<version>/smartdine_preprocessed.csv
+    SNAPSHOT_DIR/<version>/faiss_indexes/...
+    SNAPSHOT_DIR/CURRENT                  # name of the live version
+
+Publishing writes a new directory and then repoints CURRENT. The running
+API picks it up (admin endpoint or CURRENT watcher), loads and warms it
+in a background thread and swaps it in with one reference assignment.
+Requests lease the snapshot they started on, so they finish on the old
+version. The old version's indexes are dropped once its last lease is
+released.
+
+Usage:
+    python src/snapshots.py publish [--data path.csv] [--version name]
+    python src/snapshots.py list
+    python src/snapshots.py prune --keep 3
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import random
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import PREPROCESSED_DATA, SNAPSHOT_DIR, NEARBY_CITIES, FALLBACK_ITEMS
+from faiss_index import build_city_faiss_indexes, get_city_index, clear_index_cache, MODEL_NAME
+from city_catalog import build_city_catalog, CityResolver
+from intent_lists import fallback_rows
+from lexical_index import tag_flags
+from item_ids import assign_ids
+from utils import load_csv
+
+MANIFEST_FILE = "manifest.json"
+DATA_FILE = "smartdine_preprocessed.csv"
+INDEX_DIR = "faiss_indexes"
+CURRENT_FILE = "CURRENT"
+
+
+# ---------------- SNAPSHOT ---------------- #
+
+class DataSnapshot:
+    """
+    Everything request handling reads from the dataset: the dataframe,
+    per-city frames with their cuisine-tag row positions (Surprise Me
+    pools), popular-item fallback answers, the index directory, the
+    /cities catalog and its name resolver. Immutable once built;
+    replaced, never mutated.
+    """
+
+    def __init__(self, version, df, faiss_dir, manifest=None):
+        if "item_id" not in df.columns or "cuisine_id" not in df.columns:
+            # Datasets preprocessed before item ids existed; the caller's
+            # frame is left as it was
+            df = assign_ids(df.copy())
+
+        self.version = version
+        self.df = df
+        self.faiss_dir = faiss_dir
+        self.manifest = manifest or {}
+        self.loaded_at = time.time()
+
+        # The stripped `city` ids the catalog and CityResolver hand out
+        keys = df["city"] if "city" in df.columns else df["City"].str.strip().str.lower()
+        self.city_frames = {city: city_df for city, city_df in df.groupby(keys)}
+        self.city_tag_rows = {
+            city: {tag: np.flatnonzero(flags) for tag, flags in tag_flags(city_df["Cuisine"]).items()}
+            for city, city_df in self.city_frames.items()
+        }
+        self.city_catalog = build_city_catalog(df, faiss_dir)
+
+        # Cities with data or an index, plus those only reachable as a neighbour
+        known = {e["id"] for e in self.city_catalog.entries}
+        known |= set(NEARBY_CITIES) | {c for near in NEARBY_CITIES.values() for c in near}
+        self.city_resolver = CityResolver(known)
+
+        self.city_fallbacks = {
+            city: [city_df.iloc[int(pos)].to_dict() for pos in fallback_rows(city_df, FALLBACK_ITEMS)]
+            for city, city_df in self.city_frames.items()
+        }
+
+        self._leases = 0
+        self._retired = False
+        self._evict = True
+        self._lock = threading.Lock()
+
+    def city_df(self, city):
+        return self.city_frames.get(city)
+
+    def sample_item(self, city, tag=None):
+        """Random row of `city` carrying cuisine `tag` (any row if none do)."""
+        city_df = self.city_frames.get(city)
+        if city_df is None or city_df.empty:
+            return None
+
+        rows = self.city_tag_rows[city].get(tag) if tag else None
+        pos = random.choice(rows) if rows is not None and len(rows) else random.randrange(len(city_df))
+        return city_df.iloc[int(pos)].to_dict()
+
+    def fallback_items(self, city):
+        """Copies of the city's precomputed popular items, best first (empty if unknown)."""
+        return [dict(item) for item in self.city_fallbacks.get(city, ())]
+
+    def warm(self):
+        """Load every indexed city so the first requests after a swap stay fast."""
+        for entry in self.city_catalog.entries:
+            if entry["indexed"]:
+                get_city_index(entry["id"], self.faiss_dir)
+
+    def acquire(self):
+        with self._lock:
+            self._leases += 1
+
+    def release(self):
+        with self._lock:
+            self._leases -= 1
+            drained = self._retired and self._leases == 0
+        if drained:
+            self.close()
+
+    def retire(self, evict=True):
+        """Called once replaced; closes now or when the last lease ends."""
+        with self._lock:
+            self._retired = True
+            self._evict = evict
+            drained = self._leases == 0
+        if drained:
+            self.close()
+
+    def close(self):
+        if self._evict:
+            clear_index_cache(self.faiss_dir)
+        self.city_frames = {}
+        self.city_tag_rows = {}
+        self.city_fallbacks = {}
+        print(f"[SNAPSHOT] Released {self.version}")
+
+    def info(self):
+        return {
+            "version": self.version,
+            "rows": int(len(self.df)),
+            "cities": len(self.city_catalog.payload["cities"]),
+            "loaded_at": datetime.fromtimestamp(self.loaded_at, timezone.utc).isoformat(timespec="seconds"),
+            "leases": self._leases
+        }
+
+
+# ---------------- SNAPSHOT STORE ---------------- #
+
+def snapshot_path(version, root=SNAPSHOT_DIR):
+    return os.path.join(root, version)
+
+
+def read_current(root=SNAPSHOT_DIR):
+    path = os.path.join(root, CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def set_current(version, root=SNAPSHOT_DIR):
+    """Repoint CURRENT atomically (write + rename)."""
+    if not os.path.exists(os.path.join(snapshot_path(version, root), MANIFEST_FILE)):
+        raise FileNotFoundError(f"No snapshot {version!r} in {root}")
+
+    tmp = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+
+
+def index_version(faiss_dir):
+    """Version of the snapshot whose indexes are in `faiss_dir`, or None outside a snapshot."""
+    path = os.path.dirname(os.path.normpath(faiss_dir))
+    if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return None
+    return os.path.basename(path)
+
+
+def list_snapshots(root=SNAPSHOT_DIR):
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if os.path.exists(os.path.join(root, name, MANIFEST_FILE))
+    )
+
+
+def load_snapshot(version=None, root=SNAPSHOT_DIR, warm=False):
+    """Load `version` (default: CURRENT) into a DataSnapshot."""
+    version = version or read_current(root)
+    if version is None:
+        raise FileNotFoundError(f"No CURRENT snapshot in {root}")
+
+    path = snapshot_path(version, root)
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    df = load_csv(os.path.join(path, manifest.get("data_file", DATA_FILE)))
+    snapshot = DataSnapshot(version, df, os.path.join(path, manifest.get("faiss_dir", INDEX_DIR)), manifest)
+
+    if warm:
+        snapshot.warm()
+
+    return snapshot
+
+
+def publish_snapshot(df=None, data_path=PREPROCESSED_DATA, model=None, root=SNAPSHOT_DIR, version=None, activate=True):
+    """
+    Build a new snapshot directory (data copy + city indexes + manifest)
+    and, by default, make it CURRENT. The directory is built under a
+    temporary name and renamed, so a watcher never sees a partial build.
+    """
+    version = version or datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    final_path = snapshot_path(version, root)
+    if os.path.exists(final_path):
+        raise FileExistsError(f"Snapshot {version!r} already exists")
+
+    build_path = snapshot_path(f".building-{version}", root)
+    shutil.rmtree(build_path, ignore_errors=True)
+    os.makedirs(build_path)
+
+    if df is None:
+        print(f"[INFO] Loading dataset from {data_path}")
+        df = load_csv(data_path)
+        shutil.copy2(data_path, os.path.join(build_path, DATA_FILE))
+    else:
+        df.to_csv(os.path.join(build_path, DATA_FILE), index=False)
+
+    build_city_faiss_indexes(df, model, os.path.join(build_path, INDEX_DIR))
+
+    manifest = {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rows": int(len(df)),
+        "cities": {str(c): int(n) for c, n in df["city"].value_counts().sort_index().items()},
+        "data_file": DATA_FILE,
+        "faiss_dir": INDEX_DIR,
+        "embedding_model": MODEL_NAME
+    }
+    with open(os.path.join(build_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+
+    os.rename(build_path, final_path)
+    print(f"[SUCCESS] Snapshot {version} published → {final_path}")
+
+    if activate:
+        set_current(version, root)
+        print(f"[INFO] CURRENT → {version}")
+
+    return version
+
+
+def prune_snapshots(keep=3, root=SNAPSHOT_DIR):
+    """Delete all but the newest `keep` snapshots; CURRENT is always kept."""
+    current = read_current(root)
+    versions = list_snapshots(root)
+    removed = []
+
+    for version in versions[:max(len(versions) - keep, 0)]:
+        if version == current:
+            continue
+        shutil.rmtree(snapshot_path(version, root))
+        removed.append(version)
+
+    return removed
+
+
+# ---------------- LIVE SWAP ---------------- #
+
+class SnapshotManager:
+    """
+    Holds the live snapshot for a recommender.
+
+        with manager.lease() as snapshot:
+            ...   # snapshot stays valid until the block exits
+
+    reload() loads a version in a background thread and swaps it in;
+    watch() polls CURRENT and reloads when it changes.
+    """
+
+    def __init__(self, snapshot, root=SNAPSHOT_DIR):
+        self.root = root
+        self._snapshot = snapshot
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self.loading = None
+        self.last_error = None
+        self.failed_version = None
+        self.swaps = 0
+
+    @property
+    def current(self):
+        return self._snapshot
+
+    @contextmanager
+    def lease(self):
+        # Read and acquire under the lock, so a swap cannot retire the
+        # snapshot between the two steps.
+        with self._lock:
+            snapshot = self._snapshot
+            snapshot.acquire()
+        try:
+            yield snapshot
+        finally:
+            snapshot.release()
+
+    def swap(self, snapshot):
+        with self._lock:
+            old, self._snapshot = self._snapshot, snapshot
+        self.swaps += 1
+
+        # Same index directory (in-place rebuild): the new snapshot owns the cache
+        old.retire(evict=old.faiss_dir != snapshot.faiss_dir)
+        print(f"[SNAPSHOT] Live version {old.version} → {snapshot.version}")
+        return old
+
+    def reload(self, version=None, background=True):
+        """
+        Load `version` (default: CURRENT) and swap it in. Returns False if
+        a reload is already running.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+
+        self.loading = version or read_current(self.root)
+
+        def run():
+            try:
+                snapshot = load_snapshot(self.loading, self.root, warm=True)
+                self.swap(snapshot)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.failed_version = self.loading
+                print(f"[SNAPSHOT] Reload of {self.loading} failed: {self.last_error}")
+            finally:
+                self.loading = None
+                self._reload_lock.release()
+
+        if background:
+            threading.Thread(target=run, name="snapshot-reload", daemon=True).start()
+        else:
+            run()
+        return True
+
+    def watch(self, interval):
+        """Poll CURRENT every `interval` seconds; reload when it names a new version."""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                version = read_current(self.root)
+                # A version that failed to load is not retried by the watcher
+                if version in (None, self._snapshot.version, self.failed_version):
+                    continue
+                self.reload(version, background=False)
+
+        self._watcher = threading.Thread(target=loop, name="snapshot-watch", daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        return {
+            "live": self._snapshot.info(),
+            "loading": self.loading,
+            "last_error": self.last_error,
+            "swaps": self.swaps,
+            "available": list_snapshots(self.root),
+            "current_pointer": read_current(self.root)
+        }
+
+
+# ---------------- ENTRY ---------------- #
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish and manage SmartDine data snapshots")
+    parser.add_argument("--root", default=SNAPSHOT_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    publish = sub.add_parser("publish", help="build a snapshot from a preprocessed CSV")
+    publish.add_argument("--data", default=PREPROCESSED_DATA)
+    publish.add_argument("--version")
+    publish.add_argument("--no-activate", action="store_true", help="build without repointing CURRENT")
+
+    activate = sub.add_parser("activate", help="repoint CURRENT (rollback)")
+    activate.add_argument("version")
+
+    sub.add_parser("list")
+
+    prune = sub.add_parser("prune")
+    prune.add_argument("--keep", type=int, default=3)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "publish":
+        publish_snapshot(data_path=args.data, root=args.root, version=args.version, activate=not args.no_activate)
+    elif args.command == "activate":
+        set_current(args.version, args.root)
+        print(f"[INFO] CURRENT → {args.version}")
+    elif args.command == "list":
+        current = read_current(args.root)
+        for version in list_snapshots(args.root):
+            print(("* " if version == current else "  ") + version)
+    elif args.command == "prune":
+        for version in prune_snapshots(args.keep, args.root):
+            print(f"[INFO] Removed {version}")
+
+
+if __name__ == "__main__":
+    main()
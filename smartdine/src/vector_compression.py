@@ -0,0 +1,323 @@
+"""
+vector_compression.py
+Smaller FAISS item vectors: fewer dimensions and/or narrower storage.
+
+    reduction  pca       project onto the top singular vectors of the catalog
+                         embeddings (fit once, shared by all cities)
+               truncate  keep the first `dim` dimensions (Matryoshka-style;
+                         MiniLM was not trained for it, so check recall)
+    storage    float32   IndexFlatIP, 4 bytes per dimension
+               float16   IndexScalarQuantizer QT_fp16, 2 bytes
+               int8      IndexScalarQuantizer QT_8bit, 1 byte (trained per city)
+
+The projection is not mean-centered. It keeps the directions that carry
+most of the raw inner products, so semantic_score stays on the scale the
+ranking weights were tuned for. Reduced vectors are re-normalized, so
+inner product is still cosine. The fitted projection is saved as
+<faiss_dir>/compression.npz next to the indexes, and search_city applies
+it to every query.
+
+Settings are read from config (VECTOR_DIM, VECTOR_REDUCTION,
+VECTOR_STORAGE) when the indexes are built. Measure recall@k against the
+full-precision exact search first:
+
+    python src/vector_compression.py --synthetic 200000 --dims 64,128,192
+    python src/vector_compression.py --cities 6      # production data and encoder
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+
+import faiss
+import numpy as np
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(SRC_DIR)
+if PACKAGE_DIR not in sys.path:
+    sys.path.append(PACKAGE_DIR)
+
+from config import EMBEDDING_DIM
+
+REPORT_DIR = os.path.join(PACKAGE_DIR, "benchmarks", "compression")
+COMPRESSION_FILE = "compression.npz"
+
+REDUCTIONS = ("pca", "truncate")
+STORAGES = {"float32": 4, "float16": 2, "int8": 1}   # bytes per dimension
+
+# Rows sampled (across all cities) to fit the PCA
+FIT_SAMPLE = 50_000
+
+
+# ---------------- COMPRESSOR ---------------- #
+
+class VectorCompressor:
+    """
+    Maps normalized EMBEDDING_DIM vectors into the compressed index space
+    and builds indexes in it. dim=0 keeps every dimension.
+    """
+
+    def __init__(self, dim=0, reduction="pca", storage="float32", input_dim=EMBEDDING_DIM, components=None):
+        if reduction not in REDUCTIONS:
+            raise ValueError(f"Unknown vector reduction: {reduction} (expected one of {REDUCTIONS})")
+        if storage not in STORAGES:
+            raise ValueError(f"Unknown vector storage: {storage} (expected one of {tuple(STORAGES)})")
+        if not 0 <= dim <= input_dim:
+            raise ValueError(f"Vector dim must be between 1 and {input_dim} (0 = all), got {dim}")
+
+        self.input_dim = input_dim
+        self.dim = dim or input_dim
+        self.reduction = reduction
+        self.storage = storage
+        self.components = components
+
+    @property
+    def reduces(self):
+        return self.dim < self.input_dim
+
+    @property
+    def identity(self):
+        """True when indexes are plain full-dimension float32 (nothing to save)."""
+        return not self.reduces and self.storage == "float32"
+
+    @property
+    def needs_fit(self):
+        return self.reduces and self.reduction == "pca" and self.components is None
+
+    def fit(self, vectors):
+        """Fit the PCA on normalized sample vectors (no-op for truncation)."""
+        if self.reduces and self.reduction == "pca":
+            _, _, vt = np.linalg.svd(np.asarray(vectors, dtype="float32"), full_matrices=False)
+            self.components = np.ascontiguousarray(vt[:self.dim], dtype="float32")
+        return self
+
+    def project(self, vectors):
+        """Normalized (n, input_dim) float32 -> normalized (n, dim) float32."""
+        vectors = np.asarray(vectors, dtype="float32").reshape(-1, self.input_dim)
+        if not self.reduces:
+            return vectors
+        if self.reduction == "pca":
+            if self.components is None:
+                raise RuntimeError("PCA compressor used before fit()")
+            out = vectors @ self.components.T
+        else:
+            out = vectors[:, :self.dim]
+        out = np.ascontiguousarray(out, dtype="float32")
+        faiss.normalize_L2(out)
+        return out
+
+    def build_index(self, vectors):
+        """Inner-product index over already-projected vectors."""
+        if self.storage == "float32":
+            index = faiss.IndexFlatIP(self.dim)
+        else:
+            qtype = faiss.ScalarQuantizer.QT_fp16 if self.storage == "float16" else faiss.ScalarQuantizer.QT_8bit
+            index = faiss.IndexScalarQuantizer(self.dim, qtype, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        index.add(vectors)
+        return index
+
+    @property
+    def bytes_per_vector(self):
+        return self.dim * STORAGES[self.storage]
+
+    def describe(self):
+        return {
+            "dim": self.dim,
+            "reduction": self.reduction if self.reduces else "none",
+            "storage": self.storage,
+            "bytes_per_vector": self.bytes_per_vector,
+            "ratio": round(self.input_dim * STORAGES["float32"] / self.bytes_per_vector, 2)
+        }
+
+    def save(self, path):
+        empty = np.empty(0, dtype="float32")
+        np.savez(
+            path,
+            dim=self.dim,
+            input_dim=self.input_dim,
+            reduction=self.reduction,
+            storage=self.storage,
+            components=self.components if self.components is not None else empty
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(
+                dim=int(f["dim"]),
+                reduction=str(f["reduction"]),
+                storage=str(f["storage"]),
+                input_dim=int(f["input_dim"]),
+                components=f["components"] if f["components"].size else None
+            )
+
+
+def compression_path(faiss_dir):
+    return os.path.join(faiss_dir, COMPRESSION_FILE)
+
+
+def load_compressor(faiss_dir):
+    """The compressor the indexes in `faiss_dir` were built with, or None."""
+    path = compression_path(faiss_dir)
+    return VectorCompressor.load(path) if os.path.exists(path) else None
+
+
+def sample_texts(df, n=FIT_SAMPLE, seed=0):
+    """Embedding texts of up to `n` rows drawn across all cities."""
+    if len(df) > n:
+        df = df.sample(n, random_state=seed)
+    return df["embedding_text"].astype(str).tolist()
+
+
+def encode_normalized(model, texts):
+    vectors = np.asarray(model.encode(texts, convert_to_numpy=True), dtype="float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+# ---------------- RECALL REPORT ---------------- #
+
+def _load_inputs(args):
+    """(catalog, encoder, [(query, city)]) for the report."""
+    from benchmark import build_synthetic_catalog, build_workload, HashingEncoder, QUERY_MIX
+
+    if args.synthetic:
+        df = build_synthetic_catalog(args.synthetic, args.cities, seed=args.seed)
+        workload = build_workload(args.queries, args.cities, surprise_ratio=0.0, seed=args.seed)
+        return df, HashingEncoder(seed=args.seed), [(w["query"], w["city"]) for w in workload]
+
+    import pandas as pd
+    from encoder import TorchEncoder
+    from faiss_index import DATA_PATH, MODEL_NAME
+
+    df = pd.read_csv(DATA_PATH)
+    cities = df["city"].value_counts().index[:args.cities].tolist()
+    df = df[df["city"].isin(cities)]
+    queries = [(q, city) for city in cities for _, q in QUERY_MIX]
+    return df, TorchEncoder(MODEL_NAME), queries
+
+
+def recall_hits(items, queries, exact_scores, approx_ids, k):
+    """
+    Per query, the share of the approximate top-k that belongs in the
+    exact top-k: full-precision cosine at least the exact k-th best.
+    Scoring by value rather than id keeps duplicate dishes (equal
+    vectors, arbitrary order) from counting as misses.
+    """
+    ids = approx_ids[:, :k]
+    true = np.einsum("qkd,qd->qk", items[np.clip(ids, 0, None)], queries)
+    kth = exact_scores[:, min(k, exact_scores.shape[1]) - 1][:, None]
+    return ((true >= kth - 1e-5) & (ids >= 0)).sum(axis=1) / k
+
+
+def run_report(args):
+    df, encoder, queries = _load_inputs(args)
+    ks = sorted(int(k) for k in args.k.split(","))
+    top = max(ks)
+
+    print(f"[INFO] Encoding {len(df)} items in {df['city'].nunique()} cities...")
+    cities = {}
+    for city, city_df in df.groupby("city"):
+        city_queries = [q for q, c in queries if c == city]
+        if city_queries:
+            cities[city] = (
+                encode_normalized(encoder, city_df["embedding_text"].astype(str).tolist()),
+                encode_normalized(encoder, city_queries)
+            )
+    if not cities:
+        raise SystemExit("No queries for the catalog's cities")
+
+    sample = encode_normalized(encoder, sample_texts(df, seed=args.seed))
+
+    # Full-precision exact search is the ground truth
+    baseline = VectorCompressor()
+    truth = {}
+    for city, (items, qs) in cities.items():
+        truth[city], _ = baseline.build_index(items).search(qs, top)
+
+    # Full-dimension configs are the same for either reduction
+    configs = {}
+    for reduction in ["pca"] + args.reductions.split(","):
+        for dim in [0] + [int(d) for d in args.dims.split(",")]:
+            for storage in args.storage.split(","):
+                compressor = VectorCompressor(dim, reduction, storage)
+                configs.setdefault((compressor.dim, compressor.describe()["reduction"], storage), compressor)
+
+    rows = []
+    for compressor in configs.values():
+        if compressor.needs_fit:
+            compressor.fit(sample)
+
+        index_bytes, search_s, found = 0, 0.0, {}
+        for city, (items, qs) in cities.items():
+            index = compressor.build_index(compressor.project(items))
+            index_bytes += faiss.serialize_index(index).size
+            start = time.perf_counter()
+            _, found[city] = index.search(compressor.project(qs), top)
+            search_s += time.perf_counter() - start
+
+        row = compressor.describe()
+        row["index_mb"] = round(index_bytes / 2**20, 2)
+        row["search_us_per_query"] = round(search_s / len(queries) * 1e6, 1)
+        for k in ks:
+            hits = np.concatenate([
+                recall_hits(items, qs, truth[city], found[city], k) for city, (items, qs) in cities.items()
+            ])
+            row[f"recall@{k}"] = round(float(hits.mean()), 4)
+        rows.append(row)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "args": vars(args),
+            "items": int(sum(len(items) for items, _ in cities.values())),
+            "queries": len(queries)
+        },
+        "configs": rows
+    }
+
+
+def print_report(report, ks):
+    header = f"{'reduction':<10}{'dim':>5}{'storage':>9}{'B/vec':>7}{'ratio':>7}{'index MB':>10}{'us/query':>10}"
+    header += "".join(f"{'R@' + str(k):>8}" for k in ks)
+    print(header)
+    for row in report["configs"]:
+        line = (f"{row['reduction']:<10}{row['dim']:>5}{row['storage']:>9}{row['bytes_per_vector']:>7}"
+                f"{row['ratio']:>7}{row['index_mb']:>10}{row['search_us_per_query']:>10}")
+        line += "".join(f"{row[f'recall@{k}']:>8.3f}" for k in ks)
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recall@k of compressed FAISS vectors vs. full precision")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="synthetic catalog of this many items instead of production data; its hashing "
+                             "encoder spreads variance over every dimension, so reduced-dim recall is a worst case")
+    parser.add_argument("--cities", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=500, help="synthetic workload size")
+    parser.add_argument("--dims", default="64,96,128,192,384")
+    parser.add_argument("--reductions", default="pca,truncate")
+    parser.add_argument("--storage", default="float32,float16,int8")
+    parser.add_argument("--k", default="10,40", help="comma-separated cutoffs (40 = FAISS_TOP_K)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="report JSON path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_report(args)
+    print_report(report, sorted(int(k) for k in args.k.split(",")))
+
+    out = args.out or os.path.join(REPORT_DIR, f"compression-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\n[INFO] Report saved → {out}")
+
+
+if __name__ == "__main__":
+    main()
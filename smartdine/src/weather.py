@@ -2,6 +2,7 @@ import os
 import time
 import requests
 from dotenv import load_dotenv
+from metrics import record_cache
 load_dotenv()
 
 
@@ -34,6 +35,16 @@ def _classify_weather(temp_c, condition):
     return "pleasant"
 
 
+def unknown_weather(city):
+    """Neutral weather context: no API key, a failed lookup, or no time for one."""
+    return {
+        "city": city,
+        "temp_c": None,
+        "condition": "unknown",
+        "category": "unknown"
+    }
+
+
 # ---------------- MAIN API ---------------- #
 
 def get_weather(city: str):
@@ -44,12 +55,7 @@ def get_weather(city: str):
 
     if not API_KEY:
         # Fail-safe: no API key
-        return {
-            "city": city,
-            "temp_c": None,
-            "condition": "unknown",
-            "category": "unknown"
-        }
+        return unknown_weather(city)
 
     city_key = city.lower().strip()
     now = time.time()
@@ -58,8 +64,11 @@ def get_weather(city: str):
     if city_key in _WEATHER_CACHE:
         ts, data = _WEATHER_CACHE[city_key]
         if now - ts < CACHE_TTL:
+            record_cache("weather", hit=True)
             return data
 
+    record_cache("weather", hit=False)
+
     # -------- API CALL -------- #
     params = {
         "q": city,
@@ -88,9 +97,4 @@ def get_weather(city: str):
 
     except Exception:
         # Fail-safe fallback
-        return {
-            "city": city,
-            "temp_c": None,
-            "condition": "unknown",
-            "category": "unknown"
-        }
+        return unknown_weather(city)
@@ -0,0 +1,103 @@
+"""
+Parity of the compiled IntentMatcher with the per-keyword regex loop it
+replaced (intent_matcher._legacy_extract_intents).
+
+Without a negation cue both must agree on every intent. With one, the
+only allowed differences are the intents the cue negates, listed per
+query; everything else must still match the old loop.
+
+    python -m unittest discover -s smartdine/tests      # from the repo root
+"""
+
+import os
+import sys
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, "src")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from intent_matcher import IntentMatcher, _legacy_extract_intents
+
+# No negation: identical output expected
+PARITY_QUERIES = [
+    "", "cheap", "spicy", "dessert", "something cheesy and italian",
+    "comfort food after a rough day", "paneer tikka", "healthy salad",
+    "hot and spicy food", "something sweet with chocolate",
+    "fine dining premium dinner", "margherita", "Cheap AND Cheesy!",
+    "budget masala dosa", "budget-friendly thali", "creamy pasta, low price",
+    "luxury dessert buffet", "something fiery", "sugar free",
+    "hot chocolate", "premium cheese platter", "SPICY   masala",
+    # "not expensive" / "not costly" were special-cased by the old loop
+    "not expensive biryani", "not costly",
+    # words that only partly match a keyword
+    "cheesecake", "spiciness", "hotel food", "sweetcorn soup", "sugary drinks",
+    "premiumness", "cheapest thali", "desserts", "chocolates", "masalas",
+    "costlier options", "no-frills hotpot",
+]
+
+# Negation: the old loop ignored it, so these intents are expected to
+# differ from it; every other intent must not
+NEGATION_CASES = [
+    ("not spicy", {"spicy": False}),
+    ("no cheese please", {"cheesy": False}),
+    ("something without sugar", {"sweet": False}),
+    ("not too spicy but cheesy", {"spicy": False}),
+    ("not very expensive", {"expensive": False, "cheap": True}),
+    ("I don't want anything sweet", {"sweet": False}),
+    ("never too fiery", {"spicy": False}),
+    ("avoid masala, want cheese", {"spicy": False}),
+    ("no chocolate cheesecake", {"sweet": False}),
+    ("skip the creamy ones and give me something hot", {"cheesy": False}),
+    # a non-negated keyword of the same intent still sets it
+    ("dessert, not chocolate", {}),
+    ("spicy but no masala", {}),
+    # cue scope ends after three words or at a break
+    ("not a big fan of spicy", {}),
+    ("no onions, extra spicy", {}),
+    # cue with no keyword in scope, or only partial matches
+    ("no spiciness", {}),
+    ("not a hotel", {}),
+    ("nothing fancy", {}),
+    # the old loop's "not costly" substring rule overrode a plain "expensive"
+    ("expensive but not costly", {"expensive": True, "cheap": False}),
+]
+
+
+class IntentMatcherParityTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.matcher = IntentMatcher.load()
+
+    def legacy(self, query):
+        return _legacy_extract_intents(query, self.matcher.intents)
+
+    def test_same_as_legacy_without_negation(self):
+        for query in PARITY_QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(self.matcher.extract(query), self.legacy(query))
+
+    def test_negation_only_changes_negated_intents(self):
+        for query, negated in NEGATION_CASES:
+            with self.subTest(query=query):
+                expected = {**self.legacy(query), **negated}
+                self.assertEqual(self.matcher.extract(query), expected)
+
+    def test_negated_intents_differ_from_legacy(self):
+        # Guards the cases above against silently matching the old loop
+        for query, negated in NEGATION_CASES:
+            legacy = self.legacy(query)
+            for intent, value in negated.items():
+                with self.subTest(query=query, intent=intent):
+                    self.assertNotEqual(legacy[intent], value)
+
+    def test_every_intent_reported(self):
+        for query in PARITY_QUERIES[:5] + [q for q, _ in NEGATION_CASES[:5]]:
+            with self.subTest(query=query):
+                self.assertEqual(set(self.matcher.extract(query)), set(self.matcher.intents))
+
+
+if __name__ == "__main__":
+    unittest.main()
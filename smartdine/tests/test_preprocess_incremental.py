@@ -0,0 +1,151 @@
+"""
+Incremental preprocessing (preprocess.update_preprocessed) against a full
+preprocess() of the same rows.
+
+Each test points the preprocess.py paths at a temporary directory, builds
+the outputs from a base catalog, applies a delta and compares the
+processed rows, city_stats.csv and the running aggregates with a full
+rebuild of base - removed + added.
+
+    python -m unittest discover -s smartdine/tests      # from the repo root
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, "src")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+import preprocess
+
+CITIES = ["Pune", "Mumbai", " Delhi ", "Chennai"]
+
+
+def cleaned_rows(n, seed, prefix="Dish"):
+    """n cleaned-dataset rows (clean_dataset.py columns) over CITIES."""
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(80, 900, n).round(2)
+    ratings = rng.uniform(2.5, 5.0, n).round(1)
+    return pd.DataFrame({
+        "Restaurant_Name": [f"Restaurant {i % 7}" for i in range(n)],
+        "Item_Name": [f"{prefix} {i}" for i in range(n)],
+        "Place_Name": [f"Area {i % 3}" for i in range(n)],
+        "Cuisine": rng.choice(["North Indian", "Chinese", "Italian"], n),
+        "City": [CITIES[i % len(CITIES)] for i in range(n)],
+        "Prices": prices,
+        "Average_Rating": ratings,
+        "Votes": rng.integers(0, 5000, n),
+        "Is_Bestseller": rng.integers(0, 2, n),
+        "Is_Expensive": (prices > 500).astype(int),
+        "Is_Highly_Rated": (ratings >= 4.0).astype(int),
+        "Restaurant_Popularity": rng.uniform(0, 1, n).round(3),
+        "Avg_Rating_Restaurant": rng.uniform(3.0, 4.8, n).round(1),
+    })
+
+
+class IncrementalPreprocessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.paths = {
+            name: os.path.join(self.tmp.name, file)
+            for name, file in [
+                ("CLEANED_DATA_PATH", "cleaned.csv"),
+                ("CITY_STATS_OUTPUT", "city_stats.csv"),
+                ("PROCESSED_OUTPUT", "preprocessed.csv"),
+                ("CITY_AGGREGATES_OUTPUT", "city_stats_running.csv"),
+                ("NORM_STATS_OUTPUT", "norm_stats.json"),
+            ]
+        }
+        for name, path in self.paths.items():
+            patcher = mock.patch.object(preprocess, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Keep the pipeline's progress output out of the test report
+        patcher = mock.patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def build(self, rows):
+        """Full preprocess() of `rows`; returns (processed, city_stats, aggregates)."""
+        rows.to_csv(preprocess.CLEANED_DATA_PATH, index=False)
+        preprocess.preprocess()
+        return self.outputs()
+
+    def outputs(self):
+        processed = pd.read_csv(preprocess.PROCESSED_OUTPUT)
+        processed = processed.sort_values("item_id").reset_index(drop=True)
+        city_stats = pd.read_csv(preprocess.CITY_STATS_OUTPUT)
+        aggs = preprocess.load_aggregates().sort_index()
+        return processed, city_stats, aggs
+
+    def assert_matches_rebuild(self, base, added, removed, **kwargs):
+        self.build(base)
+        summary = preprocess.update_preprocessed(added=added, removed=removed, **kwargs)
+        incremental = self.outputs()
+
+        expected_rows = base[~base["Item_Name"].isin(removed["Item_Name"])] if removed is not None else base
+        if added is not None:
+            expected_rows = pd.concat([expected_rows, added], ignore_index=True)
+        processed, city_stats, aggs = self.build(expected_rows)
+
+        pd.testing.assert_frame_equal(incremental[2], aggs, check_exact=False, rtol=1e-9)
+        pd.testing.assert_frame_equal(incremental[1], city_stats, check_exact=False, rtol=1e-9)
+        pd.testing.assert_series_equal(incremental[0]["item_id"], processed["item_id"])
+        return summary, incremental[0], processed
+
+    def test_add_and_remove_match_full_rebuild(self):
+        base = cleaned_rows(400, seed=1)
+        added = cleaned_rows(60, seed=2, prefix="New dish")
+        removed = base.iloc[::9]
+
+        # threshold 0 forces the *_norm recompute, so every column must match
+        summary, incremental, full = self.assert_matches_rebuild(base, added, removed, threshold=0.0)
+        pd.testing.assert_frame_equal(
+            incremental[full.columns], full, check_exact=False, rtol=1e-9, check_dtype=False
+        )
+
+        self.assertEqual(summary["added"], len(added))
+        self.assertEqual(summary["removed"], len(removed))
+        self.assertIs(summary["renormalized"], True)
+        json.dumps(summary)
+
+    def test_add_only_below_threshold_appends(self):
+        base = cleaned_rows(400, seed=3)
+        added = base.iloc[:4].assign(Item_Name=lambda d: d["Item_Name"] + " special")
+
+        summary, incremental, full = self.assert_matches_rebuild(base, added, None, threshold=10.0)
+        self.assertIs(summary["renormalized"], False)
+        self.assertEqual(summary["added"], len(added))
+        self.assertEqual(summary["removed"], 0)
+        self.assertIsInstance(summary["drift"], float)
+        json.dumps(summary)
+
+        # Stored stats were kept, so old rows keep their *_norm values
+        norm_cols = [f"{c}_norm" for c in preprocess.NUMERIC_COLS]
+        old = incremental[~incremental["Item_Name"].str.endswith(" special")]
+        self.assertEqual(len(old), len(base))
+        self.assertListEqual(sorted(incremental.columns), sorted(full.columns))
+        self.assertFalse(old[norm_cols].isna().any().any())
+
+    def test_remove_only(self):
+        base = cleaned_rows(300, seed=4)
+        removed = base.iloc[5:40][["Restaurant_Name", "Item_Name", "Place_Name", "City"]]
+
+        summary, _, _ = self.assert_matches_rebuild(base, None, removed)
+        self.assertEqual(summary["removed"], len(removed))
+        json.dumps(summary)
+
+
+if __name__ == "__main__":
+    unittest.main()